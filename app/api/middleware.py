@@ -0,0 +1,91 @@
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.api.responses import ZEROCOPY_EXTENSION
+from app.core.metrics import Metrics
+from app.services.admission import AdmissionController, Permit
+
+
+class MetricsMiddleware:
+    # Plain ASGI rather than BaseHTTPMiddleware, so streamed bodies pass through untouched and are timed to the last byte
+    def __init__(self, app: ASGIApp, metrics: Metrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        metrics = self.metrics
+        started = time.perf_counter()
+        status_code = 500
+        received = 0
+        sent = 0
+
+        async def counting_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+            return message
+
+        async def counting_send(message: Message) -> None:
+            nonlocal status_code, sent
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                sent += len(message.get("body", b""))
+            elif message["type"] == ZEROCOPY_EXTENSION:
+                sent += message["count"]
+            await send(message)
+
+        metrics.http_in_flight.inc()
+        try:
+            await self.app(scope, counting_receive, counting_send)
+        finally:
+            metrics.http_in_flight.dec()
+            # The route template keeps label cardinality bounded; unmatched paths share one series
+            route = scope.get("route")
+            route_label = getattr(route, "path_format", None) or "unmatched"
+            method = scope["method"]
+            metrics.http_requests.inc(method, route_label, str(status_code))
+            metrics.http_duration.observe(time.perf_counter() - started, method, route_label)
+            if received:
+                metrics.http_received_bytes.inc(route_label, amount=received)
+            if sent:
+                metrics.http_sent_bytes.inc(route_label, amount=sent)
+
+
+PERMITS_SCOPE_KEY = "keeper.admission_permits"
+
+
+class AdmissionMiddleware:
+    # Routes take their permits mid-request, once they know the object size; releasing them here, after the
+    # app returns, holds each permit until the last response byte is sent or the client goes away.
+    def __init__(self, app: ASGIApp, controller: AdmissionController):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        permits: list[Permit] = []
+        scope[PERMITS_SCOPE_KEY] = permits
+        received = 0
+
+        async def counting_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+            return message
+
+        try:
+            await self.app(scope, counting_receive, send)
+        finally:
+            for permit in permits:
+                self.controller.release(permit, received)
@@ -0,0 +1,87 @@
+import os
+from collections.abc import Awaitable, Callable, Mapping
+
+import anyio
+from fastapi import HTTPException, status
+from fastapi.responses import Response
+from starlette.types import Receive, Scope, Send
+
+ZEROCOPY_EXTENSION = "http.response.zerocopy"
+
+
+class SendfileResponse(Response):
+    chunk_size = 256 * 1024
+
+    def __init__(
+        self,
+        path: str,
+        count: int,
+        offset: int = 0,
+        size: int | None = None,
+        relocate: Callable[[], Awaitable[str | None]] | None = None,
+        status_code: int = 200,
+        headers: Mapping[str, str] | None = None,
+        media_type: str | None = None,
+    ) -> None:
+        self.path = path
+        self.offset = offset
+        self.count = count
+        # The whole file's expected size, checked once it is open
+        self.size = size
+        # Looks the path up again if the file is gone by the time it is opened, e.g. a fast-tier copy that was evicted
+        self.relocate = relocate
+        self.status_code = status_code
+        self.media_type = media_type
+        self.background = None
+        self.init_headers(headers)
+        self.headers.setdefault("content-length", str(count))
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["method"].upper() == "HEAD" or not self.count:
+            await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        # Opened before the headers go out: a file deleted, replaced or evicted since the route's stat can still
+        # get an error response instead of a Content-Length the body won't match
+        file = await self._open()
+        try:
+            if self.size is not None and (await anyio.to_thread.run_sync(os.fstat, file.fileno())).st_size != self.size:
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="File changed while it was being opened", headers={"Retry-After": "1"}
+                )
+            await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+            if ZEROCOPY_EXTENSION in scope.get("extensions", {}):
+                # The server hands the descriptor to os.sendfile, so the body never enters Python
+                await send({"type": ZEROCOPY_EXTENSION, "file": file, "offset": self.offset, "count": self.count, "more_body": False})
+            else:
+                await self._send_chunks(file, send)
+        finally:
+            await anyio.to_thread.run_sync(file.close)
+
+    async def _open(self):
+        try:
+            return await anyio.to_thread.run_sync(open, self.path, "rb")
+        except FileNotFoundError as e:
+            if self.relocate is None:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found") from e
+        try:
+            path = await self.relocate()
+            if path is None or path == self.path:
+                raise FileNotFoundError(self.path)
+            file = await anyio.to_thread.run_sync(open, path, "rb")
+        except FileNotFoundError as e:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found") from e
+        self.path = path
+        return file
+
+    async def _send_chunks(self, file, send: Send) -> None:
+        await anyio.to_thread.run_sync(file.seek, self.offset)
+        remaining = self.count
+        while remaining > 0:
+            chunk = await anyio.to_thread.run_sync(file.read, min(self.chunk_size, remaining))
+            if not chunk:
+                # Headers are out, so the only honest ending left is a broken response
+                raise RuntimeError(f"{self.path} was truncated while it was being sent")
+            remaining -= len(chunk)
+            await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
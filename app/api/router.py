@@ -1,7 +1,11 @@
 from fastapi import APIRouter
 
-from .routes import files, ping
+from .routes import archives, files, jobs, metrics, ping, uploads
 
 api_router = APIRouter()
 api_router.include_router(ping.router, tags=["Health"])
+api_router.include_router(metrics.router, tags=["Health"])
 api_router.include_router(files.router, tags=["Files"])
+api_router.include_router(archives.router, tags=["Files"])
+api_router.include_router(jobs.router, tags=["Jobs"])
+api_router.include_router(uploads.router, tags=["Uploads"])
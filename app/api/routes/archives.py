@@ -0,0 +1,83 @@
+from typing import Annotated
+
+from fastapi import APIRouter, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+
+from app.deps.admission import AdmissionDep
+from app.deps.services import FileServiceDep
+from app.deps.settings import SettingsDep
+from app.schemas.archives import ArchiveExportRequest, ArchiveImportInfo
+from app.storage.codecs import get_codec
+from app.storage.enums import Compression
+from app.storage.hashing import new_hashers
+
+router = APIRouter()
+
+_ARCHIVE_TYPES: dict[Compression, tuple[str, str]] = {
+    Compression.NONE: ("application/x-tar", ".tar"),
+    Compression.GZIP: ("application/gzip", ".tar.gz"),
+    Compression.ZSTD: ("application/zstd", ".tar.zst"),
+    Compression.LZ4: ("application/x-lz4", ".tar.lz4"),
+}
+
+
+@router.post("/files/export", response_class=StreamingResponse)
+async def export_files(
+    export: ArchiveExportRequest,
+    file_service: FileServiceDep,
+    settings: SettingsDep,
+    admission: AdmissionDep,
+) -> StreamingResponse:
+    if export.file_ids is not None and len(export.file_ids) > settings.batch_max_items:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"At most {settings.batch_max_items} file ids per export")
+    try:
+        new_hashers(export.hashes)
+        codec = get_codec(export.compression) if export.compression != Compression.NONE else None
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)) from e
+    # The whole archive is one stream of unknown length
+    await admission(None, hashing=bool(export.hashes))
+
+    stream = file_service.export_archive(
+        file_ids=export.file_ids,
+        prefix=export.prefix,
+        algorithms=export.hashes,
+        codec=codec,
+        concurrency=settings.batch_concurrency,
+    )
+    try:
+        # Pull the first chunk up front so a bad prefix is still a 400 rather than a broken stream
+        first = await anext(stream, None)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)) from e
+
+    async def content():
+        if first is not None:
+            yield first
+        async for chunk in stream:
+            yield chunk
+
+    media_type, extension = _ARCHIVE_TYPES[export.compression]
+    return StreamingResponse(content=content(), media_type=media_type, headers={"Content-Disposition": f'attachment; filename="export{extension}"'})
+
+
+@router.post("/files/import", response_model=ArchiveImportInfo)
+async def import_files(
+    request: Request,
+    file_service: FileServiceDep,
+    settings: SettingsDep,
+    admission: AdmissionDep,
+    compression: Annotated[Compression, Query()] = Compression.NONE,
+    verify: Annotated[bool, Query()] = False,
+) -> ArchiveImportInfo:
+    try:
+        codec = get_codec(compression) if compression != Compression.NONE else None
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)) from e
+    await admission(admission.content_length, hashing=verify)
+
+    try:
+        result = await file_service.import_archive(request.stream(), codec=codec, verify=verify, concurrency=settings.batch_concurrency)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)) from e
+    return ArchiveImportInfo.from_result(result)
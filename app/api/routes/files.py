@@ -1,19 +1,49 @@
-from fastapi import APIRouter, HTTPException, Request, status
-from fastapi.responses import Response, StreamingResponse
+import json
+from functools import partial
+from secrets import token_hex
+from typing import Annotated, Optional
 
+from fastapi import APIRouter, HTTPException, Query, Request, status
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+from app.api.responses import SendfileResponse
+from app.deps.admission import AdmissionDep
 from app.deps.services import FileServiceDep
+from app.deps.settings import SettingsDep
 from app.deps.upload_params import UploadParamsDep
-from app.utils.helpers import _to_stream
+from app.schemas.batch import BatchOperation, BatchRequest
+from app.schemas.jobs import JobInfo
+from app.services.file_service import FileService
+from app.services.ingest import IngestQueueFullError
+from app.utils.helpers import decode_cursor, encode_cursor
+from app.utils.http import (
+    RangeNotSatisfiableError,
+    if_range_matches,
+    is_not_modified,
+    make_etag,
+    make_last_modified,
+    multipart_byteranges,
+    parse_accept_encoding,
+    parse_range_header,
+)
 
 router = APIRouter()
 
 
-@router.post("/files", status_code=status.HTTP_204_NO_CONTENT, response_class=Response, response_model=None)
+@router.post(
+    "/files",
+    status_code=status.HTTP_204_NO_CONTENT,
+    response_class=Response,
+    response_model=None,
+    responses={status.HTTP_202_ACCEPTED: {"model": JobInfo, "description": "Background upload accepted"}},
+)
 async def upload_file(
     request: Request,
     upload_params: UploadParamsDep,
     file_service: FileServiceDep,
+    admission: AdmissionDep,
 ) -> Response:
+    await admission(admission.content_length, hashing=bool(upload_params.hash and upload_params.algorithm))
     stream = request.stream()
 
     try:
@@ -25,33 +55,193 @@ async def upload_file(
                 algorithm=upload_params.algorithm,
             )
         elif upload_params.background:
-            content = await request.body()
-            await file_service.save_file_background(
+            job = await file_service.save_file_background(
                 file_id=upload_params.file_id,
-                stream=_to_stream(content),
+                stream=stream,
+            )
+            return JSONResponse(
+                status_code=status.HTTP_202_ACCEPTED,
+                content=JobInfo.from_job(job).model_dump(mode="json"),
+                headers={"Location": f"/jobs/{job.job_id}"},
             )
         else:
             await file_service.save_file(file_id=upload_params.file_id, stream=stream)
+    except IngestQueueFullError as e:
+        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail=str(e), headers={"Retry-After": "1"}) from e
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)) from e
 
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
-@router.get("/files/{file_id}", response_class=StreamingResponse)
+@router.get("/files", response_class=StreamingResponse)
+async def list_files(
+    file_service: FileServiceDep,
+    prefix: Annotated[str, Query()] = "",
+    cursor: Annotated[Optional[str], Query()] = None,
+    limit: Annotated[int, Query(ge=1, le=10_000)] = 1000,
+) -> StreamingResponse:
+    try:
+        entries = file_service.list_files(prefix=prefix, cursor=decode_cursor(cursor) if cursor else None, limit=limit)
+        # Pull the first entry up front so a bad prefix is still a 400 rather than a broken stream
+        entry = await anext(entries, None)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)) from e
+
+    async def lines():
+        nonlocal entry
+        count = 0
+        while entry is not None:
+            file_id, file_stat = entry
+            count += 1
+            yield json.dumps({"file_id": file_id, "size": file_stat.size, "mtime_ns": file_stat.mtime_ns}) + "\n"
+            if count == limit:
+                # A full page may have more behind it; the last line carries the token for the next request
+                yield json.dumps({"next_cursor": encode_cursor(file_id)}) + "\n"
+                return
+            entry = await anext(entries, None)
+
+    return StreamingResponse(content=lines(), media_type="application/x-ndjson")
+
+
+@router.post("/files/batch", response_class=StreamingResponse)
+async def batch_files(
+    batch: BatchRequest,
+    file_service: FileServiceDep,
+    settings: SettingsDep,
+    admission: AdmissionDep,
+) -> StreamingResponse:
+    if len(batch.file_ids) > settings.batch_max_items:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"At most {settings.batch_max_items} file ids per batch")
+    if batch.operation == BatchOperation.HASH:
+        # A hashing batch counts as one hash job for its whole run
+        await admission(None, hashing=True)
+
+    async def lines():
+        results = file_service.run_batch(batch.operation, batch.file_ids, algorithm=batch.algorithm, concurrency=settings.batch_concurrency)
+        async for item in results:
+            yield json.dumps(item) + "\n"
+
+    return StreamingResponse(content=lines(), media_type="application/x-ndjson")
+
+
+@router.api_route("/files/{file_id}", methods=["GET", "HEAD"], response_class=StreamingResponse)
 async def get_file(
     file_id: str,
+    request: Request,
     file_service: FileServiceDep,
-) -> StreamingResponse:
-    # Check if file exists before attempting to stream
-    if not await file_service.check_file_exists(file_id):
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"File '{file_id}' not found")
+    admission: AdmissionDep,
+) -> Response:
+    try:
+        file_stat = await file_service.get_file_stat(file_id)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"File '{file_id}' not found") from e
+
+    range_header = request.headers.get("range")
+    encoded = None
+    accepted = parse_accept_encoding(request.headers.get("accept-encoding"))
+    if accepted and not range_header:
+        encoded = await file_service.get_encoded_file(file_id, accepted)
+
+    etag = make_etag(file_stat)
+    if encoded is not None:
+        # Each representation needs its own validator
+        etag = f'{etag[:-1]}-{encoded.coding}"'
+    headers = {
+        "ETag": etag,
+        "Last-Modified": make_last_modified(file_stat),
+        "Accept-Ranges": "bytes",
+        "Vary": "Accept-Encoding",
+    }
+    if is_not_modified(request.headers.get("if-none-match"), request.headers.get("if-modified-since"), etag, file_stat):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    headers["Content-Disposition"] = f'attachment; filename="{file_id}"'
+    # HEAD gets the GET headers without the body being opened, so it costs no reads and counts as no tier hit
+    head = request.method == "HEAD"
+    await admission(encoded.size if encoded is not None else file_stat.size)
+    if encoded is not None:
+        headers["Content-Encoding"] = encoded.coding
+        headers["Content-Length"] = str(encoded.size)
+        if head:
+            return Response(media_type="application/octet-stream", headers=headers)
+        return StreamingResponse(content=encoded.content, media_type="application/octet-stream", headers=headers)
+
+    ranges = None
+    if range_header and if_range_matches(request.headers.get("if-range"), etag, file_stat):
+        try:
+            ranges = parse_range_header(range_header, file_stat.size)
+        except RangeNotSatisfiableError as e:
+            raise HTTPException(
+                status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                detail="Requested range not satisfiable",
+                headers={"Content-Range": str(e)},
+            ) from e
+
+    if not ranges:
+        return await _file_response(file_service, file_id, file_stat.size, 0, file_stat.size, status.HTTP_200_OK, headers, head)
+
+    if len(ranges) == 1:
+        start, end = ranges[0]
+        headers["Content-Range"] = f"bytes {start}-{end - 1}/{file_stat.size}"
+        return await _file_response(file_service, file_id, file_stat.size, start, end - start, status.HTTP_206_PARTIAL_CONTENT, headers, head)
+
+    async def read_range(offset: int, length: int):
+        async for chunk in (await file_service.get_file(file_id, offset=offset, length=length))["content"]:
+            yield chunk
+
+    boundary = token_hex(13)
+    content_length, body = multipart_byteranges(ranges, file_stat.size, "application/octet-stream", boundary, read_range)
+    headers["Content-Length"] = str(content_length)
+    if head:
+        return Response(status_code=status.HTTP_206_PARTIAL_CONTENT, media_type=f"multipart/byteranges; boundary={boundary}", headers=headers)
+    return StreamingResponse(
+        content=body,
+        status_code=status.HTTP_206_PARTIAL_CONTENT,
+        media_type=f"multipart/byteranges; boundary={boundary}",
+        headers=headers,
+    )
+
+
+async def _file_response(
+    file_service: FileService,
+    file_id: str,
+    size: int,
+    offset: int,
+    length: int,
+    status_code: int,
+    headers: dict[str, str],
+    head: bool = False,
+) -> Response:
+    if head:
+        headers["Content-Length"] = str(length)
+        return Response(status_code=status_code, media_type="application/octet-stream", headers=headers)
+
+    body = await file_service.get_cached_file(file_id, size)
+    if body is not None:
+        return Response(content=body[offset : offset + length], status_code=status_code, media_type="application/octet-stream", headers=headers)
+
+    local_path = await file_service.get_local_path(file_id)
+    if local_path is not None:
+        return SendfileResponse(
+            local_path,
+            count=length,
+            offset=offset,
+            size=size,
+            # A tiered store can evict the fast copy before the open; the second lookup finds the capacity copy
+            relocate=partial(file_service.get_local_path, file_id),
+            status_code=status_code,
+            media_type="application/octet-stream",
+            headers=headers,
+        )
 
-    file_data = await file_service.get_file(file_id)
+    headers["Content-Length"] = str(length)
+    file_data = await file_service.get_file(file_id, offset=offset, length=length)
     return StreamingResponse(
         content=file_data["content"],
+        status_code=status_code,
         media_type="application/octet-stream",
-        headers={"Content-Disposition": f'attachment; filename="{file_data["filename"]}"'},
+        headers=headers,
     )
 
 
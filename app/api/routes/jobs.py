@@ -0,0 +1,17 @@
+from fastapi import APIRouter, HTTPException, status
+
+from app.deps.services import FileServiceDep
+from app.schemas.jobs import JobInfo
+
+router = APIRouter()
+
+
+@router.get("/jobs/{job_id}", response_model=JobInfo)
+async def get_job(
+    job_id: str,
+    file_service: FileServiceDep,
+) -> JobInfo:
+    job = file_service.get_background_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Job '{job_id}' not found")
+    return JobInfo.from_job(job)
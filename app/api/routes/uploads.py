@@ -0,0 +1,86 @@
+from typing import Annotated, Optional
+
+from fastapi import APIRouter, Header, HTTPException, Request, Response, status
+
+from app.deps.admission import AdmissionDep
+from app.deps.uploads import UploadManagerDep
+from app.schemas.uploads import CompletedUploadInfo, PartInfo, UploadInfo
+from app.services.uploads import UploadNotFoundError
+
+router = APIRouter()
+
+
+@router.post("/uploads", status_code=status.HTTP_201_CREATED, response_model=UploadInfo)
+async def create_upload(
+    file_id: Annotated[str, Header(alias="X-File-Id")],
+    response: Response,
+    upload_manager: UploadManagerDep,
+) -> UploadInfo:
+    session = await upload_manager.create(file_id)
+    response.headers["Location"] = f"/uploads/{session.upload_id}"
+    return UploadInfo.from_session(session)
+
+
+@router.get("/uploads/{upload_id}", response_model=UploadInfo)
+async def get_upload(
+    upload_id: str,
+    upload_manager: UploadManagerDep,
+) -> UploadInfo:
+    try:
+        return UploadInfo.from_session(await upload_manager.get(upload_id))
+    except UploadNotFoundError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e)) from e
+
+
+@router.put("/uploads/{upload_id}/parts/{part_number}", response_model=PartInfo)
+async def upload_part(
+    upload_id: str,
+    part_number: int,
+    request: Request,
+    upload_manager: UploadManagerDep,
+    admission: AdmissionDep,
+    part_hash: Annotated[Optional[str], Header(alias="X-Part-Hash")] = None,
+) -> PartInfo:
+    await admission(admission.content_length)
+    try:
+        part = await upload_manager.put_part(upload_id, part_number, request.stream(), expected_hash=part_hash)
+    except UploadNotFoundError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e)) from e
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)) from e
+    return PartInfo.from_part(part)
+
+
+@router.post("/uploads/{upload_id}/complete", response_model=CompletedUploadInfo)
+async def complete_upload(
+    upload_id: str,
+    upload_manager: UploadManagerDep,
+    admission: AdmissionDep,
+    file_hash: Annotated[Optional[str], Header(alias="X-File-Hash")] = None,
+    algorithm: Annotated[Optional[str], Header(alias="X-File-Hash-Algorithm")] = None,
+) -> CompletedUploadInfo:
+    if bool(file_hash) != bool(algorithm):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Both 'hash' and 'algorithm' must be provided together or both omitted.")
+    # Assembly copies and hashes the whole object
+    await admission(None, hashing=True)
+    try:
+        upload = await upload_manager.complete(upload_id, expected_hashes={algorithm: file_hash} if algorithm and file_hash else None)
+    except UploadNotFoundError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e)) from e
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)) from e
+    return CompletedUploadInfo.from_upload(upload)
+
+
+@router.delete("/uploads/{upload_id}", status_code=status.HTTP_204_NO_CONTENT, response_class=Response)
+async def abort_upload(
+    upload_id: str,
+    upload_manager: UploadManagerDep,
+) -> Response:
+    try:
+        await upload_manager.abort(upload_id)
+    except UploadNotFoundError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e)) from e
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e)) from e
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
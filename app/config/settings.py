@@ -5,7 +5,7 @@ from dotenv import load_dotenv
 from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
-from app.storage.enums import StorageDriverType
+from app.storage.enums import Compression, ExecutorKind, FsyncPolicy, IOBackendKind, StorageDriverType, TierMode
 
 load_dotenv(".env")
 load_dotenv(f".env.{os.getenv('APP_ENV', 'development')}", override=True)
@@ -23,5 +23,62 @@ class Settings(BaseSettings):
     debug: bool = Field(default=True)
     storage_driver: StorageDriverType = Field(default=StorageDriverType.LOCAL)
     base_dir: str = Field(default="./storage")
+    fsync_policy: FsyncPolicy = Field(default=FsyncPolicy.NONE)
+    chunk_size: int = Field(default=64 * 1024, gt=0)
+    max_chunk_size: int = Field(default=1024 * 1024, gt=0)
+    write_buffer_size: int = Field(default=1024 * 1024, gt=0)
+    io_backend: IOBackendKind = Field(default=IOBackendKind.AIOFILES)
+    io_batch_chunks: int = Field(default=4, gt=0)
+    compression: Compression = Field(default=Compression.NONE)
+    compression_level: int | None = Field(default=None)
+    compression_min_ratio: float = Field(default=0.9, gt=0, le=1)
+    shard_levels: int = Field(default=0, ge=0, le=4)
+    shard_width: int = Field(default=2, ge=1, le=8)
+    shard_fallback: bool = Field(default=True)
+    read_cache_bytes: int = Field(default=0, ge=0)
+    read_cache_max_object_size: int = Field(default=256 * 1024, gt=0)
+    read_cache_ttl: float = Field(default=5.0, gt=0)
+    tier_capacity_dir: str | None = Field(default=None)
+    tier_mode: TierMode = Field(default=TierMode.WRITE_THROUGH)
+    tier_fast_max_bytes: int = Field(default=10 * 1024 * 1024 * 1024, gt=0)
+    tier_promote_max_size: int | None = Field(default=None, gt=0)
+    tier_workers: int = Field(default=4, gt=0)
+    replica_dirs: list[str] = Field(default_factory=list)
+    replica_copies: int = Field(default=2, gt=0)
+    replica_min_copies: int = Field(default=1, gt=0)
+    replica_hedge_delay: float = Field(default=0.02, ge=0)
+    staging_max_age: float = Field(default=24 * 60 * 60, ge=0)
+    cas_algorithm: str = Field(default="sha256")
+    cas_fanout_levels: int = Field(default=2, ge=0)
+    fs_workers: int = Field(default=16, gt=0)
+    digest_cache_size: int = Field(default=1024, ge=0)
+    hash_executor: ExecutorKind = Field(default=ExecutorKind.THREAD)
+    hash_workers: int = Field(default=0, ge=0)
+    hash_inline_threshold: int = Field(default=1024 * 1024, ge=0)
+    hash_buffer_size: int = Field(default=1024 * 1024, gt=0)
+    metadata_index: bool = Field(default=False)
+    metadata_index_path: str | None = Field(default=None)
+    spool_dir: str | None = Field(default=None)
+    ingest_workers: int = Field(default=4, gt=0)
+    ingest_max_pending: int = Field(default=64, ge=0)
+    ingest_spool_max_age: float = Field(default=24 * 60 * 60, ge=0)
+    batch_concurrency: int = Field(default=32, gt=0)
+    batch_max_items: int = Field(default=100_000, gt=0)
+    metrics_enabled: bool = Field(default=True)
+    loop_lag_interval: float = Field(default=0.5, gt=0)
+    admission_enabled: bool = Field(default=False)
+    admission_tenant_header: str = Field(default="X-Tenant-Id")
+    admission_small_object_size: int = Field(default=1024 * 1024, ge=0)
+    admission_small_streams: int = Field(default=256, gt=0)
+    admission_large_streams: int = Field(default=16, gt=0)
+    admission_hash_jobs: int = Field(default=0, ge=0)
+    admission_max_queued: int = Field(default=1024, ge=0)
+    admission_max_wait: float = Field(default=5.0, ge=0)
+    admission_tenant_bytes_per_second: float = Field(default=0, ge=0)
+    admission_tenant_burst_bytes: float = Field(default=64 * 1024 * 1024, gt=0)
+    admission_retry_after: float = Field(default=1.0, gt=0)
+    uploads_dir: str | None = Field(default=None)
+    upload_max_parts: int = Field(default=10_000, gt=0)
+    upload_max_age: float = Field(default=7 * 24 * 60 * 60, ge=0)
 
     model_config = SettingsConfigDict(case_sensitive=True, env_file=".env", env_file_encoding="utf-8", extra="allow")
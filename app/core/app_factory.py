@@ -1,16 +1,40 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 
+from app.api.middleware import AdmissionMiddleware, MetricsMiddleware
 from app.api.router import api_router
 from app.config.settings import Settings
+from app.core.metrics import Metrics
+from app.core.resources import AppResources, build_admission_controller
 
 
 def create_app(settings: Settings) -> FastAPI:
+    metrics = Metrics()
+    admission = build_admission_controller(settings)
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        resources = AppResources(settings, metrics=metrics, admission=admission)
+        await resources.startup()
+        app.state.resources = resources
+        try:
+            yield
+        finally:
+            await resources.shutdown()
+
     app = FastAPI(
         title="Simple Data Keeper",
         debug=settings.debug,
         docs_url="/docs" if settings.env in ["development", "diagnostic"] else None,
         openapi_url="/openapi.json" if settings.env in ["development", "diagnostic"] else None,
+        lifespan=lifespan,
     )
 
+    if admission is not None:
+        app.add_middleware(AdmissionMiddleware, controller=admission)
+    # Added last so it is outermost and request latency includes time spent waiting for admission
+    if settings.metrics_enabled:
+        app.add_middleware(MetricsMiddleware, metrics=metrics)
     app.include_router(api_router)
     return app
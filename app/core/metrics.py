@@ -0,0 +1,222 @@
+import asyncio
+import contextlib
+import math
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from collections.abc import Callable, Iterator, Sequence
+
+# Instruments are only updated from the event loop, so recording is a dict lookup and an add, with no locking
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+LAG_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+LabelValues = tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values, strict=True)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric(ABC):
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+
+    def _check(self, values: LabelValues) -> None:
+        if len(values) != len(self.labels):
+            raise ValueError(f"{self.name} expects labels {self.labels}, got {values}")
+
+    @abstractmethod
+    def samples(self) -> Iterator[str]: ...
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} {self.kind}"
+        yield from self.samples()
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        super().__init__(name, help_text, labels)
+        self._values: dict[LabelValues, float] = {}
+
+    def inc(self, *values: str, amount: float = 1.0) -> None:
+        try:
+            self._values[values] += amount
+        except KeyError:
+            self._check(values)
+            self._values[values] = amount
+
+    def set_total(self, *values: str, total: float) -> None:
+        # For totals tracked elsewhere (cache hit counters) and copied in at scrape time
+        self._check(values)
+        self._values[values] = total
+
+    def value(self, *values: str) -> float:
+        return self._values.get(values, 0.0)
+
+    def samples(self) -> Iterator[str]:
+        for values, value in sorted(self._values.items()):
+            yield f"{self.name}{_format_labels(self.labels, values)} {_format_value(value)}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, *values: str, value: float) -> None:
+        self.set_total(*values, total=value)
+
+    def dec(self, *values: str, amount: float = 1.0) -> None:
+        self.inc(*values, amount=-amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: one count per bucket plus the +Inf overflow, then the running sum
+        self._values: dict[LabelValues, tuple[list[int], list[float]]] = {}
+
+    def observe(self, value: float, *values: str) -> None:
+        entry = self._values.get(values)
+        if entry is None:
+            self._check(values)
+            entry = self._values[values] = ([0] * (len(self.buckets) + 1), [0.0])
+        entry[0][bisect_left(self.buckets, value)] += 1
+        entry[1][0] += value
+
+    def count(self, *values: str) -> int:
+        entry = self._values.get(values)
+        return sum(entry[0]) if entry is not None else 0
+
+    def samples(self) -> Iterator[str]:
+        for values, (counts, total) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), counts, strict=True):
+                cumulative += count
+                labels = _format_labels((*self.labels, "le"), (*values, _format_value(bound)))
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labels, values)
+            yield f"{self.name}_sum{labels} {_format_value(total[0])}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+        self._collectors: list[Callable[[], None]] = []
+
+    def _register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric '{metric.name}' is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str, labels: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help_text, labels))  # type: ignore[return-value]
+
+    def gauge(self, name: str, help_text: str, labels: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, help_text, labels))  # type: ignore[return-value]
+
+    def histogram(self, name: str, help_text: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, labels, buckets))  # type: ignore[return-value]
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        # Collectors run before each scrape to copy in values owned by other components
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        for collector in self._collectors:
+            collector()
+        lines = [line for metric in self._metrics.values() for line in metric.render()]
+        return "\n".join(lines) + "\n"
+
+
+class Metrics:
+    # The service's instruments; one instance per app, shared by the middleware, the driver wrapper and /metrics
+    def __init__(self):
+        self.registry = registry = Registry()
+        self.http_requests = registry.counter("keeper_http_requests_total", "HTTP requests by route and status", ("method", "route", "status"))
+        self.http_duration = registry.histogram(
+            "keeper_http_request_duration_seconds",
+            "Time from request start until the last response byte was sent",
+            ("method", "route"),
+        )
+        self.http_received_bytes = registry.counter("keeper_http_received_bytes_total", "Request body bytes received", ("route",))
+        self.http_sent_bytes = registry.counter("keeper_http_sent_bytes_total", "Response body bytes sent", ("route",))
+        self.http_in_flight = registry.gauge("keeper_http_requests_in_flight", "Requests currently being handled, including open streams")
+        self.storage_duration = registry.histogram(
+            "keeper_storage_operation_duration_seconds",
+            "Storage driver call duration; streamed reads and writes are timed until the stream ends",
+            ("operation",),
+        )
+        self.storage_errors = registry.counter("keeper_storage_errors_total", "Storage driver calls that raised", ("operation", "error"))
+        self.storage_bytes = registry.counter("keeper_storage_bytes_total", "Bytes moved through the storage driver", ("direction",))
+        self.storage_streams = registry.gauge("keeper_storage_streams_in_flight", "Open storage read and write streams", ("direction",))
+        self.cache_hits = registry.counter("keeper_cache_hits_total", "Cache lookups that were answered from memory", ("cache",))
+        self.cache_misses = registry.counter("keeper_cache_misses_total", "Cache lookups that missed", ("cache",))
+        self.cache_entries = registry.gauge("keeper_cache_entries", "Entries currently held", ("cache",))
+        self.ingest_pending = registry.gauge("keeper_ingest_pending_jobs", "Background uploads waiting for or being processed by a worker")
+        self.admission_active = registry.gauge("keeper_admission_active", "Admitted requests holding a slot", ("lane",))
+        self.admission_queued = registry.gauge("keeper_admission_queued", "Requests waiting for a slot", ("lane",))
+        self.admission_rejected = registry.counter("keeper_admission_rejected_total", "Requests turned away with 429", ("lane", "reason"))
+        self.loop_lag = registry.histogram("keeper_event_loop_lag_seconds", "How late the event loop ran a timer callback", buckets=LAG_BUCKETS)
+        self.loop_lag_max = registry.gauge("keeper_event_loop_lag_max_seconds", "Largest event loop lag seen since the last scrape")
+        registry.add_collector(self._reset_lag_max)
+        self._lag_max = 0.0
+
+    def record_loop_lag(self, lag: float) -> None:
+        self.loop_lag.observe(lag)
+        self._lag_max = max(self._lag_max, lag)
+
+    def _reset_lag_max(self) -> None:
+        self.loop_lag_max.set(value=self._lag_max)
+        self._lag_max = 0.0
+
+    def render(self) -> str:
+        return self.registry.render()
+
+
+class LoopLagMonitor:
+    # Sleeps for a fixed interval and records how much later than asked the loop woke it up
+    def __init__(self, metrics: Metrics, interval: float = 0.5):
+        self.metrics = metrics
+        self.interval = interval
+        self._task: asyncio.Task | None = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            self.metrics.record_loop_lag(max(0.0, loop.time() - started - self.interval))
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
@@ -0,0 +1,139 @@
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+from app.config.settings import Settings
+from app.core.metrics import LoopLagMonitor, Metrics
+from app.services.admission import AdmissionController
+from app.services.file_service import FileService
+from app.services.ingest import IngestQueue
+from app.services.uploads import UploadManager
+from app.storage.base import StorageDriver
+from app.storage.caching import ObjectCache
+from app.storage.digest_cache import DigestCache
+from app.storage.enums import ExecutorKind
+from app.storage.factory import build_storage_driver
+from app.storage.index import MetadataIndex
+from app.storage.local import INTERNAL_DIR
+
+
+def build_admission_controller(settings: Settings) -> AdmissionController | None:
+    if not settings.admission_enabled:
+        return None
+    return AdmissionController(
+        small_streams=settings.admission_small_streams,
+        large_streams=settings.admission_large_streams,
+        small_object_size=settings.admission_small_object_size,
+        hash_jobs=settings.admission_hash_jobs or os.cpu_count() or 1,
+        max_queued=settings.admission_max_queued,
+        max_wait=settings.admission_max_wait,
+        tenant_bytes_per_second=settings.admission_tenant_bytes_per_second,
+        tenant_burst_bytes=settings.admission_tenant_burst_bytes,
+        retry_after=settings.admission_retry_after,
+    )
+
+
+class AppResources:
+    # Everything that is expensive to build lives here for the lifetime of the process,
+    # so request dependencies only hand out references.
+    def __init__(self, settings: Settings, metrics: Metrics | None = None, admission: AdmissionController | None = None):
+        self.settings = settings
+        self.metrics = metrics or Metrics()
+        self.admission = admission
+        self.loop_lag_monitor: LoopLagMonitor | None = None
+        self.fs_executor: Executor | None = None
+        self.hash_executor: Executor | None = None
+        self.digest_cache: DigestCache | None = None
+        self.object_cache: ObjectCache | None = None
+        self.metadata_index: MetadataIndex | None = None
+        self.driver: StorageDriver | None = None
+        self.ingest_queue: IngestQueue | None = None
+        self.file_service: FileService | None = None
+        self.upload_manager: UploadManager | None = None
+
+    def _internal_path(self, *parts: str) -> str:
+        return os.path.join(self.settings.base_dir, INTERNAL_DIR, *parts)
+
+    def _build_hash_executor(self) -> Executor:
+        workers = self.settings.hash_workers or os.cpu_count() or 1
+        if self.settings.hash_executor == ExecutorKind.PROCESS:
+            return ProcessPoolExecutor(max_workers=workers)
+        return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="hash")
+
+    async def startup(self) -> None:
+        settings = self.settings
+        self.fs_executor = ThreadPoolExecutor(max_workers=settings.fs_workers, thread_name_prefix="fs")
+        self.hash_executor = self._build_hash_executor()
+        if settings.digest_cache_size > 0:
+            self.digest_cache = DigestCache(settings.digest_cache_size)
+        if settings.read_cache_bytes > 0:
+            self.object_cache = ObjectCache(settings.read_cache_bytes, settings.read_cache_max_object_size, settings.read_cache_ttl)
+
+        if settings.metadata_index:
+            self.metadata_index = MetadataIndex(settings.metadata_index_path or self._internal_path("index.sqlite3"))
+
+        self.driver = build_storage_driver(
+            settings,
+            digest_cache=self.digest_cache,
+            hash_executor=self.hash_executor,
+            fs_executor=self.fs_executor,
+            metadata_index=self.metadata_index,
+            object_cache=self.object_cache,
+            metrics=self.metrics if settings.metrics_enabled else None,
+        )
+        await self.driver.startup()
+
+        self.ingest_queue = IngestQueue(
+            driver=self.driver,
+            spool_dir=settings.spool_dir or self._internal_path("spool"),
+            workers=settings.ingest_workers,
+            max_pending=settings.ingest_max_pending,
+            chunk_size=settings.write_buffer_size,
+            fs_executor=self.fs_executor,
+            spool_max_age=settings.ingest_spool_max_age,
+        )
+        await self.ingest_queue.start()
+        self.file_service = FileService(driver=self.driver, ingest_queue=self.ingest_queue)
+
+        self.upload_manager = UploadManager(
+            driver=self.driver,
+            uploads_dir=settings.uploads_dir or self._internal_path("uploads"),
+            max_parts=settings.upload_max_parts,
+            max_age=settings.upload_max_age,
+            chunk_size=settings.write_buffer_size,
+            fs_executor=self.fs_executor,
+        )
+        await self.upload_manager.cleanup()
+
+        if settings.metrics_enabled:
+            self.metrics.registry.add_collector(self._collect_metrics)
+            self.loop_lag_monitor = LoopLagMonitor(self.metrics, settings.loop_lag_interval)
+            self.loop_lag_monitor.start()
+
+    def _collect_metrics(self) -> None:
+        # Components that keep their own counters are copied into the registry at scrape time
+        metrics = self.metrics
+        if self.ingest_queue is not None:
+            metrics.ingest_pending.set(value=self.ingest_queue.pending)
+        for name, cache in (("digest", self.digest_cache), ("object", self.object_cache)):
+            if cache is not None:
+                stats = cache.stats()
+                metrics.cache_hits.set_total(name, total=stats["hits"])
+                metrics.cache_misses.set_total(name, total=stats["misses"])
+                metrics.cache_entries.set(name, value=stats["entries"])
+        if self.admission is not None:
+            for lane, stats in self.admission.stats().items():
+                metrics.admission_active.set(lane, value=stats["active"])
+                metrics.admission_queued.set(lane, value=stats["queued"])
+
+    async def shutdown(self) -> None:
+        if self.loop_lag_monitor is not None:
+            await self.loop_lag_monitor.stop()
+        if self.ingest_queue is not None:
+            await self.ingest_queue.stop()
+        if self.driver is not None:
+            await self.driver.shutdown()
+        if self.metadata_index is not None:
+            self.metadata_index.close()
+        for executor in (self.hash_executor, self.fs_executor):
+            if executor is not None:
+                executor.shutdown(wait=True)
@@ -0,0 +1,51 @@
+from typing import Annotated
+
+from fastapi import Depends, HTTPException, Request, status
+
+from app.api.middleware import PERMITS_SCOPE_KEY
+from app.core.metrics import Metrics
+from app.deps.resources import ResourcesDep
+from app.services.admission import AdmissionController, AdmissionRejectedError
+
+
+class RequestAdmission:
+    # Called by a route once it knows how big the transfer is; without a controller every request is admitted
+    def __init__(self, request: Request, controller: AdmissionController | None, tenant_header: str, metrics: Metrics | None = None):
+        self.request = request
+        self.controller = controller
+        self.tenant_header = tenant_header
+        self.metrics = metrics
+
+    @property
+    def tenant(self) -> str:
+        tenant = self.request.headers.get(self.tenant_header)
+        if tenant:
+            return tenant
+        return self.request.client.host if self.request.client else "anonymous"
+
+    @property
+    def content_length(self) -> int | None:
+        value = self.request.headers.get("content-length")
+        return int(value) if value and value.isdigit() else None
+
+    async def __call__(self, size: int | None, hashing: bool = False) -> None:
+        permits = self.request.scope.get(PERMITS_SCOPE_KEY)
+        if self.controller is None or permits is None:
+            return
+        try:
+            permits.append(await self.controller.admit(self.tenant, size, hashing=hashing))
+        except AdmissionRejectedError as e:
+            if self.metrics is not None:
+                self.metrics.admission_rejected.inc(e.lane, e.reason)
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail=str(e),
+                headers={"Retry-After": e.retry_after_header},
+            ) from e
+
+
+def get_admission(request: Request, resources: ResourcesDep) -> RequestAdmission:
+    return RequestAdmission(request, resources.admission, resources.settings.admission_tenant_header, resources.metrics)
+
+
+AdmissionDep = Annotated[RequestAdmission, Depends(get_admission)]
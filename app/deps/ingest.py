@@ -0,0 +1,13 @@
+from typing import Annotated
+
+from fastapi import Depends
+
+from app.deps.resources import ResourcesDep
+from app.services.ingest import IngestQueue
+
+
+def get_ingest_queue(resources: ResourcesDep) -> IngestQueue | None:
+    return resources.ingest_queue
+
+
+IngestQueueDep = Annotated[IngestQueue | None, Depends(get_ingest_queue)]
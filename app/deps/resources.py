@@ -0,0 +1,12 @@
+from typing import Annotated
+
+from fastapi import Depends, Request
+
+from app.core.resources import AppResources
+
+
+def get_resources(request: Request) -> AppResources:
+    return request.app.state.resources
+
+
+ResourcesDep = Annotated[AppResources, Depends(get_resources)]
@@ -2,12 +2,12 @@ from typing import Annotated
 
 from fastapi import Depends
 
-from app.deps.storage import DriverDep
+from app.deps.resources import ResourcesDep
 from app.services.file_service import FileService
 
 
-def get_file_service(driver: DriverDep) -> FileService:
-    return FileService(driver=driver)
+def get_file_service(resources: ResourcesDep) -> FileService:
+    return resources.file_service
 
 
 FileServiceDep = Annotated[FileService, Depends(get_file_service)]
@@ -1,3 +1,4 @@
+from functools import lru_cache
 from typing import Annotated
 
 from fastapi import Depends
@@ -5,6 +6,7 @@ from fastapi import Depends
 from app.config.settings import Settings
 
 
+@lru_cache
 def get_settings() -> Settings:
     return Settings()
 
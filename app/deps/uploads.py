@@ -0,0 +1,13 @@
+from typing import Annotated
+
+from fastapi import Depends
+
+from app.deps.resources import ResourcesDep
+from app.services.uploads import UploadManager
+
+
+def get_upload_manager(resources: ResourcesDep) -> UploadManager:
+    return resources.upload_manager
+
+
+UploadManagerDep = Annotated[UploadManager, Depends(get_upload_manager)]
@@ -0,0 +1,39 @@
+from typing import Optional
+
+from pydantic import BaseModel, Field
+
+from app.services.archives import ImportResult
+from app.storage.enums import Compression
+
+
+class ArchiveExportRequest(BaseModel):
+    # Either an explicit list of ids or everything under a prefix
+    file_ids: Optional[list[str]] = Field(default=None, min_length=1)
+    prefix: str = ""
+    compression: Compression = Compression.NONE
+    # Digests to record per entry as PAX headers, for the importer to verify
+    hashes: list[str] = Field(default_factory=list)
+
+
+class ArchiveEntryError(BaseModel):
+    file_id: str
+    error: str
+
+
+class ArchiveImportInfo(BaseModel):
+    imported: int
+    bytes: int
+    skipped: int
+    failed: int
+    # The first failures only; `failed` counts all of them
+    errors: list[ArchiveEntryError]
+
+    @classmethod
+    def from_result(cls, result: ImportResult) -> "ArchiveImportInfo":
+        return cls(
+            imported=result.imported,
+            bytes=result.bytes,
+            skipped=result.skipped,
+            failed=result.failed,
+            errors=[ArchiveEntryError(**error) for error in result.errors],
+        )
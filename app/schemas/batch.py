@@ -0,0 +1,16 @@
+from enum import Enum
+
+from pydantic import BaseModel, Field
+
+
+class BatchOperation(str, Enum):
+    EXISTS = "exists"
+    SIZE = "size"
+    HASH = "hash"
+    DELETE = "delete"
+
+
+class BatchRequest(BaseModel):
+    operation: BatchOperation
+    file_ids: list[str] = Field(min_length=1)
+    algorithm: str = "sha256"
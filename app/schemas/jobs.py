@@ -0,0 +1,16 @@
+from typing import Optional
+
+from pydantic import BaseModel
+
+from app.services.ingest import IngestJob, JobStatus
+
+
+class JobInfo(BaseModel):
+    job_id: str
+    file_id: str
+    status: JobStatus
+    error: Optional[str] = None
+
+    @classmethod
+    def from_job(cls, job: IngestJob) -> "JobInfo":
+        return cls(job_id=job.job_id, file_id=job.file_id, status=job.status, error=job.error)
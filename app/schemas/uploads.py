@@ -0,0 +1,41 @@
+from pydantic import BaseModel
+
+from app.services.uploads import CompletedUpload, UploadPart, UploadSession
+
+
+class PartInfo(BaseModel):
+    part_number: int
+    size: int
+    sha256: str
+
+    @classmethod
+    def from_part(cls, part: UploadPart) -> "PartInfo":
+        return cls(part_number=part.number, size=part.size, sha256=part.digest)
+
+
+class UploadInfo(BaseModel):
+    upload_id: str
+    file_id: str
+    parts: list[PartInfo] = []
+
+    @classmethod
+    def from_session(cls, session: UploadSession) -> "UploadInfo":
+        return cls(upload_id=session.upload_id, file_id=session.file_id, parts=[PartInfo.from_part(part) for part in session.parts])
+
+
+class CompletedUploadInfo(BaseModel):
+    file_id: str
+    size: int
+    parts: int
+    composite_digest: str
+    digests: dict[str, str] = {}
+
+    @classmethod
+    def from_upload(cls, upload: CompletedUpload) -> "CompletedUploadInfo":
+        return cls(
+            file_id=upload.file_id,
+            size=upload.size,
+            parts=upload.parts,
+            composite_digest=upload.composite_digest,
+            digests=dict(upload.digests),
+        )
@@ -0,0 +1,195 @@
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+
+
+class AdmissionRejectedError(Exception):
+    def __init__(self, message: str, retry_after: float, lane: str, reason: str):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.lane = lane
+        self.reason = reason
+
+    @property
+    def retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class TokenBucket:
+    # Tokens may go negative: a large object is admitted once enough tokens have accrued to cover the
+    # burst and the debt delays whatever the tenant sends next.
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float, max_delay: float) -> float | None:
+        # Returns how long to wait before using `amount`, or None (and takes nothing) if that is longer than max_delay
+        self._refill()
+        delay = max(0.0, min(amount, self.burst) - self.tokens) / self.rate
+        if delay > max_delay:
+            return None
+        self.tokens -= amount
+        return delay
+
+    def charge(self, amount: float) -> None:
+        self._refill()
+        self.tokens -= amount
+
+    def retry_after(self, amount: float) -> float:
+        self._refill()
+        return max(0.0, min(amount, self.burst) - self.tokens) / self.rate
+
+    @property
+    def full(self) -> bool:
+        self._refill()
+        return self.tokens >= self.burst
+
+
+class FairLane:
+    # A counting semaphore whose waiters are queued per tenant and woken round-robin, so one tenant's
+    # burst waits behind its own requests instead of everyone else's.
+    def __init__(self, name: str, limit: int, max_queued: int):
+        self.name = name
+        self.limit = limit
+        self.max_queued = max_queued
+        self.active = 0
+        self.queued = 0
+        self._waiters: OrderedDict[str, deque[asyncio.Future[None]]] = OrderedDict()
+
+    async def acquire(self, tenant: str, timeout: float, retry_after: float) -> None:
+        if self.active < self.limit and not self.queued:
+            self.active += 1
+            return
+        if self.queued >= self.max_queued:
+            raise AdmissionRejectedError(f"Too many queued {self.name} requests", retry_after, self.name, "queue_full")
+
+        waiter: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(tenant, deque()).append(waiter)
+        self.queued += 1
+        try:
+            async with asyncio.timeout(timeout):
+                await waiter
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we gave up
+                self.release()
+            else:
+                self._discard(tenant, waiter)
+            if isinstance(e, TimeoutError):
+                raise AdmissionRejectedError(f"Timed out waiting for a {self.name} slot", retry_after, self.name, "timeout") from e
+            raise
+
+    def _discard(self, tenant: str, waiter: asyncio.Future[None]) -> None:
+        queue = self._waiters.get(tenant)
+        if queue is None or waiter not in queue:
+            return
+        queue.remove(waiter)
+        self.queued -= 1
+        if not queue:
+            del self._waiters[tenant]
+
+    def release(self) -> None:
+        while self._waiters:
+            tenant, queue = next(iter(self._waiters.items()))
+            waiter = queue.popleft()
+            self.queued -= 1
+            if queue:
+                self._waiters.move_to_end(tenant)
+            else:
+                del self._waiters[tenant]
+            if not waiter.done():
+                # The slot passes straight to the waiter, so `active` stays the same
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+
+@dataclass
+class Permit:
+    tenant: str
+    charged: int = 0
+    lanes: list[FairLane] = field(default_factory=list)
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        small_streams: int = 256,
+        large_streams: int = 16,
+        small_object_size: int = 1024 * 1024,
+        hash_jobs: int = 8,
+        max_queued: int = 1024,
+        max_wait: float = 5.0,
+        tenant_bytes_per_second: float = 0,
+        tenant_burst_bytes: float = 64 * 1024 * 1024,
+        retry_after: float = 1.0,
+        max_tenants: int = 10_000,
+    ):
+        self.small = FairLane("small", small_streams, max_queued)
+        self.large = FairLane("large", large_streams, max_queued)
+        self.hashing = FairLane("hash", hash_jobs, max_queued)
+        self.small_object_size = small_object_size
+        self.max_wait = max_wait
+        self.tenant_bytes_per_second = tenant_bytes_per_second
+        self.tenant_burst_bytes = tenant_burst_bytes
+        self.retry_after = retry_after
+        self.max_tenants = max_tenants
+        self._buckets: dict[str, TokenBucket] = {}
+
+    def lane_for(self, size: int | None) -> FairLane:
+        # Unknown sizes (chunked uploads) are treated as large
+        return self.small if size is not None and size <= self.small_object_size else self.large
+
+    def _bucket(self, tenant: str) -> TokenBucket:
+        bucket = self._buckets.get(tenant)
+        if bucket is None:
+            if len(self._buckets) >= self.max_tenants:
+                # Full buckets carry no state worth keeping
+                self._buckets = {key: value for key, value in self._buckets.items() if not value.full}
+            bucket = self._buckets[tenant] = TokenBucket(self.tenant_bytes_per_second, self.tenant_burst_bytes)
+        return bucket
+
+    async def admit(self, tenant: str, size: int | None, hashing: bool = False) -> Permit:
+        permit = Permit(tenant)
+        lane = self.lane_for(size)
+        delay = 0.0
+        if self.tenant_bytes_per_second > 0 and size:
+            bucket = self._bucket(tenant)
+            delay = bucket.reserve(size, self.max_wait)
+            if delay is None:
+                raise AdmissionRejectedError("Tenant byte rate exceeded", bucket.retry_after(size), lane.name, "rate")
+            permit.charged = size
+
+        try:
+            if delay:
+                await asyncio.sleep(delay)
+            for needed in (lane, self.hashing) if hashing else (lane,):
+                await needed.acquire(tenant, self.max_wait, self.retry_after)
+                permit.lanes.append(needed)
+        except BaseException:
+            self.release(permit)
+            if permit.charged:
+                # Nothing was transferred, so the tenant gets its bytes back
+                self._bucket(tenant).charge(-permit.charged)
+            raise
+        return permit
+
+    def release(self, permit: Permit, transferred: int = 0) -> None:
+        while permit.lanes:
+            permit.lanes.pop().release()
+        # Bytes beyond what was charged up front (uploads of unknown size) are billed afterwards
+        if self.tenant_bytes_per_second > 0 and transferred > permit.charged:
+            self._bucket(permit.tenant).charge(transferred - permit.charged)
+            permit.charged = transferred
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        return {lane.name: {"active": lane.active, "queued": lane.queued, "limit": lane.limit} for lane in (self.small, self.large, self.hashing)}
@@ -0,0 +1,338 @@
+import asyncio
+import tarfile
+from collections.abc import AsyncIterator, Callable, Iterable
+from dataclasses import dataclass, field
+from typing import Any, TypeVar
+
+from app.storage.base import FileStat, StorageDriver
+from app.storage.codecs import Codec, Decompressor
+from app.utils.helpers import bounded_map
+
+T = TypeVar("T")
+
+BLOCK_SIZE = tarfile.BLOCKSIZE
+# PAX records carrying an entry's digests, e.g. KEEPER.hash.sha256=<hex>
+HASH_RECORD_PREFIX = "KEEPER.hash."
+_REGULAR_TYPES = (tarfile.REGTYPE, tarfile.AREGTYPE, tarfile.CONTTYPE)
+# PAX and GNU long-name records are read whole before the entry they describe
+MAX_METADATA_SIZE = 1024 * 1024
+
+
+async def _run(func: Callable[..., T], *args: Any) -> T:
+    # zlib and zstandard release the GIL, so codec work runs off the event loop
+    return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+
+def _padding(size: int) -> bytes:
+    return bytes(-size % BLOCK_SIZE)
+
+
+def tar_header(file_id: str, file_stat: FileStat, digests: dict[str, str]) -> bytes:
+    info = tarfile.TarInfo(file_id)
+    info.size = file_stat.size
+    # Whole seconds keep the header a single ustar block unless a PAX record is needed anyway
+    info.mtime = file_stat.mtime_ns // 1_000_000_000
+    info.mode = 0o644
+    info.pax_headers = {HASH_RECORD_PREFIX + algorithm: digest for algorithm, digest in digests.items()}
+    return info.tobuf(tarfile.PAX_FORMAT, "utf-8", "surrogateescape")
+
+
+async def _describe(
+    driver: StorageDriver,
+    pages: AsyncIterator[list[str]],
+    algorithms: list[str],
+    concurrency: int,
+) -> AsyncIterator[tuple[str, FileStat, dict[str, str]]]:
+    async def describe(file_id: str) -> tuple[FileStat, dict[str, str]]:
+        file_stat = await driver.stat(file_id)
+        return file_stat, await driver.hashes(file_id, algorithms) if algorithms else {}
+
+    async for page in pages:
+        # Metadata for a page is fetched concurrently, but entries go out in page order so archives are reproducible
+        described = {}
+        async for file_id, result in bounded_map(describe, page, concurrency):
+            if isinstance(result, FileNotFoundError):
+                # Deleted since it was listed or asked for
+                continue
+            if isinstance(result, Exception):
+                raise result
+            described[file_id] = result
+        for file_id in page:
+            if file_id in described:
+                yield file_id, *described[file_id]
+
+
+async def _tar_stream(driver: StorageDriver, entries: AsyncIterator[tuple[str, FileStat, dict[str, str]]]) -> AsyncIterator[bytes]:
+    async for file_id, file_stat, digests in entries:
+        body = driver.read(file_id, length=file_stat.size)
+        # Opened before the header goes out, so an object deleted in the meantime is skipped rather than truncated
+        try:
+            first = await anext(body, None)
+        except FileNotFoundError:
+            continue
+        yield tar_header(file_id, file_stat, digests)
+        remaining = file_stat.size
+        chunk = first
+        while chunk is not None:
+            remaining -= len(chunk)
+            yield chunk
+            chunk = await anext(body, None)
+        if remaining:
+            # A short entry would shift every header after it
+            raise RuntimeError(f"File '{file_id}' changed size while it was being archived")
+        yield _padding(file_stat.size)
+    yield bytes(2 * BLOCK_SIZE)
+
+
+async def _coalesce(stream: AsyncIterator[bytes], buffer_size: int) -> AsyncIterator[bytes]:
+    # Headers, padding and small bodies are merged so many small objects don't cost one send (and one compress call) each
+    pending = bytearray()
+    async for chunk in stream:
+        if not pending and len(chunk) >= buffer_size:
+            yield chunk
+            continue
+        pending += chunk
+        if len(pending) >= buffer_size:
+            yield bytes(pending)
+            pending.clear()
+    if pending:
+        yield bytes(pending)
+
+
+async def _compress(stream: AsyncIterator[bytes], codec: Codec) -> AsyncIterator[bytes]:
+    compressor = codec.compressor()
+    async for chunk in stream:
+        if compressed := await _run(compressor.compress, chunk):
+            yield compressed
+    if compressed := await _run(compressor.flush):
+        yield compressed
+
+
+async def _listed(driver: StorageDriver, prefix: str, page_size: int) -> AsyncIterator[list[str]]:
+    cursor = None
+    while True:
+        page = [file_id async for file_id, _ in driver.list(prefix=prefix, cursor=cursor, limit=page_size)]
+        if page:
+            yield page
+        if len(page) < page_size:
+            return
+        cursor = page[-1]
+
+
+async def _given(file_ids: list[str], page_size: int) -> AsyncIterator[list[str]]:
+    for start in range(0, len(file_ids), page_size):
+        yield file_ids[start : start + page_size]
+
+
+def export_archive(
+    driver: StorageDriver,
+    file_ids: list[str] | None = None,
+    prefix: str = "",
+    algorithms: Iterable[str] = (),
+    codec: Codec | None = None,
+    concurrency: int = 32,
+    page_size: int = 1000,
+    buffer_size: int = 256 * 1024,
+) -> AsyncIterator[bytes]:
+    # Streams a tar of the given ids (or of everything under prefix) straight from driver.read(), with no temp files
+    pages = _given(file_ids, page_size) if file_ids is not None else _listed(driver, prefix, page_size)
+    stream = _coalesce(_tar_stream(driver, _describe(driver, pages, list(algorithms), concurrency)), buffer_size)
+    return _compress(stream, codec) if codec is not None else stream
+
+
+class _ArchiveReader:
+    # Pulls exact byte counts out of a (possibly compressed) request body. Only as much is decompressed as the
+    # parser asks for, so a small compressed body can't expand into memory ahead of it.
+    def __init__(self, stream: AsyncIterator[bytes], codec: Codec | None = None, piece_size: int = 1024 * 1024):
+        self.stream = stream
+        self.decompressor = codec.decompressor() if codec is not None else None
+        self.piece_size = piece_size
+        self.buffer = bytearray()
+        self.eof = False
+        # Bytes handed out so far, so a caller can tell how much of an entry a failed save left unread
+        self.position = 0
+
+    async def _decompress(self, decompressor: Decompressor, limit: int) -> bytes:
+        try:
+            return await _run(decompressor.read, limit)
+        except Exception as e:
+            raise ValueError(f"Archive could not be decompressed: {e}") from e
+
+    async def _fill(self, limit: int) -> bool:
+        while True:
+            if self.decompressor is not None and (data := await self._decompress(self.decompressor, limit)):
+                self.buffer += data
+                return True
+            if self.eof:
+                return False
+            chunk = await anext(self.stream, None)
+            if chunk is None:
+                self.eof = True
+                if self.decompressor is not None:
+                    self.decompressor.finish()
+            elif self.decompressor is not None:
+                self.decompressor.feed(chunk)
+            elif chunk:
+                self.buffer += chunk
+                return True
+
+    async def read_exact(self, size: int) -> bytes:
+        while len(self.buffer) < size:
+            if not await self._fill(min(size - len(self.buffer), self.piece_size)):
+                raise ValueError("Archive is truncated")
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        self.position += size
+        return data
+
+    async def chunks(self, size: int) -> AsyncIterator[bytes]:
+        remaining = size
+        while remaining:
+            if not self.buffer and not await self._fill(min(remaining, self.piece_size)):
+                raise ValueError("Archive is truncated")
+            data = bytes(self.buffer[:remaining])
+            del self.buffer[: len(data)]
+            remaining -= len(data)
+            self.position += len(data)
+            yield data
+
+    async def skip(self, size: int) -> None:
+        async for _ in self.chunks(size):
+            pass
+
+
+def _pax_records(data: bytes) -> dict[str, str]:
+    # "<length> <key>=<value>\n", where length counts the whole record
+    records = {}
+    position = 0
+    while position < len(data) and data[position] != 0:
+        length_end = data.find(b" ", position)
+        digits = data[position:length_end] if length_end > position else b""
+        length = int(digits) if digits.isdigit() else 0
+        # A record has to reach past its own "<length> " prefix and end inside the header, or a crafted length would loop forever
+        if not len(digits) + 1 < length <= len(data) - position:
+            raise ValueError("Malformed archive: bad PAX record length")
+        key, _, value = data[length_end + 1 : position + length - 1].partition(b"=")
+        try:
+            records[key.decode("utf-8")] = value.decode("utf-8", "surrogateescape")
+        except UnicodeDecodeError as e:
+            raise ValueError(f"Malformed archive: {e}") from e
+        position += length
+    return records
+
+
+def _entry_size(records: dict[str, str], info: tarfile.TarInfo) -> int:
+    try:
+        size = int(records.get("size", info.size))
+    except ValueError:
+        size = -1
+    if size < 0:
+        raise ValueError("Malformed archive: bad entry size")
+    return size
+
+
+@dataclass
+class ImportResult:
+    imported: int = 0
+    bytes: int = 0
+    skipped: int = 0
+    failed: int = 0
+    # Only the first few failures are described, so an archive of bad entries can't build an unbounded response
+    errors: list[dict[str, str]] = field(default_factory=list)
+    max_errors: int = 100
+
+    def add_error(self, file_id: str, error: str) -> None:
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"file_id": file_id, "error": error})
+
+
+async def import_archive(
+    driver: StorageDriver,
+    stream: AsyncIterator[bytes],
+    codec: Codec | None = None,
+    verify: bool = False,
+    concurrency: int = 32,
+    buffer_limit: int = 1024 * 1024,
+    max_errors: int = 100,
+) -> ImportResult:
+    # Unpacks a streamed tar into driver.save(). Entries up to buffer_limit are read into memory and saved concurrently,
+    # so a run of small objects isn't serialised on per-save latency; larger ones stream straight from the body.
+    reader = _ArchiveReader(stream, codec)
+    result = ImportResult(max_errors=max_errors)
+    slots = asyncio.Semaphore(concurrency)
+    saves: set[asyncio.Task] = set()
+    overrides: dict[str, str] = {}
+
+    async def save(file_id: str, body: AsyncIterator[bytes], size: int, expected_hashes: dict[str, str]) -> None:
+        try:
+            await driver.save(file_id, body, expected_hashes=expected_hashes)
+        except (ValueError, OSError) as e:
+            result.add_error(file_id, str(e))
+        else:
+            result.imported += 1
+            result.bytes += size
+
+    async def save_buffered(file_id: str, data: bytes, expected_hashes: dict[str, str]) -> None:
+        async def body() -> AsyncIterator[bytes]:
+            yield data
+
+        try:
+            await save(file_id, body(), len(data), expected_hashes)
+        finally:
+            slots.release()
+
+    try:
+        while True:
+            block = await reader.read_exact(BLOCK_SIZE)
+            try:
+                info = tarfile.TarInfo.frombuf(block, "utf-8", "surrogateescape")
+            except tarfile.EOFHeaderError:
+                break
+            except tarfile.HeaderError as e:
+                raise ValueError(f"Malformed archive: {e}") from e
+
+            records, overrides = overrides, {}
+            size = _entry_size(records, info)
+            if info.type in (tarfile.XHDTYPE, tarfile.XGLTYPE, tarfile.GNUTYPE_LONGNAME):
+                if size > MAX_METADATA_SIZE:
+                    raise ValueError("Malformed archive: extended header is too large")
+                data = await reader.read_exact(size)
+                await reader.skip(-size % BLOCK_SIZE)
+                if info.type == tarfile.XHDTYPE:
+                    overrides = _pax_records(data)
+                elif info.type == tarfile.GNUTYPE_LONGNAME:
+                    overrides = {"path": data.rstrip(b"\0").decode("utf-8", "surrogateescape")}
+                continue
+
+            if info.type not in _REGULAR_TYPES:
+                # Directories, links and devices have no object to become
+                await reader.skip(size + -size % BLOCK_SIZE)
+                if info.type != tarfile.DIRTYPE:
+                    result.skipped += 1
+                continue
+
+            file_id = records.get("path", info.name).removeprefix("./")
+            expected_hashes = (
+                {key.removeprefix(HASH_RECORD_PREFIX): value for key, value in records.items() if key.startswith(HASH_RECORD_PREFIX)} if verify else {}
+            )
+            if size <= buffer_limit:
+                data = await reader.read_exact(size)
+                await slots.acquire()
+                task = asyncio.ensure_future(save_buffered(file_id, data, expected_hashes))
+                saves.add(task)
+                task.add_done_callback(saves.discard)
+            else:
+                # The body is the request stream itself, so this save has to finish before the next header can be read
+                start = reader.position
+                await save(file_id, reader.chunks(size), size, expected_hashes)
+                # Whatever a failed save left unread still belongs to this entry
+                await reader.skip(size - (reader.position - start))
+            await reader.skip(-size % BLOCK_SIZE)
+        await asyncio.gather(*saves)
+    except BaseException:
+        for task in saves:
+            task.cancel()
+        await asyncio.gather(*saves, return_exceptions=True)
+        raise
+    return result
@@ -1,13 +1,18 @@
-import asyncio
-from typing import AsyncIterator
+from collections.abc import Collection, Iterable
+from typing import Any, AsyncIterator
 
-from app.storage.base import StorageDriver
-from app.utils.helpers import _to_stream
+from app.schemas.batch import BatchOperation
+from app.services.archives import ImportResult, export_archive, import_archive
+from app.services.ingest import IngestJob, IngestQueue
+from app.storage.base import EncodedContent, FileStat, StorageDriver
+from app.storage.codecs import Codec
+from app.utils.helpers import bounded_map
 
 
 class FileService:
-    def __init__(self, driver: StorageDriver):
+    def __init__(self, driver: StorageDriver, ingest_queue: IngestQueue | None = None):
         self.driver = driver
+        self.ingest_queue = ingest_queue
 
     async def save_file(self, file_id: str, stream: AsyncIterator[bytes]) -> None:
         await self.driver.save(file_id, stream)
@@ -19,27 +24,29 @@ class FileService:
         expected_hash: str,
         algorithm: str,
     ) -> None:
-        await self.driver.save(file_id, stream)
-        actual_hash = await self.driver.hash(file_id, algorithm)
-        if actual_hash != expected_hash:
-            raise ValueError(f"Hash mismatch: expected {expected_hash}, got {actual_hash}")
-
-    async def save_file_background(self, file_id: str, stream: AsyncIterator[bytes]) -> None:
-        content = [chunk async for chunk in stream]
-        task = asyncio.create_task(self._save_silent(file_id, b"".join(content)))
-        try:
-            await asyncio.wait_for(task, timeout=0.1)
-        except asyncio.TimeoutError:
-            pass  # Task is running in background
-
-    async def _save_silent(self, file_id: str, content: bytes) -> None:
-        try:
-            await self.driver.save(file_id, _to_stream(content))
-        except Exception:
-            pass
-
-    async def get_file(self, filename: str):
-        return {"filename": filename, "content": self.driver.read(filename)}
+        await self.driver.save(file_id, stream, expected_hashes={algorithm: expected_hash})
+
+    async def save_file_background(self, file_id: str, stream: AsyncIterator[bytes]) -> IngestJob:
+        if self.ingest_queue is None:
+            raise RuntimeError("Background uploads are not enabled")
+        return await self.ingest_queue.submit(file_id, stream)
+
+    def get_background_job(self, job_id: str) -> IngestJob | None:
+        if self.ingest_queue is None:
+            return None
+        return self.ingest_queue.get_job(job_id)
+
+    async def get_file(self, filename: str, offset: int = 0, length: int | None = None):
+        return {"filename": filename, "content": self.driver.read(filename, offset=offset, length=length)}
+
+    async def get_encoded_file(self, filename: str, accepted: Collection[str]) -> EncodedContent | None:
+        return await self.driver.open_encoded(filename, accepted)
+
+    async def get_cached_file(self, filename: str, size: int | None = None) -> bytes | None:
+        return await self.driver.read_cached(filename, size)
+
+    async def get_local_path(self, filename: str) -> str | None:
+        return await self.driver.local_path(filename)
 
     async def read_file_fully(self, filename: str) -> bytes:
         chunks = []
@@ -51,11 +58,8 @@ class FileService:
         return await self.driver.delete(filename)
 
     async def delete_file_checked(self, filename: str):
-        if not await self.driver.exists(filename):
+        if not await self.driver.delete(filename):
             raise RuntimeError(f"File '{filename}' does not exist before deletion")
-        await self.driver.delete(filename)
-        if await self.driver.exists(filename):
-            raise RuntimeError(f"File '{filename}' was not deleted")
 
     async def check_file_exists(self, filename: str):
         return await self.driver.exists(filename)
@@ -63,5 +67,56 @@ class FileService:
     async def get_file_size(self, filename: str):
         return await self.driver.size(filename)
 
+    async def get_file_stat(self, filename: str) -> FileStat:
+        return await self.driver.stat(filename)
+
     async def get_file_hash(self, filename: str, algorithm: str):
         return await self.driver.hash(filename, algorithm)
+
+    def list_files(self, prefix: str = "", cursor: str | None = None, limit: int = 1000) -> AsyncIterator[tuple[str, FileStat]]:
+        return self.driver.list(prefix=prefix, cursor=cursor, limit=limit)
+
+    def export_archive(
+        self,
+        file_ids: list[str] | None = None,
+        prefix: str = "",
+        algorithms: Iterable[str] = (),
+        codec: Codec | None = None,
+        concurrency: int = 32,
+    ) -> AsyncIterator[bytes]:
+        return export_archive(self.driver, file_ids=file_ids, prefix=prefix, algorithms=algorithms, codec=codec, concurrency=concurrency)
+
+    async def import_archive(
+        self,
+        stream: AsyncIterator[bytes],
+        codec: Codec | None = None,
+        verify: bool = False,
+        concurrency: int = 32,
+    ) -> ImportResult:
+        return await import_archive(self.driver, stream, codec=codec, verify=verify, concurrency=concurrency)
+
+    async def run_batch(
+        self,
+        operation: BatchOperation,
+        file_ids: Iterable[str],
+        algorithm: str = "sha256",
+        concurrency: int = 32,
+    ) -> AsyncIterator[dict[str, Any]]:
+        async def run(file_id: str) -> Any:
+            match operation:
+                case BatchOperation.EXISTS:
+                    return await self.driver.exists(file_id)
+                case BatchOperation.SIZE:
+                    return await self.driver.size(file_id)
+                case BatchOperation.HASH:
+                    return await self.driver.hash(file_id, algorithm)
+                case BatchOperation.DELETE:
+                    return await self.driver.delete(file_id)
+
+        async for file_id, result in bounded_map(run, file_ids, concurrency):
+            if isinstance(result, FileNotFoundError):
+                yield {"file_id": file_id, "error": "not_found"}
+            elif isinstance(result, Exception):
+                yield {"file_id": file_id, "error": str(result)}
+            else:
+                yield {"file_id": file_id, "result": result}
@@ -0,0 +1,172 @@
+import asyncio
+import os
+import tempfile
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Callable, Mapping
+from concurrent.futures import Executor
+from dataclasses import dataclass, field
+from enum import Enum
+from functools import partial
+from typing import Any, TypeVar
+
+import aiofiles
+
+from app.storage.base import StorageDriver
+from app.storage.local import _unlink_quietly
+from app.utils.helpers import coalesce_chunks
+
+T = TypeVar("T")
+_SPOOL_PREFIX = "job-"
+
+
+class IngestQueueFullError(RuntimeError):
+    pass
+
+
+def _clear_spool(spool_dir: str, cutoff: float) -> int:
+    # Jobs only live in memory, so whatever a crashed run left spooled can never be picked up. Workers sharing
+    # the spool queue their own jobs here too, so only files older than the cutoff are taken for leftovers.
+    removed = 0
+    with os.scandir(spool_dir) as entries:
+        for entry in entries:
+            try:
+                if entry.name.startswith(_SPOOL_PREFIX) and entry.is_file(follow_symlinks=False) and entry.stat(follow_symlinks=False).st_mtime < cutoff:
+                    os.unlink(entry.path)
+                    removed += 1
+            except FileNotFoundError:
+                pass
+    return removed
+
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+
+@dataclass
+class IngestJob:
+    job_id: str
+    file_id: str
+    spool_path: str
+    expected_hashes: Mapping[str, str] = field(default_factory=dict)
+    status: JobStatus = JobStatus.QUEUED
+    error: str | None = None
+
+
+class IngestQueue:
+    def __init__(
+        self,
+        driver: StorageDriver,
+        spool_dir: str,
+        workers: int = 4,
+        max_pending: int = 64,
+        max_tracked_jobs: int = 10_000,
+        chunk_size: int = 1024 * 1024,
+        fs_executor: Executor | None = None,
+        spool_max_age: float = 24 * 60 * 60,
+    ):
+        self.driver = driver
+        self.spool_dir = spool_dir
+        self.workers = workers
+        self.max_pending = max_pending
+        self.max_tracked_jobs = max_tracked_jobs
+        self.chunk_size = chunk_size
+        self.fs_executor = fs_executor
+        self.spool_max_age = spool_max_age
+        self._queue: asyncio.Queue[IngestJob] = asyncio.Queue()
+        self._jobs: OrderedDict[str, IngestJob] = OrderedDict()
+        self._pending = 0
+        self._tasks: list[asyncio.Task] = []
+        os.makedirs(self.spool_dir, exist_ok=True)
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    async def _run_fs(self, func: Callable[..., T], *args: Any) -> T:
+        return await asyncio.get_running_loop().run_in_executor(self.fs_executor, func, *args)
+
+    async def start(self) -> None:
+        await self._run_fs(_clear_spool, self.spool_dir, time.time() - self.spool_max_age)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self, timeout: float = 30.0) -> None:
+        if self._tasks:
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, file_id: str, stream: AsyncIterator[bytes], expected_hashes: Mapping[str, str] | None = None) -> IngestJob:
+        # The slot is reserved before spooling so a full queue rejects without reading the body
+        if self._pending >= self.max_pending:
+            raise IngestQueueFullError("Background upload queue is full")
+        self._pending += 1
+
+        try:
+            spool_path = await self._spool(stream)
+        except BaseException:
+            self._pending -= 1
+            raise
+
+        job = IngestJob(job_id=uuid.uuid4().hex, file_id=file_id, spool_path=spool_path, expected_hashes=dict(expected_hashes or {}))
+        self._track(job)
+        self._queue.put_nowait(job)
+        return job
+
+    def get_job(self, job_id: str) -> IngestJob | None:
+        return self._jobs.get(job_id)
+
+    async def _spool(self, stream: AsyncIterator[bytes]) -> str:
+        fd, spool_path = await self._run_fs(partial(tempfile.mkstemp, dir=self.spool_dir, prefix=_SPOOL_PREFIX))
+        try:
+            async with aiofiles.open(fd, "wb") as f:
+                async for chunk in coalesce_chunks(stream, self.chunk_size):
+                    await f.write(chunk)
+        except BaseException:
+            # Shielded, so a disconnect that cancelled the spool still waits for the file to go
+            await asyncio.shield(self._run_fs(_unlink_quietly, spool_path))
+            raise
+        return spool_path
+
+    async def _read_spool(self, spool_path: str) -> AsyncIterator[bytes]:
+        async with aiofiles.open(spool_path, "rb") as f:
+            while chunk := await f.read(self.chunk_size):
+                yield chunk
+
+    def _track(self, job: IngestJob) -> None:
+        self._jobs[job.job_id] = job
+        while len(self._jobs) > self.max_tracked_jobs:
+            oldest = next(iter(self._jobs.values()))
+            if oldest.status not in (JobStatus.DONE, JobStatus.FAILED):
+                break
+            self._jobs.popitem(last=False)
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            job.status = JobStatus.RUNNING
+            try:
+                await self.driver.save(job.file_id, self._read_spool(job.spool_path), expected_hashes=job.expected_hashes)
+                job.status = JobStatus.DONE
+            except asyncio.CancelledError:
+                job.status = JobStatus.FAILED
+                job.error = "Cancelled during shutdown"
+                raise
+            except Exception as e:
+                job.status = JobStatus.FAILED
+                job.error = str(e)
+            finally:
+                try:
+                    await asyncio.shield(self._run_fs(_unlink_quietly, job.spool_path))
+                finally:
+                    self._pending -= 1
+                    self._queue.task_done()
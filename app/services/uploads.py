@@ -0,0 +1,230 @@
+import asyncio
+import contextlib
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+import uuid
+from collections.abc import AsyncIterator, Callable, Mapping
+from concurrent.futures import Executor
+from dataclasses import dataclass, field
+from typing import Any, TypeVar
+
+import aiofiles
+
+from app.storage.base import StorageDriver
+from app.storage.hashing import hash_tee, hexdigests, new_hashers, verify_digests
+from app.utils.helpers import coalesce_chunks, mkstemp_shared
+
+T = TypeVar("T")
+
+PART_ALGORITHM = "sha256"
+_SESSION_FILE = "session.json"
+_UPLOAD_ID = re.compile(r"[0-9a-f]{32}")
+_PART_NAME = re.compile(r"part-(\d{5})\.([0-9a-f]{64})")
+
+
+class UploadNotFoundError(FileNotFoundError):
+    pass
+
+
+@dataclass(frozen=True)
+class UploadPart:
+    number: int
+    size: int
+    digest: str
+    path: str
+
+
+@dataclass
+class UploadSession:
+    upload_id: str
+    file_id: str
+    created: float
+    parts: list[UploadPart] = field(default_factory=list)
+
+
+@dataclass(frozen=True)
+class CompletedUpload:
+    file_id: str
+    size: int
+    parts: int
+    composite_digest: str
+    digests: Mapping[str, str]
+
+
+def composite_digest(parts: list[UploadPart]) -> str:
+    # Digest of the part digests, suffixed with the part count, as S3 does for multipart ETags
+    combined = hashlib.new(PART_ALGORITHM, b"".join(bytes.fromhex(part.digest) for part in parts))
+    return f"{combined.hexdigest()}-{len(parts)}"
+
+
+def _list_parts(session_dir: str) -> list[UploadPart]:
+    parts = []
+    with os.scandir(session_dir) as entries:
+        for entry in entries:
+            match = _PART_NAME.fullmatch(entry.name)
+            if match:
+                parts.append(UploadPart(int(match[1]), entry.stat().st_size, match[2], entry.path))
+    return sorted(parts, key=lambda part: part.number)
+
+
+def _replace_part(tmp_path: str, session_dir: str, number: int, digest: str) -> str:
+    # The digest is part of the name, so a re-uploaded part replaces the previous one only once it is complete
+    part_path = os.path.join(session_dir, f"part-{number:05d}.{digest}")
+    os.replace(tmp_path, part_path)
+    for part in _list_parts(session_dir):
+        if part.number == number and part.path != part_path:
+            os.unlink(part.path)
+    return part_path
+
+
+def _remove_stale_sessions(uploads_dir: str, cutoff: float) -> int:
+    removed = 0
+    with os.scandir(uploads_dir) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False) and entry.stat(follow_symlinks=False).st_mtime < cutoff:
+                shutil.rmtree(entry.path, ignore_errors=True)
+                removed += 1
+    return removed
+
+
+class UploadManager:
+    # Sessions live on disk under uploads_dir, so a client can list its parts and resume after
+    # a dropped connection or a restart; parts are only assembled into the driver on complete.
+    def __init__(
+        self,
+        driver: StorageDriver,
+        uploads_dir: str,
+        max_parts: int = 10_000,
+        max_age: float = 7 * 24 * 60 * 60,
+        chunk_size: int = 1024 * 1024,
+        fs_executor: Executor | None = None,
+    ):
+        self.driver = driver
+        self.uploads_dir = uploads_dir
+        self.max_parts = max_parts
+        self.max_age = max_age
+        self.chunk_size = chunk_size
+        self.fs_executor = fs_executor
+        self._completing: set[str] = set()
+        # Per-session locks keep a part from landing in a session that complete is assembling or removing
+        self._locks: dict[str, asyncio.Lock] = {}
+        self._lock_users: dict[str, int] = {}
+        os.makedirs(self.uploads_dir, exist_ok=True)
+
+    async def _run_fs(self, func: Callable[..., T], *args: Any) -> T:
+        return await asyncio.get_running_loop().run_in_executor(self.fs_executor, func, *args)
+
+    @contextlib.asynccontextmanager
+    async def _locked(self, upload_id: str) -> AsyncIterator[None]:
+        lock = self._locks.setdefault(upload_id, asyncio.Lock())
+        self._lock_users[upload_id] = self._lock_users.get(upload_id, 0) + 1
+        try:
+            async with lock:
+                yield
+        finally:
+            self._lock_users[upload_id] -= 1
+            if not self._lock_users[upload_id]:
+                del self._lock_users[upload_id]
+                del self._locks[upload_id]
+
+    def _session_dir(self, upload_id: str) -> str:
+        if not _UPLOAD_ID.fullmatch(upload_id):
+            raise UploadNotFoundError(f"Upload '{upload_id}' not found")
+        return os.path.join(self.uploads_dir, upload_id)
+
+    async def cleanup(self) -> int:
+        return await self._run_fs(_remove_stale_sessions, self.uploads_dir, time.time() - self.max_age)
+
+    async def create(self, file_id: str) -> UploadSession:
+        session = UploadSession(upload_id=uuid.uuid4().hex, file_id=file_id, created=time.time())
+        session_dir = self._session_dir(session.upload_id)
+        await self._run_fs(os.mkdir, session_dir)
+        async with aiofiles.open(os.path.join(session_dir, _SESSION_FILE), "w") as f:
+            await f.write(json.dumps({"file_id": session.file_id, "created": session.created}))
+        return session
+
+    async def get(self, upload_id: str) -> UploadSession:
+        session_dir = self._session_dir(upload_id)
+        try:
+            async with aiofiles.open(os.path.join(session_dir, _SESSION_FILE)) as f:
+                meta = json.loads(await f.read())
+            parts = await self._run_fs(_list_parts, session_dir)
+        except FileNotFoundError as e:
+            raise UploadNotFoundError(f"Upload '{upload_id}' not found") from e
+        return UploadSession(upload_id=upload_id, file_id=meta["file_id"], created=meta["created"], parts=parts)
+
+    async def put_part(self, upload_id: str, number: int, stream: AsyncIterator[bytes], expected_hash: str | None = None) -> UploadPart:
+        if not 1 <= number <= self.max_parts:
+            raise ValueError(f"Part number must be between 1 and {self.max_parts}")
+        session_dir = self._session_dir(upload_id)
+        if upload_id in self._completing:
+            raise ValueError(f"Upload '{upload_id}' is being completed")
+
+        hashers = new_hashers([PART_ALGORITHM])
+        try:
+            async with self._locked(upload_id):
+                fd, tmp_path = await self._run_fs(mkstemp_shared, session_dir, ".part-")
+        except FileNotFoundError as e:
+            raise UploadNotFoundError(f"Upload '{upload_id}' not found") from e
+
+        try:
+            size = 0
+            async with aiofiles.open(fd, "wb") as f:
+                async for chunk in hash_tee(coalesce_chunks(stream, self.chunk_size), hashers):
+                    size += len(chunk)
+                    await f.write(chunk)
+            digest = hexdigests(hashers)[PART_ALGORITHM]
+            if expected_hash:
+                verify_digests({PART_ALGORITHM: digest}, {PART_ALGORITHM: expected_hash})
+            # Waits out a complete that started while the part streamed; the session is gone afterwards
+            async with self._locked(upload_id):
+                part_path = await self._run_fs(_replace_part, tmp_path, session_dir, number, digest)
+        except BaseException as e:
+            try:
+                os.unlink(tmp_path)
+            except FileNotFoundError:
+                pass
+            if isinstance(e, FileNotFoundError) and not isinstance(e, UploadNotFoundError):
+                raise UploadNotFoundError(f"Upload '{upload_id}' not found") from e
+            raise
+        return UploadPart(number=number, size=size, digest=digest, path=part_path)
+
+    async def complete(self, upload_id: str, expected_hashes: Mapping[str, str] | None = None) -> CompletedUpload:
+        if upload_id in self._completing:
+            raise ValueError(f"Upload '{upload_id}' is being completed")
+        self._completing.add(upload_id)
+        try:
+            async with self._locked(upload_id):
+                session = await self.get(upload_id)
+                if not session.parts:
+                    raise ValueError("Upload has no parts")
+                for expected, part in enumerate(session.parts, start=1):
+                    if part.number != expected:
+                        raise ValueError(f"Missing part {expected}")
+
+                digests = await self.driver.save_parts(session.file_id, [part.path for part in session.parts], expected_hashes=expected_hashes)
+                await self._run_fs(shutil.rmtree, self._session_dir(upload_id))
+        finally:
+            self._completing.discard(upload_id)
+
+        return CompletedUpload(
+            file_id=session.file_id,
+            size=sum(part.size for part in session.parts),
+            parts=len(session.parts),
+            composite_digest=composite_digest(session.parts),
+            digests=digests,
+        )
+
+    async def abort(self, upload_id: str) -> None:
+        if upload_id in self._completing:
+            raise ValueError(f"Upload '{upload_id}' is being completed")
+        session_dir = self._session_dir(upload_id)
+        try:
+            async with self._locked(upload_id):
+                await self._run_fs(shutil.rmtree, session_dir)
+        except FileNotFoundError as e:
+            raise UploadNotFoundError(f"Upload '{upload_id}' not found") from e
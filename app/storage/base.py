@@ -1,16 +1,54 @@
 from abc import ABC, abstractmethod
-from collections.abc import AsyncIterator
+from collections.abc import AsyncIterator, Collection, Iterable, Mapping
+from dataclasses import dataclass, field
+
+import aiofiles
+
+from app.storage.hashing import hexdigests, new_hashers
+
+
+async def _read_files(paths: Iterable[str], chunk_size: int = 1024 * 1024) -> AsyncIterator[bytes]:
+    for path in paths:
+        async with aiofiles.open(path, "rb") as f:
+            while chunk := await f.read(chunk_size):
+                yield chunk
+
+
+@dataclass(frozen=True)
+class FileStat:
+    size: int
+    mtime_ns: int
+    digests: Mapping[str, str] = field(default_factory=dict)
+
+
+@dataclass(frozen=True)
+class EncodedContent:
+    coding: str
+    size: int
+    content: AsyncIterator[bytes]
 
 
 class StorageDriver(ABC):
     @abstractmethod
-    async def save(self, path: str, stream: AsyncIterator[bytes]) -> None: ...
+    async def save(
+        self,
+        path: str,
+        stream: AsyncIterator[bytes],
+        expected_hashes: Mapping[str, str] | None = None,
+        algorithms: Iterable[str] = (),
+    ) -> dict[str, str]: ...
 
     @abstractmethod
-    async def read(self, path: str, chunk_size: int | None = None) -> AsyncIterator[bytes]: ...
+    async def read(
+        self,
+        path: str,
+        chunk_size: int | None = None,
+        offset: int = 0,
+        length: int | None = None,
+    ) -> AsyncIterator[bytes]: ...
 
     @abstractmethod
-    async def delete(self, path: str) -> None: ...
+    async def delete(self, path: str) -> bool: ...
 
     @abstractmethod
     async def exists(self, path: str) -> bool: ...
@@ -18,5 +56,48 @@ class StorageDriver(ABC):
     @abstractmethod
     async def size(self, path: str) -> int: ...
 
+    @abstractmethod
+    async def stat(self, path: str) -> FileStat: ...
+
     @abstractmethod
     async def hash(self, path: str, algorithm: str, chunk_size: int | None = None) -> str: ...
+
+    async def hashes(self, path: str, algorithms: Iterable[str], chunk_size: int | None = None) -> dict[str, str]:
+        hashers = new_hashers(algorithms)
+        async for chunk in self.read(path, chunk_size):
+            for hasher in hashers.values():
+                hasher.update(chunk)
+        return hexdigests(hashers)
+
+    async def save_parts(
+        self,
+        path: str,
+        part_paths: Iterable[str],
+        expected_hashes: Mapping[str, str] | None = None,
+        algorithms: Iterable[str] = (),
+    ) -> dict[str, str]:
+        # Stores the concatenation of local part files; drivers that own the disk can assemble without the copy
+        return await self.save(path, _read_files(list(part_paths)), expected_hashes=expected_hashes, algorithms=algorithms)
+
+    async def open_encoded(self, path: str, accepted: Collection[str]) -> EncodedContent | None:
+        # Drivers that keep objects encoded can hand the stored bytes out as-is when the client accepts that coding
+        return None
+
+    async def read_cached(self, path: str, size: int | None = None) -> bytes | None:
+        # Drivers that keep small objects in memory return the whole body so callers can answer with a single response;
+        # a known size lets them turn large objects away without another stat
+        return None
+
+    async def startup(self) -> None:
+        return None
+
+    async def shutdown(self) -> None:
+        return None
+
+    async def local_path(self, path: str) -> str | None:
+        # Drivers backed by a real file expose it so callers can serve it zero-copy
+        return None
+
+    # Yields up to `limit` ids in name order after `cursor`; kept last since it shadows the builtin in the class body
+    @abstractmethod
+    def list(self, prefix: str = "", cursor: str | None = None, limit: int = 1000) -> AsyncIterator[tuple[str, FileStat]]: ...
@@ -0,0 +1,182 @@
+import time
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Collection, Iterable, Mapping
+from dataclasses import dataclass
+
+from app.storage.base import EncodedContent, FileStat, StorageDriver
+
+
+@dataclass(frozen=True)
+class _CachedObject:
+    body: bytes
+    stat: FileStat
+    expires: float
+
+
+class ObjectCache:
+    # Byte-bounded LRU of whole object bodies; only touched from the event loop, so it needs no lock
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, max_object_size: int = 256 * 1024, ttl: float = 5.0):
+        self.max_bytes = max_bytes
+        self.max_object_size = max_object_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._bytes = 0
+        self._entries: OrderedDict[str, _CachedObject] = OrderedDict()
+        # TinyLFU-style doorkeeper: an object is only admitted on its second read, so one-off reads don't evict hot entries
+        self._seen: set[str] = set()
+        self._max_seen = max(1024, max_bytes // max(max_object_size, 1) * 4)
+        # Bumped by every invalidation; a fill that raced a write is dropped instead of caching stale bytes
+        self.epoch = 0
+
+    def get(self, path: str) -> _CachedObject | None:
+        entry = self._entries.get(path)
+        if entry is None:
+            return None
+        if entry.expires < time.monotonic():
+            self._evict(path)
+            return None
+        self._entries.move_to_end(path)
+        return entry
+
+    def admit(self, path: str, size: int) -> bool:
+        if size > self.max_object_size:
+            return False
+        if path in self._seen:
+            return True
+        if len(self._seen) >= self._max_seen:
+            self._seen.clear()
+        self._seen.add(path)
+        return False
+
+    def put(self, path: str, body: bytes, file_stat: FileStat, epoch: int) -> None:
+        if epoch != self.epoch or len(body) > self.max_bytes:
+            return
+        self._evict(path)
+        self._entries[path] = _CachedObject(body, file_stat, time.monotonic() + self.ttl)
+        self._bytes += len(body)
+        while self._bytes > self.max_bytes:
+            self._evict(next(iter(self._entries)))
+
+    def invalidate(self, path: str) -> None:
+        self.epoch += 1
+        self._evict(path)
+
+    def _evict(self, path: str) -> None:
+        entry = self._entries.pop(path, None)
+        if entry is not None:
+            self._bytes -= len(entry.body)
+
+    def stats(self) -> dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+        }
+
+
+class CachingDriver(StorageDriver):
+    # Serves small, repeatedly read objects from memory. Writes through this driver invalidate
+    # immediately; the TTL bounds staleness when other processes write to the same store.
+    def __init__(self, inner: StorageDriver, cache: ObjectCache):
+        self.inner = inner
+        self.cache = cache
+
+    async def read_cached(self, path: str, size: int | None = None) -> bytes | None:
+        entry = self.cache.get(path)
+        if entry is not None:
+            self.cache.hits += 1
+            return entry.body
+
+        self.cache.misses += 1
+        if size is not None and size > self.cache.max_object_size:
+            return None
+        epoch = self.cache.epoch
+        file_stat = await self.inner.stat(path)
+        if not self.cache.admit(path, file_stat.size):
+            return None
+        body = b"".join([chunk async for chunk in self.inner.read(path)])
+        if len(body) == file_stat.size:
+            self.cache.put(path, body, file_stat, epoch)
+        return body
+
+    async def save(
+        self,
+        path: str,
+        stream: AsyncIterator[bytes],
+        expected_hashes: Mapping[str, str] | None = None,
+        algorithms: Iterable[str] = (),
+    ) -> dict[str, str]:
+        try:
+            return await self.inner.save(path, stream, expected_hashes=expected_hashes, algorithms=algorithms)
+        finally:
+            self.cache.invalidate(path)
+
+    async def save_parts(
+        self,
+        path: str,
+        part_paths: Iterable[str],
+        expected_hashes: Mapping[str, str] | None = None,
+        algorithms: Iterable[str] = (),
+    ) -> dict[str, str]:
+        try:
+            return await self.inner.save_parts(path, part_paths, expected_hashes=expected_hashes, algorithms=algorithms)
+        finally:
+            self.cache.invalidate(path)
+
+    async def read(
+        self,
+        path: str,
+        chunk_size: int | None = None,
+        offset: int = 0,
+        length: int | None = None,
+    ) -> AsyncIterator[bytes]:
+        # Only whole-object reads through read_cached fill the cache; ranged and streamed reads just use it
+        entry = self.cache.get(path)
+        if entry is None:
+            async for chunk in self.inner.read(path, chunk_size=chunk_size, offset=offset, length=length):
+                yield chunk
+            return
+        if body := entry.body[offset : None if length is None else offset + length]:
+            yield body
+
+    async def delete(self, path: str) -> bool:
+        try:
+            return await self.inner.delete(path)
+        finally:
+            self.cache.invalidate(path)
+
+    async def exists(self, path: str) -> bool:
+        return self.cache.get(path) is not None or await self.inner.exists(path)
+
+    async def size(self, path: str) -> int:
+        return (await self.stat(path)).size
+
+    async def stat(self, path: str) -> FileStat:
+        entry = self.cache.get(path)
+        return entry.stat if entry is not None else await self.inner.stat(path)
+
+    async def hash(self, path: str, algorithm: str, chunk_size: int | None = None) -> str:
+        return await self.inner.hash(path, algorithm, chunk_size)
+
+    async def hashes(self, path: str, algorithms: Iterable[str], chunk_size: int | None = None) -> dict[str, str]:
+        return await self.inner.hashes(path, algorithms, chunk_size)
+
+    async def local_path(self, path: str) -> str | None:
+        return await self.inner.local_path(path)
+
+    async def open_encoded(self, path: str, accepted: Collection[str]) -> EncodedContent | None:
+        return await self.inner.open_encoded(path, accepted)
+
+    async def startup(self) -> None:
+        await self.inner.startup()
+
+    async def shutdown(self) -> None:
+        await self.inner.shutdown()
+
+    def list(self, prefix: str = "", cursor: str | None = None, limit: int = 1000) -> AsyncIterator[tuple[str, FileStat]]:
+        return self.inner.list(prefix=prefix, cursor=cursor, limit=limit)
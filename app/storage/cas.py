@@ -0,0 +1,139 @@
+import hashlib
+import os
+import re
+import uuid
+from collections.abc import AsyncIterator, Iterable, Mapping
+from typing import Any
+
+from app.storage.digest_cache import DigestCache
+from app.storage.enums import FsyncPolicy
+from app.storage.hashing import verify_digests
+from app.storage.local import LocalFileDriver, _replace_tracked, _unlink_quietly
+
+_HEX_DIGEST = re.compile(r"[0-9a-f]+")
+
+
+def _collect_orphans(blobs_dir: str) -> int:
+    removed = 0
+    for root, _, files in os.walk(blobs_dir):
+        for name in files:
+            blob_path = os.path.join(root, name)
+            try:
+                if os.lstat(blob_path).st_nlink == 1:
+                    os.unlink(blob_path)
+                    removed += 1
+            except FileNotFoundError:
+                pass
+    return removed
+
+
+class ContentAddressedDriver(LocalFileDriver):
+    # Every file id under refs/ is a hard link to a blob stored once under blobs/<fan-out>/<digest>,
+    # so the blob's st_nlink is its reference count and reads keep the plain LocalFileDriver paths.
+    def __init__(
+        self,
+        base_dir: str,
+        default_chunk_size: int = 64 * 1024,
+        fsync_policy: FsyncPolicy = FsyncPolicy.NONE,
+        digest_cache: DigestCache | None = None,
+        algorithm: str = "sha256",
+        fanout_levels: int = 2,
+        fanout_width: int = 2,
+        **kwargs: Any,
+    ):
+        super().__init__(base_dir, default_chunk_size=default_chunk_size, fsync_policy=fsync_policy, digest_cache=digest_cache, **kwargs)
+        if algorithm not in hashlib.algorithms_available:
+            raise ValueError(f"Unsupported hash algorithm: {algorithm}")
+        self.algorithm = algorithm
+        self.digest_length = hashlib.new(algorithm).digest_size * 2
+        self.fanout_levels = fanout_levels
+        self.fanout_width = fanout_width
+        self.objects_dir = os.path.join(self.base_dir, "refs")
+        self.blobs_dir = os.path.join(self.base_dir, "blobs")
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.blobs_dir, exist_ok=True)
+
+    async def startup(self) -> None:
+        await super().startup()
+        # Deletes and overwrites only drop the ref; blobs left with no refs are reclaimed here and by app.tools.collect_garbage
+        await self.collect_garbage()
+
+    def _blob_path(self, digest: str) -> str:
+        if len(digest) != self.digest_length or not _HEX_DIGEST.fullmatch(digest):
+            raise ValueError(f"Invalid {self.algorithm} digest: {digest}")
+        width = self.fanout_width
+        fanout = [digest[i * width : (i + 1) * width] for i in range(self.fanout_levels)]
+        return os.path.join(self.blobs_dir, *fanout, digest)
+
+    def _link_ref(self, source_path: str, ref_path: str) -> tuple[int, int]:
+        link_path = os.path.join(self.staging_dir, f"link-{uuid.uuid4().hex}")
+        os.link(source_path, link_path)
+        try:
+            return _replace_tracked(link_path, ref_path)
+        except BaseException:
+            _unlink_quietly(link_path)
+            raise
+
+    def _link_existing(self, digest: str, ref_path: str) -> tuple[int, int] | None:
+        try:
+            return self._link_ref(self._blob_path(digest.lower()), ref_path)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _commit_blob(self, tmp_path: str, ref_path: str, digest: str) -> tuple[str, tuple[int, int]]:
+        blob_path = self._blob_path(digest)
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        source_path = tmp_path
+        try:
+            os.link(tmp_path, blob_path)
+        except FileExistsError:
+            source_path = blob_path
+
+        try:
+            inode = self._link_ref(source_path, ref_path)
+        except FileNotFoundError:
+            # The existing blob was collected in the meantime; our staged copy is identical
+            inode = self._link_ref(tmp_path, ref_path)
+        return blob_path, inode
+
+    async def save(
+        self,
+        path: str,
+        stream: AsyncIterator[bytes],
+        expected_hashes: Mapping[str, str] | None = None,
+        algorithms: Iterable[str] = (),
+    ) -> dict[str, str]:
+        ref_path = await self._write_path(path)
+        expected_hashes = expected_hashes or {}
+        requested = {*algorithms, *expected_hashes}
+
+        # A client-declared digest that is already stored needs no body at all
+        known_digest = expected_hashes.get(self.algorithm)
+        if known_digest and requested <= {self.algorithm} and (inode := await self._run_fs(self._link_existing, known_digest, ref_path)):
+            await self._sync_dirs(ref_path)
+            await self._remember_digests(ref_path, {self.algorithm: known_digest}, inode)
+            return {self.algorithm: known_digest}
+
+        return await super().save(path, stream, expected_hashes=expected_hashes, algorithms=algorithms)
+
+    def _algorithms_for(self, requested: set[str]) -> set[str]:
+        return requested | {self.algorithm}
+
+    async def _commit_staged(self, tmp_path: str, ref_path: str, digests: Mapping[str, str], expected_hashes: Mapping[str, str]) -> None:
+        try:
+            verify_digests(digests, expected_hashes)
+            blob_path, inode = await self._run_fs(self._commit_blob, tmp_path, ref_path, digests[self.algorithm])
+        finally:
+            await self._run_fs(_unlink_quietly, tmp_path)
+
+        await self._sync_dirs(ref_path, blob_path)
+        await self._remember_digests(ref_path, digests, inode)
+
+    async def refcount(self, digest: str) -> int:
+        try:
+            return (await self._run_fs(os.stat, self._blob_path(digest))).st_nlink - 1
+        except FileNotFoundError:
+            return 0
+
+    async def collect_garbage(self) -> int:
+        return await self._run_fs(_collect_orphans, self.blobs_dir)
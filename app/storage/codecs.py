@@ -0,0 +1,221 @@
+import zlib
+from abc import ABC, abstractmethod
+from typing import Any
+
+from app.storage.enums import Compression
+
+
+class Decompressor(ABC):
+    # Hands decompressed data out in pieces of at most max_length, so a small, highly compressible input
+    # (a decompression bomb) never expands into one huge buffer. read() returns b"" once it needs more input;
+    # after finish() it returns b"" only when everything has been handed out.
+    def __init__(self) -> None:
+        self.pending = b""
+        self.finished = False
+
+    def feed(self, data: bytes) -> None:
+        self.pending += data
+
+    def finish(self) -> None:
+        self.finished = True
+
+    @abstractmethod
+    def read(self, max_length: int) -> bytes: ...
+
+
+class Codec(ABC):
+    compression = Compression.NONE
+    # content_coding is the HTTP token a client can accept the stored bytes under, if there is one
+    content_coding: str | None = None
+    default_level = 0
+
+    def __init__(self, level: int | None = None):
+        self.level = self.default_level if level is None else level
+
+    @abstractmethod
+    def compressor(self) -> Any: ...
+
+    @abstractmethod
+    def decompressor(self) -> Decompressor: ...
+
+    def compressed_size(self, data: bytes) -> int:
+        compressor = self.compressor()
+        return len(compressor.compress(data)) + len(compressor.flush())
+
+
+class _Identity:
+    def compress(self, data: bytes) -> bytes:
+        return data
+
+    def flush(self) -> bytes:
+        return b""
+
+
+class _IdentityDecompressor(Decompressor):
+    def read(self, max_length: int) -> bytes:
+        data, self.pending = self.pending[:max_length], self.pending[max_length:]
+        return data
+
+
+class _ZlibDecompressor(Decompressor):
+    def __init__(self, wbits: int):
+        super().__init__()
+        self._decompressor = zlib.decompressobj(wbits)
+
+    def read(self, max_length: int) -> bytes:
+        # Input that didn't fit under max_length comes back as unconsumed_tail; zlib may also hold output
+        # back after the input is used up, which another call with no new input drains
+        data = self._decompressor.decompress(self.pending, max_length)
+        self.pending = self._decompressor.unconsumed_tail
+        if not data and self.finished and not self.pending:
+            data = self._decompressor.flush()
+        return data
+
+
+class IdentityCodec(Codec):
+    def compressor(self) -> Any:
+        return _Identity()
+
+    def decompressor(self) -> Decompressor:
+        return _IdentityDecompressor()
+
+
+class GzipCodec(Codec):
+    compression = Compression.GZIP
+    content_coding = "gzip"
+    default_level = 6
+
+    def compressor(self) -> Any:
+        # wbits=31 writes a real gzip member, so the payload can go out as Content-Encoding: gzip untouched
+        return zlib.compressobj(self.level, zlib.DEFLATED, 31)
+
+    def decompressor(self) -> Decompressor:
+        return _ZlibDecompressor(31)
+
+
+class ZstdCodec(Codec):
+    compression = Compression.ZSTD
+    content_coding = "zstd"
+    default_level = 3
+
+    def __init__(self, level: int | None = None):
+        super().__init__(level)
+        try:
+            import zstandard
+        except ImportError as e:
+            raise ValueError("zstd compression requires the 'zstandard' package") from e
+        self._zstd = zstandard
+
+    def compressor(self) -> Any:
+        return self._zstd.ZstdCompressor(level=self.level).compressobj()
+
+    def decompressor(self) -> Decompressor:
+        return _ZstdDecompressor(self._zstd)
+
+
+class _NeedInputError(Exception):
+    pass
+
+
+class _ZstdSource:
+    # What the stream reader pulls compressed bytes from; b"" tells it the input has ended
+    def __init__(self, owner: Decompressor):
+        self.owner = owner
+
+    def read(self, size: int) -> bytes:
+        owner = self.owner
+        if not owner.pending and not owner.finished:
+            raise _NeedInputError
+        data, owner.pending = owner.pending[:size], owner.pending[size:]
+        return data
+
+
+class _ZstdDecompressor(Decompressor):
+    # zstandard's decompressobj has no output limit, but its stream reader does. read1() only pulls from the
+    # source while it has produced nothing, so raising there to ask for more input loses no output.
+    def __init__(self, zstd: Any):
+        super().__init__()
+        self._reader = zstd.ZstdDecompressor().stream_reader(_ZstdSource(self), read_across_frames=True)
+
+    def read(self, max_length: int) -> bytes:
+        try:
+            return self._reader.read1(max_length)
+        except _NeedInputError:
+            return b""
+
+
+class _Lz4Compressor:
+    def __init__(self, compressor: Any):
+        self._compressor = compressor
+        self._started = False
+
+    def compress(self, data: bytes) -> bytes:
+        prefix = b""
+        if not self._started:
+            prefix = self._compressor.begin()
+            self._started = True
+        return prefix + self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self.compress(b"") + self._compressor.flush()
+
+
+class _Lz4Decompressor(Decompressor):
+    def __init__(self, decompressor: Any):
+        super().__init__()
+        self._decompressor = decompressor
+
+    def read(self, max_length: int) -> bytes:
+        # Input past max_length stays buffered inside the frame decompressor until needs_input says it is used up
+        decompressor = self._decompressor
+        if decompressor.eof:
+            return b""
+        if not decompressor.needs_input:
+            return decompressor.decompress(b"", max_length)
+        if not self.pending:
+            return b""
+        data, self.pending = self.pending, b""
+        return decompressor.decompress(data, max_length)
+
+
+class Lz4Codec(Codec):
+    compression = Compression.LZ4
+    default_level = 0
+
+    def __init__(self, level: int | None = None):
+        super().__init__(level)
+        try:
+            import lz4.frame
+        except ImportError as e:
+            raise ValueError("lz4 compression requires the 'lz4' package") from e
+        self._frame = lz4.frame
+
+    def compressor(self) -> Any:
+        return _Lz4Compressor(self._frame.LZ4FrameCompressor(compression_level=self.level))
+
+    def decompressor(self) -> Decompressor:
+        return _Lz4Decompressor(self._frame.LZ4FrameDecompressor())
+
+
+# Stored in each object's header, so the values must never change
+CODEC_IDS: dict[Compression, int] = {
+    Compression.NONE: 0,
+    Compression.GZIP: 1,
+    Compression.ZSTD: 2,
+    Compression.LZ4: 3,
+}
+
+_CODECS: dict[Compression, type[Codec]] = {
+    Compression.NONE: IdentityCodec,
+    Compression.GZIP: GzipCodec,
+    Compression.ZSTD: ZstdCodec,
+    Compression.LZ4: Lz4Codec,
+}
+
+
+def get_codec(compression: Compression, level: int | None = None) -> Codec:
+    return _CODECS[compression](level)
+
+
+def content_coding(compression: Compression) -> str | None:
+    return _CODECS[compression].content_coding
@@ -0,0 +1,226 @@
+import asyncio
+import struct
+from collections.abc import AsyncIterator, Callable, Collection, Iterable, Mapping
+from concurrent.futures import Executor
+from dataclasses import dataclass
+from typing import Any, TypeVar
+
+from app.storage.base import EncodedContent, FileStat, StorageDriver
+from app.storage.codecs import CODEC_IDS, Codec, IdentityCodec, content_coding, get_codec
+from app.storage.enums import Compression
+from app.storage.hashing import hash_tee, hexdigests, new_hashers, verify_digests
+from app.utils.helpers import coalesce_chunks
+
+T = TypeVar("T")
+
+MAGIC = b"SDKz"
+# magic, codec id; the payload follows
+HEADER = struct.Struct(">4sB3x")
+# original size, original sha256, magic
+TRAILER = struct.Struct(">Q32s4s")
+TRAILER_ALGORITHM = "sha256"
+
+_COMPRESSION_BY_ID = {codec_id: compression for compression, codec_id in CODEC_IDS.items()}
+
+
+@dataclass(frozen=True)
+class _Layout:
+    # None means the object was stored as-is
+    compression: Compression | None
+    stat: FileStat
+    payload_length: int
+
+
+async def _chain(first: bytes, stream: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    if first:
+        yield first
+    async for chunk in stream:
+        yield chunk
+
+
+class CompressedDriver(StorageDriver):
+    # Compressed objects are framed as header + codec stream + trailer holding the original size and sha256,
+    # so sizes and hashes keep describing the original content. Data that doesn't shrink is stored untouched.
+    def __init__(
+        self,
+        inner: StorageDriver,
+        codec: Codec,
+        min_ratio: float = 0.9,
+        sample_size: int = 64 * 1024,
+        buffer_size: int = 1024 * 1024,
+        executor: Executor | None = None,
+    ):
+        self.inner = inner
+        self.codec = codec
+        self.min_ratio = min_ratio
+        self.sample_size = sample_size
+        self.buffer_size = buffer_size
+        # Codec calls run here; zlib, zstandard and lz4 release the GIL on large buffers
+        self.executor = executor
+
+    async def _run(self, func: Callable[..., T], *args: Any) -> T:
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    async def _read_exact(self, path: str, offset: int, length: int) -> bytes:
+        return b"".join([chunk async for chunk in self.inner.read(path, offset=offset, length=length)])
+
+    async def _describe(self, path: str) -> _Layout:
+        inner_stat = await self.inner.stat(path)
+        if inner_stat.size >= HEADER.size + TRAILER.size:
+            magic, codec_id = HEADER.unpack(await self._read_exact(path, 0, HEADER.size))
+            if magic == MAGIC and codec_id in _COMPRESSION_BY_ID:
+                size, digest, tail = TRAILER.unpack(await self._read_exact(path, inner_stat.size - TRAILER.size, TRAILER.size))
+                if tail == MAGIC:
+                    file_stat = FileStat(size=size, mtime_ns=inner_stat.mtime_ns, digests={TRAILER_ALGORITHM: digest.hex()})
+                    return _Layout(_COMPRESSION_BY_ID[codec_id], file_stat, inner_stat.size - HEADER.size - TRAILER.size)
+        return _Layout(None, inner_stat, inner_stat.size)
+
+    async def _encode(
+        self,
+        stream: AsyncIterator[bytes],
+        hashers: Mapping[str, Any],
+        expected_hashes: Mapping[str, str],
+    ) -> AsyncIterator[bytes | memoryview]:
+        sample = bytearray()
+        async for chunk in stream:
+            sample += chunk
+            if len(sample) >= self.sample_size:
+                break
+
+        codec: Codec | None = None
+        if sample and await self._run(self.codec.compressed_size, bytes(sample)) <= len(sample) * self.min_ratio:
+            codec = self.codec
+        elif sample.startswith(MAGIC):
+            # Raw data must never look framed
+            codec = IdentityCodec()
+
+        chunks = hash_tee(coalesce_chunks(_chain(bytes(sample), stream), self.buffer_size), hashers)
+        if codec is None:
+            async for chunk in chunks:
+                yield chunk
+            # Raising before the stream ends makes the inner driver drop its staged copy
+            verify_digests(hexdigests(hashers), expected_hashes)
+            return
+
+        compressor = codec.compressor()
+        size = 0
+        yield HEADER.pack(MAGIC, CODEC_IDS[codec.compression])
+        async for chunk in chunks:
+            size += len(chunk)
+            if compressed := await self._run(compressor.compress, chunk):
+                yield compressed
+        if compressed := await self._run(compressor.flush):
+            yield compressed
+        digests = hexdigests(hashers)
+        verify_digests(digests, expected_hashes)
+        yield TRAILER.pack(size, bytes.fromhex(digests[TRAILER_ALGORITHM]), MAGIC)
+
+    async def save(
+        self,
+        path: str,
+        stream: AsyncIterator[bytes],
+        expected_hashes: Mapping[str, str] | None = None,
+        algorithms: Iterable[str] = (),
+    ) -> dict[str, str]:
+        expected_hashes = expected_hashes or {}
+        hashers = new_hashers({*algorithms, *expected_hashes, TRAILER_ALGORITHM})
+        await self.inner.save(path, self._encode(stream, hashers, expected_hashes))
+        return hexdigests(hashers)
+
+    async def read(
+        self,
+        path: str,
+        chunk_size: int | None = None,
+        offset: int = 0,
+        length: int | None = None,
+    ) -> AsyncIterator[bytes]:
+        layout = await self._describe(path)
+        if layout.compression is None:
+            async for chunk in self.inner.read(path, chunk_size=chunk_size, offset=offset, length=length):
+                yield chunk
+            return
+
+        # Codec streams aren't seekable: a ranged read decompresses from the start and drops the prefix
+        decompressor = get_codec(layout.compression).decompressor()
+        piece_size = chunk_size or self.buffer_size
+        skip = offset
+        remaining = layout.stat.size - offset if length is None else length
+
+        async def pieces() -> AsyncIterator[bytes]:
+            # At most piece_size bytes per codec call, so a highly compressible object can't balloon in memory
+            while data := await self._run(decompressor.read, piece_size):
+                yield data
+
+        async def drained() -> AsyncIterator[bytes]:
+            async for chunk in self.inner.read(path, chunk_size=chunk_size, offset=HEADER.size, length=layout.payload_length):
+                decompressor.feed(chunk)
+                async for data in pieces():
+                    yield data
+            decompressor.finish()
+            async for data in pieces():
+                yield data
+
+        async for data in drained():
+            if skip:
+                dropped = min(skip, len(data))
+                data = data[dropped:]
+                skip -= dropped
+            if data:
+                data = data[:remaining]
+                remaining -= len(data)
+                yield data
+            if remaining <= 0:
+                return
+
+    async def open_encoded(self, path: str, accepted: Collection[str]) -> EncodedContent | None:
+        layout = await self._describe(path)
+        if layout.compression is None:
+            return None
+        coding = content_coding(layout.compression)
+        if coding is None or coding not in accepted:
+            return None
+        return EncodedContent(
+            coding=coding,
+            size=layout.payload_length,
+            content=self.inner.read(path, offset=HEADER.size, length=layout.payload_length),
+        )
+
+    async def delete(self, path: str) -> bool:
+        return await self.inner.delete(path)
+
+    async def exists(self, path: str) -> bool:
+        return await self.inner.exists(path)
+
+    async def size(self, path: str) -> int:
+        return (await self.stat(path)).size
+
+    async def stat(self, path: str) -> FileStat:
+        return (await self._describe(path)).stat
+
+    async def hash(self, path: str, algorithm: str, chunk_size: int | None = None) -> str:
+        return (await self.hashes(path, [algorithm], chunk_size))[algorithm]
+
+    async def hashes(self, path: str, algorithms: Iterable[str], chunk_size: int | None = None) -> dict[str, str]:
+        algorithms = set(algorithms)
+        new_hashers(algorithms)
+        layout = await self._describe(path)
+        if layout.compression is None:
+            return await self.inner.hashes(path, algorithms, chunk_size)
+        digests = {algorithm: digest for algorithm, digest in layout.stat.digests.items() if algorithm in algorithms}
+        missing = algorithms - digests.keys()
+        if missing:
+            digests.update(await super().hashes(path, missing, chunk_size))
+        return digests
+
+    async def startup(self) -> None:
+        await self.inner.startup()
+
+    async def shutdown(self) -> None:
+        await self.inner.shutdown()
+
+    async def list(self, prefix: str = "", cursor: str | None = None, limit: int = 1000) -> AsyncIterator[tuple[str, FileStat]]:
+        async for path, _ in self.inner.list(prefix=prefix, cursor=cursor, limit=limit):
+            try:
+                yield path, (await self._describe(path)).stat
+            except FileNotFoundError:
+                continue
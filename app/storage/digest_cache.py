@@ -0,0 +1,52 @@
+import os
+import threading
+from collections import OrderedDict
+from collections.abc import Iterable, Mapping
+
+Fingerprint = tuple[int, int, int, int, int]
+
+
+def fingerprint(stat_result: os.stat_result) -> Fingerprint:
+    return (stat_result.st_dev, stat_result.st_ino, stat_result.st_size, stat_result.st_mtime_ns, stat_result.st_ctime_ns)
+
+
+class DigestCache:
+    # Entries are only trusted while the file's inode, size, mtime and ctime are unchanged
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, tuple[Fingerprint, dict[str, str]]] = OrderedDict()
+
+    def get(self, path: str, file_fingerprint: Fingerprint, algorithms: Iterable[str]) -> dict[str, str]:
+        algorithms = set(algorithms)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None or entry[0] != file_fingerprint:
+                found = {}
+            else:
+                self._entries.move_to_end(path)
+                found = {algorithm: entry[1][algorithm] for algorithm in algorithms if algorithm in entry[1]}
+            self.hits += len(found)
+            self.misses += len(algorithms) - len(found)
+        return found
+
+    def put(self, path: str, file_fingerprint: Fingerprint, digests: Mapping[str, str]) -> None:
+        if self.max_entries <= 0 or not digests:
+            return
+        with self._lock:
+            entry = self._entries.get(path)
+            merged = {**entry[1], **digests} if entry is not None and entry[0] == file_fingerprint else dict(digests)
+            self._entries[path] = (file_fingerprint, merged)
+            self._entries.move_to_end(path)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, path: str) -> None:
+        with self._lock:
+            self._entries.pop(path, None)
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries), "max_entries": self.max_entries}
@@ -3,3 +3,32 @@ from enum import Enum
 
 class StorageDriverType(str, Enum):
     LOCAL = "local"
+    CAS = "cas"
+
+
+class FsyncPolicy(str, Enum):
+    NONE = "none"
+    FILE = "file"
+    FULL = "full"
+
+
+class ExecutorKind(str, Enum):
+    THREAD = "thread"
+    PROCESS = "process"
+
+
+class IOBackendKind(str, Enum):
+    AIOFILES = "aiofiles"
+    PREAD = "pread"
+
+
+class Compression(str, Enum):
+    NONE = "none"
+    GZIP = "gzip"
+    ZSTD = "zstd"
+    LZ4 = "lz4"
+
+
+class TierMode(str, Enum):
+    WRITE_THROUGH = "write_through"
+    WRITE_BACK = "write_back"
@@ -0,0 +1,144 @@
+from collections.abc import Iterator
+from concurrent.futures import Executor
+
+from app.config.settings import Settings
+from app.core.metrics import Metrics
+from app.storage.base import StorageDriver
+from app.storage.caching import CachingDriver, ObjectCache
+from app.storage.cas import ContentAddressedDriver
+from app.storage.codecs import get_codec
+from app.storage.compressed import CompressedDriver
+from app.storage.digest_cache import DigestCache
+from app.storage.enums import Compression, IOBackendKind, StorageDriverType
+from app.storage.index import MetadataIndex
+from app.storage.indexed import IndexedDriver
+from app.storage.instrumented import InstrumentedDriver
+from app.storage.io_backends import AiofilesBackend, IOBackend, PreadBackend
+from app.storage.local import LocalFileDriver
+from app.storage.replicated import OfflineDriver, ReplicatedDriver
+from app.storage.tiered import TieredDriver
+
+
+def build_io_backend(settings: Settings, executor: Executor | None = None) -> IOBackend:
+    match settings.io_backend:
+        case IOBackendKind.AIOFILES:
+            return AiofilesBackend(executor)
+        case IOBackendKind.PREAD:
+            return PreadBackend(executor, batch_chunks=settings.io_batch_chunks)
+        case _:
+            raise ValueError(f"Unsupported I/O backend: {settings.io_backend}")
+
+
+def build_storage_driver(
+    settings: Settings,
+    digest_cache: DigestCache | None = None,
+    hash_executor: Executor | None = None,
+    fs_executor: Executor | None = None,
+    metadata_index: MetadataIndex | None = None,
+    object_cache: ObjectCache | None = None,
+    metrics: Metrics | None = None,
+) -> StorageDriver:
+    local_options = {
+        "base_dir": settings.base_dir,
+        "default_chunk_size": settings.chunk_size,
+        "max_chunk_size": settings.max_chunk_size,
+        "write_buffer_size": settings.write_buffer_size,
+        "fsync_policy": settings.fsync_policy,
+        "digest_cache": digest_cache,
+        "hash_executor": hash_executor,
+        "hash_inline_threshold": settings.hash_inline_threshold,
+        "hash_buffer_size": settings.hash_buffer_size,
+        "fs_executor": fs_executor,
+        "staging_max_age": settings.staging_max_age,
+        "io_backend": build_io_backend(settings, fs_executor),
+        "shard_levels": settings.shard_levels,
+        "shard_width": settings.shard_width,
+        "shard_fallback": settings.shard_fallback,
+    }
+
+    def build_base(base_dir: str) -> StorageDriver:
+        match settings.storage_driver:
+            case StorageDriverType.LOCAL:
+                return LocalFileDriver(**{**local_options, "base_dir": base_dir})
+            case StorageDriverType.CAS:
+                return ContentAddressedDriver(
+                    **{**local_options, "base_dir": base_dir},
+                    algorithm=settings.cas_algorithm,
+                    fanout_levels=settings.cas_fanout_levels,
+                )
+            case _:
+                raise ValueError(f"Unsupported storage driver: {settings.storage_driver}")
+
+    driver: StorageDriver
+    if settings.replica_dirs:
+        if settings.tier_capacity_dir:
+            raise ValueError("replica_dirs and tier_capacity_dir cannot be combined")
+        replicas: list[StorageDriver] = []
+        for replica_dir in settings.replica_dirs:
+            try:
+                replicas.append(build_base(replica_dir))
+            except OSError as e:
+                # A missing or unwritable disk is marked down rather than keeping the service from starting
+                replicas.append(OfflineDriver(replica_dir, e))
+        if all(isinstance(replica, OfflineDriver) for replica in replicas):
+            raise replicas[0].error
+        driver = ReplicatedDriver(
+            replicas,
+            copies=settings.replica_copies,
+            min_copies=settings.replica_min_copies,
+            hedge_delay=settings.replica_hedge_delay,
+            fs_executor=fs_executor,
+        )
+    elif settings.tier_capacity_dir:
+        # base_dir is the fast tier; it always uses the plain layout, whatever the capacity tier's driver is
+        driver = TieredDriver(
+            LocalFileDriver(**local_options),
+            build_base(settings.tier_capacity_dir),
+            max_bytes=settings.tier_fast_max_bytes,
+            mode=settings.tier_mode,
+            promote_max_size=settings.tier_promote_max_size,
+            workers=settings.tier_workers,
+        )
+    else:
+        driver = build_base(settings.base_dir)
+
+    if settings.compression != Compression.NONE:
+        driver = CompressedDriver(
+            driver,
+            get_codec(settings.compression, settings.compression_level),
+            min_ratio=settings.compression_min_ratio,
+            buffer_size=settings.write_buffer_size,
+        )
+
+    # Cached bodies are the decoded content, so the cache sits above compression
+    if object_cache is not None:
+        driver = CachingDriver(driver, object_cache)
+
+    if metadata_index is not None:
+        driver = IndexedDriver(driver, metadata_index)
+
+    if metrics is not None:
+        driver = InstrumentedDriver(driver, metrics)
+    return driver
+
+
+def _members(driver: StorageDriver) -> list[StorageDriver]:
+    if isinstance(driver, (CompressedDriver, CachingDriver, IndexedDriver, InstrumentedDriver)):
+        return [driver.inner]
+    if isinstance(driver, TieredDriver):
+        return [driver.fast, driver.capacity]
+    if isinstance(driver, ReplicatedDriver):
+        return list(driver.replicas)
+    return []
+
+
+def driver_stack(driver: StorageDriver) -> Iterator[StorageDriver]:
+    # Every driver in a built stack, outermost first; the maintenance tools pick the layer they work on
+    yield driver
+    for member in _members(driver):
+        yield from driver_stack(member)
+
+
+def base_drivers(driver: StorageDriver) -> Iterator[StorageDriver]:
+    # The drivers that own directories, beneath any wrappers, tiers and replicas
+    return (layer for layer in driver_stack(driver) if not _members(layer))
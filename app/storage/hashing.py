@@ -0,0 +1,50 @@
+import hashlib
+import os
+from collections.abc import AsyncIterator, Iterable, Mapping
+from typing import Any
+
+from app.storage.digest_cache import Fingerprint, fingerprint
+
+
+class HashMismatchError(ValueError):
+    pass
+
+
+def new_hashers(algorithms: Iterable[str]) -> dict[str, Any]:
+    hashers = {}
+    for algorithm in algorithms:
+        if algorithm not in hashlib.algorithms_available:
+            raise ValueError(f"Unsupported hash algorithm: {algorithm}")
+        hashers[algorithm] = hashlib.new(algorithm)
+    return hashers
+
+
+async def hash_tee(stream: AsyncIterator[bytes | memoryview], hashers: Mapping[str, Any]) -> AsyncIterator[bytes | memoryview]:
+    async for chunk in stream:
+        for hasher in hashers.values():
+            hasher.update(chunk)
+        yield chunk
+
+
+def hexdigests(hashers: Mapping[str, Any]) -> dict[str, str]:
+    return {algorithm: hasher.hexdigest() for algorithm, hasher in hashers.items()}
+
+
+def verify_digests(digests: Mapping[str, str], expected_hashes: Mapping[str, str]) -> None:
+    for algorithm, expected_hash in expected_hashes.items():
+        actual_hash = digests[algorithm]
+        if actual_hash != expected_hash:
+            raise HashMismatchError(f"Hash mismatch: expected {expected_hash}, got {actual_hash}")
+
+
+def hash_file(path: str, algorithms: Iterable[str], buffer_size: int) -> tuple[Fingerprint, dict[str, str]]:
+    # Runs in an executor: hashlib releases the GIL on large buffers, so this scales across threads
+    hashers = new_hashers(algorithms)
+    buffer = bytearray(buffer_size)
+    view = memoryview(buffer)
+    with open(path, "rb", buffering=0) as f:
+        file_fingerprint = fingerprint(os.fstat(f.fileno()))
+        while read := f.readinto(buffer):
+            for hasher in hashers.values():
+                hasher.update(view[:read])
+    return file_fingerprint, hexdigests(hashers)
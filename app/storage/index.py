@@ -0,0 +1,114 @@
+import fcntl
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from collections.abc import Iterable, Mapping
+
+from app.storage.base import FileStat
+
+
+class MetadataIndex:
+    # Several processes can share one index. Each registers as a holder while it has the index open and
+    # unregisters in close(); the first process to open it (the only one holding the lock file exclusively)
+    # finds the rows of any holder that never closed, which means files and index may have drifted apart.
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.created = not os.path.exists(db_path)
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, digests TEXT NOT NULL DEFAULT '{}')"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS holders (token TEXT PRIMARY KEY)")
+        self._token = uuid.uuid4().hex
+        # Every holder keeps a shared lock on this file, and the kernel drops a dead process's lock, so getting it
+        # exclusively means no other process has the index open
+        self._lock_fd = os.open(db_path + ".lock", os.O_RDWR | os.O_CREAT, 0o666)
+        opening_fd = os.open(db_path + ".open.lock", os.O_RDWR | os.O_CREAT, 0o666)
+        try:
+            # Opens are serialised, so none of them sees the holder lock between the first opener's unlock and relock
+            fcntl.flock(opening_fd, fcntl.LOCK_EX)
+            try:
+                fcntl.flock(self._lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # A running process already checked the index when it opened it
+                self.created = False
+                self.clean = True
+            else:
+                self.clean = self._conn.execute("SELECT COUNT(*) FROM holders").fetchone()[0] == 0
+                self._conn.execute("DELETE FROM holders")
+            fcntl.flock(self._lock_fd, fcntl.LOCK_SH)
+            self._conn.execute("INSERT INTO holders (token) VALUES (?)", (self._token,))
+        finally:
+            os.close(opening_fd)
+
+    def get(self, path: str) -> FileStat | None:
+        with self._lock:
+            row = self._conn.execute("SELECT size, mtime_ns, digests FROM files WHERE path = ?", (path,)).fetchone()
+        if row is None:
+            return None
+        return FileStat(size=row[0], mtime_ns=row[1], digests=json.loads(row[2]))
+
+    def put(self, path: str, file_stat: FileStat) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO files (path, size, mtime_ns, digests) VALUES (?, ?, ?, ?)",
+                (path, file_stat.size, file_stat.mtime_ns, json.dumps(dict(file_stat.digests))),
+            )
+
+    def add_digests(self, path: str, digests: Mapping[str, str]) -> None:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT digests FROM files WHERE path = ?", (path,)).fetchone()
+                if row is not None:
+                    merged = {**json.loads(row[0]), **digests}
+                    self._conn.execute("UPDATE files SET digests = ? WHERE path = ?", (json.dumps(merged), path))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def page(self, prefix: str, cursor: str | None, limit: int) -> list[tuple[str, FileStat]]:
+        query = "SELECT path, size, mtime_ns, digests FROM files WHERE path > ?"
+        params: list[str | int] = [cursor or ""]
+        if prefix:
+            # A range on the primary key instead of LIKE, so SQLite walks the index
+            query += " AND path >= ? AND path < ?"
+            params += [prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)]
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY path LIMIT ?", (*params, limit)).fetchall()
+        return [(row[0], FileStat(size=row[1], mtime_ns=row[2], digests=json.loads(row[3]))) for row in rows]
+
+    def remove(self, path: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM files WHERE path = ?", (path,))
+
+    def rebuild(self, entries: Iterable[tuple[str, FileStat]]) -> int:
+        count = 0
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("DELETE FROM files")
+                for path, file_stat in entries:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO files (path, size, mtime_ns, digests) VALUES (?, ?, ?, ?)",
+                        (path, file_stat.size, file_stat.mtime_ns, json.dumps(dict(file_stat.digests))),
+                    )
+                    count += 1
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return count
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM holders WHERE token = ?", (self._token,))
+            self._conn.close()
+            os.close(self._lock_fd)
@@ -0,0 +1,145 @@
+import asyncio
+import contextlib
+from collections.abc import AsyncIterator, Collection, Iterable, Iterator, Mapping
+
+from app.storage.base import EncodedContent, FileStat, StorageDriver
+from app.storage.index import MetadataIndex
+from app.storage.local import LocalFileDriver
+
+
+class IndexedDriver(StorageDriver):
+    # Answers exists/size/stat/hash from the index; the wrapped driver is only touched for data.
+    # SQLite calls run in a worker thread. The index is rebuilt from the files when it is new or a process that
+    # had it open never closed it, since a crash between a file change and its index update leaves them apart.
+    def __init__(self, inner: StorageDriver, index: MetadataIndex, algorithms: Iterable[str] = ("sha256",)):
+        self.inner = inner
+        self.index = index
+        self.algorithms = tuple(algorithms)
+        # Per-id locks keep a write and its index entry together, so concurrent saves of one id can't record
+        # one body's size with another's digests
+        self._locks: dict[str, asyncio.Lock] = {}
+        self._lock_users: dict[str, int] = {}
+
+    @contextlib.asynccontextmanager
+    async def _locked(self, path: str) -> AsyncIterator[None]:
+        lock = self._locks.setdefault(path, asyncio.Lock())
+        self._lock_users[path] = self._lock_users.get(path, 0) + 1
+        try:
+            async with lock:
+                yield
+        finally:
+            self._lock_users[path] -= 1
+            if not self._lock_users[path]:
+                del self._lock_users[path]
+                del self._locks[path]
+
+    async def startup(self) -> None:
+        await self.inner.startup()
+        if self.index.created or not self.index.clean:
+            await self.rebuild()
+
+    async def shutdown(self) -> None:
+        await self.inner.shutdown()
+
+    async def save(
+        self,
+        path: str,
+        stream: AsyncIterator[bytes],
+        expected_hashes: Mapping[str, str] | None = None,
+        algorithms: Iterable[str] = (),
+    ) -> dict[str, str]:
+        async with self._locked(path):
+            digests = await self.inner.save(path, stream, expected_hashes=expected_hashes, algorithms={*algorithms, *self.algorithms})
+            await self._record(path, digests)
+        return digests
+
+    async def save_parts(
+        self,
+        path: str,
+        part_paths: Iterable[str],
+        expected_hashes: Mapping[str, str] | None = None,
+        algorithms: Iterable[str] = (),
+    ) -> dict[str, str]:
+        async with self._locked(path):
+            digests = await self.inner.save_parts(path, part_paths, expected_hashes=expected_hashes, algorithms={*algorithms, *self.algorithms})
+            await self._record(path, digests)
+        return digests
+
+    async def _record(self, path: str, digests: Mapping[str, str]) -> None:
+        file_stat = await self.inner.stat(path)
+        await asyncio.to_thread(self.index.put, path, FileStat(size=file_stat.size, mtime_ns=file_stat.mtime_ns, digests=digests))
+
+    async def read(
+        self,
+        path: str,
+        chunk_size: int | None = None,
+        offset: int = 0,
+        length: int | None = None,
+    ) -> AsyncIterator[bytes]:
+        async for chunk in self.inner.read(path, chunk_size=chunk_size, offset=offset, length=length):
+            yield chunk
+
+    async def delete(self, path: str) -> bool:
+        async with self._locked(path):
+            removed = await self.inner.delete(path)
+            await asyncio.to_thread(self.index.remove, path)
+        return removed
+
+    async def exists(self, path: str) -> bool:
+        return await asyncio.to_thread(self.index.get, path) is not None
+
+    async def size(self, path: str) -> int:
+        return (await self.stat(path)).size
+
+    async def stat(self, path: str) -> FileStat:
+        file_stat = await asyncio.to_thread(self.index.get, path)
+        if file_stat is None:
+            raise FileNotFoundError(path)
+        return file_stat
+
+    async def hash(self, path: str, algorithm: str, chunk_size: int | None = None) -> str:
+        return (await self.hashes(path, [algorithm], chunk_size))[algorithm]
+
+    async def hashes(self, path: str, algorithms: Iterable[str], chunk_size: int | None = None) -> dict[str, str]:
+        known = (await self.stat(path)).digests
+        digests = {algorithm: known[algorithm] for algorithm in algorithms if algorithm in known}
+        missing = set(algorithms) - digests.keys()
+        if missing:
+            computed = await self.inner.hashes(path, missing, chunk_size)
+            await asyncio.to_thread(self.index.add_digests, path, computed)
+            digests.update(computed)
+        return digests
+
+    async def local_path(self, path: str) -> str | None:
+        return await self.inner.local_path(path)
+
+    async def read_cached(self, path: str, size: int | None = None) -> bytes | None:
+        return await self.inner.read_cached(path, size)
+
+    async def open_encoded(self, path: str, accepted: Collection[str]) -> EncodedContent | None:
+        return await self.inner.open_encoded(path, accepted)
+
+    async def rebuild(self, page_size: int = 1000) -> int:
+        if isinstance(self.inner, LocalFileDriver):
+            return await asyncio.to_thread(self.index.rebuild, self.inner.scan())
+
+        # Other drivers are paged through list() from the rebuild thread, so only one page is held at a time
+        loop = asyncio.get_running_loop()
+
+        async def page(cursor: str | None) -> list[tuple[str, FileStat]]:
+            return [entry async for entry in self.inner.list(cursor=cursor, limit=page_size)]
+
+        def entries() -> Iterator[tuple[str, FileStat]]:
+            cursor = None
+            while True:
+                batch = asyncio.run_coroutine_threadsafe(page(cursor), loop).result()
+                yield from batch
+                if len(batch) < page_size:
+                    return
+                cursor = batch[-1][0]
+
+        return await asyncio.to_thread(self.index.rebuild, entries())
+
+    async def list(self, prefix: str = "", cursor: str | None = None, limit: int = 1000) -> AsyncIterator[tuple[str, FileStat]]:
+        for entry in await asyncio.to_thread(self.index.page, prefix, cursor, limit):
+            yield entry
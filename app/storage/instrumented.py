@@ -0,0 +1,119 @@
+import time
+from collections.abc import AsyncIterator, Awaitable, Collection, Iterable, Mapping
+from typing import TypeVar
+
+from app.core.metrics import Metrics
+from app.storage.base import EncodedContent, FileStat, StorageDriver
+
+T = TypeVar("T")
+
+
+class InstrumentedDriver(StorageDriver):
+    # Outermost wrapper: records what callers of the driver experience, including index and cache hits
+    def __init__(self, inner: StorageDriver, metrics: Metrics):
+        self.inner = inner
+        self.metrics = metrics
+
+    async def _timed(self, operation: str, call: Awaitable[T]) -> T:
+        started = time.perf_counter()
+        try:
+            return await call
+        except Exception as e:
+            self.metrics.storage_errors.inc(operation, type(e).__name__)
+            raise
+        finally:
+            self.metrics.storage_duration.observe(time.perf_counter() - started, operation)
+
+    async def _count(self, direction: str, stream: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        counter = self.metrics.storage_bytes
+        async for chunk in stream:
+            counter.inc(direction, amount=len(chunk))
+            yield chunk
+
+    async def _stream(self, operation: str, direction: str, stream: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        metrics = self.metrics
+        started = time.perf_counter()
+        metrics.storage_streams.inc(direction)
+        try:
+            async for chunk in self._count(direction, stream):
+                yield chunk
+        except Exception as e:
+            metrics.storage_errors.inc(operation, type(e).__name__)
+            raise
+        finally:
+            metrics.storage_streams.dec(direction)
+            metrics.storage_duration.observe(time.perf_counter() - started, operation)
+
+    async def save(
+        self,
+        path: str,
+        stream: AsyncIterator[bytes],
+        expected_hashes: Mapping[str, str] | None = None,
+        algorithms: Iterable[str] = (),
+    ) -> dict[str, str]:
+        self.metrics.storage_streams.inc("write")
+        try:
+            counted = self._count("write", stream)
+            return await self._timed("save", self.inner.save(path, counted, expected_hashes=expected_hashes, algorithms=algorithms))
+        finally:
+            self.metrics.storage_streams.dec("write")
+
+    async def save_parts(
+        self,
+        path: str,
+        part_paths: Iterable[str],
+        expected_hashes: Mapping[str, str] | None = None,
+        algorithms: Iterable[str] = (),
+    ) -> dict[str, str]:
+        return await self._timed("save_parts", self.inner.save_parts(path, part_paths, expected_hashes=expected_hashes, algorithms=algorithms))
+
+    def read(
+        self,
+        path: str,
+        chunk_size: int | None = None,
+        offset: int = 0,
+        length: int | None = None,
+    ) -> AsyncIterator[bytes]:
+        return self._stream("read", "read", self.inner.read(path, chunk_size=chunk_size, offset=offset, length=length))
+
+    async def read_cached(self, path: str, size: int | None = None) -> bytes | None:
+        body = await self._timed("read_cached", self.inner.read_cached(path, size))
+        if body is not None:
+            self.metrics.storage_bytes.inc("read", amount=len(body))
+        return body
+
+    async def delete(self, path: str) -> bool:
+        return await self._timed("delete", self.inner.delete(path))
+
+    async def exists(self, path: str) -> bool:
+        return await self._timed("exists", self.inner.exists(path))
+
+    async def size(self, path: str) -> int:
+        return await self._timed("size", self.inner.size(path))
+
+    async def stat(self, path: str) -> FileStat:
+        return await self._timed("stat", self.inner.stat(path))
+
+    async def hash(self, path: str, algorithm: str, chunk_size: int | None = None) -> str:
+        return await self._timed("hash", self.inner.hash(path, algorithm, chunk_size))
+
+    async def hashes(self, path: str, algorithms: Iterable[str], chunk_size: int | None = None) -> dict[str, str]:
+        return await self._timed("hash", self.inner.hashes(path, algorithms, chunk_size))
+
+    async def local_path(self, path: str) -> str | None:
+        return await self.inner.local_path(path)
+
+    async def open_encoded(self, path: str, accepted: Collection[str]) -> EncodedContent | None:
+        encoded = await self._timed("open_encoded", self.inner.open_encoded(path, accepted))
+        if encoded is None:
+            return None
+        return EncodedContent(coding=encoded.coding, size=encoded.size, content=self._stream("read_encoded", "read", encoded.content))
+
+    async def startup(self) -> None:
+        await self.inner.startup()
+
+    async def shutdown(self) -> None:
+        await self.inner.shutdown()
+
+    def list(self, prefix: str = "", cursor: str | None = None, limit: int = 1000) -> AsyncIterator[tuple[str, FileStat]]:
+        return self.inner.list(prefix=prefix, cursor=cursor, limit=limit)
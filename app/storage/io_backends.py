@@ -0,0 +1,144 @@
+import asyncio
+import os
+from abc import ABC, abstractmethod
+from collections.abc import AsyncIterator, Callable
+from concurrent.futures import Executor
+from contextlib import AbstractAsyncContextManager, asynccontextmanager
+from typing import Any, TypeVar
+
+import aiofiles
+
+T = TypeVar("T")
+
+
+class FileReader(ABC):
+    def __init__(self, size: int):
+        self.size = size
+
+    @abstractmethod
+    def chunks(self, offset: int, length: int | None, chunk_size: int) -> AsyncIterator[bytes]:
+        pass
+
+
+class IOBackend(ABC):
+    def __init__(self, executor: Executor | None = None):
+        self.executor = executor
+
+    async def _run(self, func: Callable[..., T], *args: Any) -> T:
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    @abstractmethod
+    def open_reader(self, path: str) -> AbstractAsyncContextManager[FileReader]:
+        pass
+
+    # Takes ownership of fd and closes it
+    @abstractmethod
+    async def write_fd(self, fd: int, stream: AsyncIterator[bytes | memoryview], fsync: bool = False) -> None:
+        pass
+
+
+class _AiofilesReader(FileReader):
+    def __init__(self, f: Any, size: int):
+        super().__init__(size)
+        self.f = f
+
+    async def chunks(self, offset: int, length: int | None, chunk_size: int) -> AsyncIterator[bytes]:
+        if offset:
+            await self.f.seek(offset)
+        remaining = length
+        while remaining is None or remaining > 0:
+            chunk = await self.f.read(chunk_size if remaining is None else min(chunk_size, remaining))
+            if not chunk:
+                break
+            if remaining is not None:
+                remaining -= len(chunk)
+            yield chunk
+
+
+class AiofilesBackend(IOBackend):
+    @asynccontextmanager
+    async def open_reader(self, path: str) -> AsyncIterator[FileReader]:
+        async with aiofiles.open(path, "rb") as f:
+            yield _AiofilesReader(f, os.fstat(f.fileno()).st_size)
+
+    async def write_fd(self, fd: int, stream: AsyncIterator[bytes | memoryview], fsync: bool = False) -> None:
+        async with aiofiles.open(fd, "wb") as f:
+            async for chunk in stream:
+                await f.write(chunk)
+            if fsync:
+                await f.flush()
+                await self._run(os.fsync, f.fileno())
+
+
+def _open_for_read(path: str) -> tuple[int, int]:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        return fd, os.fstat(fd).st_size
+    except BaseException:
+        os.close(fd)
+        raise
+
+
+def _pread_batch(fd: int, offset: int, chunk_size: int, count: int, end: int) -> list[bytes]:
+    chunks = []
+    for _ in range(count):
+        size = min(chunk_size, end - offset)
+        if size <= 0:
+            break
+        chunk = os.pread(fd, size, offset)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        offset += len(chunk)
+        if len(chunk) < size:
+            break
+    return chunks
+
+
+def _write_all(fd: int, data: bytes | memoryview) -> None:
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view) :]
+
+
+class _PreadReader(FileReader):
+    def __init__(self, backend: "PreadBackend", fd: int, size: int):
+        super().__init__(size)
+        self.backend = backend
+        self.fd = fd
+
+    async def chunks(self, offset: int, length: int | None, chunk_size: int) -> AsyncIterator[bytes]:
+        # Committed objects are replaced, never appended to, so the opened size bounds the read
+        end = self.size if length is None else min(offset + length, self.size)
+        while offset < end:
+            batch = await self.backend._run(_pread_batch, self.fd, offset, chunk_size, self.backend.batch_chunks, end)
+            if not batch:
+                break
+            for chunk in batch:
+                offset += len(chunk)
+                yield chunk
+
+
+class PreadBackend(IOBackend):
+    # Positional reads need no seek and no shared file object, and each executor trip
+    # fetches up to batch_chunks chunks, so a download costs a fraction of the thread hops.
+    def __init__(self, executor: Executor | None = None, batch_chunks: int = 4):
+        super().__init__(executor)
+        self.batch_chunks = batch_chunks
+
+    @asynccontextmanager
+    async def open_reader(self, path: str) -> AsyncIterator[FileReader]:
+        fd, size = await self._run(_open_for_read, path)
+        try:
+            yield _PreadReader(self, fd, size)
+        finally:
+            await self._run(os.close, fd)
+
+    async def write_fd(self, fd: int, stream: AsyncIterator[bytes | memoryview], fsync: bool = False) -> None:
+        try:
+            async for chunk in stream:
+                await self._run(_write_all, fd, chunk)
+            if fsync:
+                await self._run(os.fsync, fd)
+        finally:
+            await self._run(os.close, fd)
@@ -1,53 +1,404 @@
+import asyncio
+import errno
 import hashlib
+import heapq
+import itertools
 import os
-from collections.abc import AsyncIterator
+import shutil
+import stat
+import time
+from collections.abc import AsyncIterator, Callable, Iterable, Iterator, Mapping
+from concurrent.futures import Executor
+from functools import partial
+from typing import Any, TypeVar
 
 import aiofiles
 
-from app.storage.base import StorageDriver
+from app.storage.base import FileStat, StorageDriver
+from app.storage.digest_cache import DigestCache, Fingerprint, fingerprint
+from app.storage.enums import FsyncPolicy
+from app.storage.hashing import hash_file, hash_tee, hexdigests, new_hashers, verify_digests
+from app.storage.io_backends import AiofilesBackend, IOBackend
 from app.utils.config_validation import validate_files_local_base_dir
-from app.utils.helpers import safe_join
+from app.utils.helpers import adaptive_chunk_size, coalesce_chunks, fast_safe_join, mkstemp_shared
+
+INTERNAL_DIR = ".keeper"
+SHARDS_DIR = ".shards"
+
+T = TypeVar("T")
+
+
+def _fsync_dir(path: str) -> None:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _unlink_quietly(path: str) -> None:
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def _replace_tracked(source_path: str, target_path: str) -> tuple[int, int]:
+    # The identity of the inode being committed; a concurrent replace leaves the target with a different one
+    staged = os.stat(source_path)
+    os.replace(source_path, target_path)
+    return staged.st_dev, staged.st_ino
+
+
+def _fingerprint_of(path: str, inode: tuple[int, int]) -> Fingerprint | None:
+    stat_result = os.stat(path)
+    return fingerprint(stat_result) if (stat_result.st_dev, stat_result.st_ino) == inode else None
+
+
+def _stat_within(base_dir: str, path: str) -> os.stat_result:
+    # Ids are validated lexically, so only a link an operator placed can point elsewhere; it is followed while it stays under base_dir
+    stat_result = os.lstat(path)
+    if stat.S_ISLNK(stat_result.st_mode):
+        if not os.path.realpath(path).startswith(base_dir + os.sep):
+            raise ValueError("Path escapes base directory")
+        stat_result = os.stat(path)
+    return stat_result
+
+
+def _copy_file(src_fd: int, dst_fd: int) -> None:
+    try:
+        # In-kernel copy: no bytes pass through user space, and reflinks are used where the filesystem supports them
+        while os.copy_file_range(src_fd, dst_fd, 1 << 30):
+            pass
+    except (AttributeError, OSError) as e:
+        if isinstance(e, OSError) and e.errno not in (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP):
+            raise
+        with open(src_fd, "rb", closefd=False) as src, open(dst_fd, "wb", closefd=False) as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+
+
+def _remove_stale_files(directory: str, cutoff: float) -> int:
+    # Leftovers from crashed uploads; other workers' in-flight files are much younger than the cutoff
+    removed = 0
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            try:
+                if entry.is_file(follow_symlinks=False) and entry.stat(follow_symlinks=False).st_mtime < cutoff:
+                    os.unlink(entry.path)
+                    removed += 1
+            except FileNotFoundError:
+                pass
+    return removed
 
 
 class LocalFileDriver(StorageDriver):
-    def __init__(self, base_dir: str, default_chunk_size: int = 8192):
+    def __init__(
+        self,
+        base_dir: str,
+        default_chunk_size: int = 64 * 1024,
+        fsync_policy: FsyncPolicy = FsyncPolicy.NONE,
+        digest_cache: DigestCache | None = None,
+        hash_executor: Executor | None = None,
+        hash_inline_threshold: int = 1024 * 1024,
+        hash_buffer_size: int = 1024 * 1024,
+        fs_executor: Executor | None = None,
+        staging_max_age: float = 24 * 60 * 60,
+        max_chunk_size: int = 1024 * 1024,
+        write_buffer_size: int = 1024 * 1024,
+        io_backend: IOBackend | None = None,
+        shard_levels: int = 0,
+        shard_width: int = 2,
+        shard_fallback: bool = True,
+    ):
         self.base_dir = validate_files_local_base_dir(base_dir)
         self.chunk_size = default_chunk_size
+        self.max_chunk_size = max(max_chunk_size, default_chunk_size)
+        self.write_buffer_size = write_buffer_size
+        self.fsync_policy = fsync_policy
+        self.digest_cache = digest_cache
+        # None runs large hashes on the event loop's default thread pool
+        self.hash_executor = hash_executor
+        self.hash_inline_threshold = hash_inline_threshold
+        self.hash_buffer_size = hash_buffer_size
+        # Metadata syscalls (stat, unlink, rename) go through their own bounded pool so a slow disk can't stall the loop
+        self.fs_executor = fs_executor
+        self.staging_max_age = staging_max_age
+        self.io_backend = io_backend or AiofilesBackend(fs_executor)
+        # With sharding on, ids live under .shards/<fan-out>/ and the flat path is only consulted while a migration runs
+        self.shard_levels = shard_levels
+        self.shard_width = shard_width
+        self.shard_fallback = shard_fallback
+        self.objects_dir = self.base_dir
+        self.internal_dir = os.path.join(self.base_dir, INTERNAL_DIR)
+        # Staging lives under base_dir so the final os.replace never crosses filesystems
+        self.staging_dir = os.path.join(self.internal_dir, "staging")
+        os.makedirs(self.staging_dir, exist_ok=True)
+
+    async def startup(self) -> None:
+        await self._run_fs(_remove_stale_files, self.staging_dir, time.time() - self.staging_max_age)
+
+    @property
+    def shards_dir(self) -> str:
+        return os.path.join(self.objects_dir, SHARDS_DIR)
+
+    def _flat_path(self, path: str) -> str:
+        full_path = fast_safe_join(self.objects_dir, path)
+        for reserved in (self.internal_dir, self.shards_dir):
+            if full_path == reserved or full_path.startswith(reserved + os.sep):
+                raise ValueError("Path is reserved for internal use")
+        return full_path
+
+    def _shard_path(self, flat_path: str) -> str:
+        rel = flat_path[len(self.objects_dir) + 1 :]
+        digest = hashlib.blake2b(rel.encode(), digest_size=16).hexdigest()
+        width = self.shard_width
+        return os.path.join(self.shards_dir, *(digest[i * width : (i + 1) * width] for i in range(self.shard_levels)), rel)
 
     def _full_path(self, path: str) -> str:
-        return safe_join(self.base_dir, path)
+        flat_path = self._flat_path(path)
+        return self._shard_path(flat_path) if self.shard_levels else flat_path
 
-    async def save(self, path: str, stream: AsyncIterator[bytes]) -> None:
+    def _locate(self, path: str) -> tuple[str, os.stat_result | None]:
+        # Runs in the fs pool: finds the file and stats it in one go, with no stat result when it doesn't exist
         full_path = self._full_path(path)
-        async with aiofiles.open(full_path, "wb") as f:
-            async for chunk in stream:
-                await f.write(chunk)
+        candidates = [full_path]
+        if self.shard_levels and self.shard_fallback:
+            # Checking the sharded path again closes the window where a migration moved the file between both checks
+            candidates += [self._flat_path(path), full_path]
+        for candidate in candidates:
+            try:
+                return candidate, _stat_within(self.base_dir, candidate)
+            except FileNotFoundError:
+                pass
+        return full_path, None
 
-    async def read(self, path: str, chunk_size: int | None = None) -> AsyncIterator[bytes]:
+    async def _resolve(self, path: str) -> str:
+        return (await self._run_fs(self._locate, path))[0]
+
+    async def _stat(self, path: str) -> tuple[str, os.stat_result]:
+        full_path, stat_result = await self._run_fs(self._locate, path)
+        if stat_result is None:
+            raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), full_path)
+        return full_path, stat_result
+
+    async def _write_path(self, path: str) -> str:
         full_path = self._full_path(path)
-        chunk_size = chunk_size or self.chunk_size
+        if self.shard_levels:
+            await self._run_fs(partial(os.makedirs, os.path.dirname(full_path), exist_ok=True))
+        return full_path
 
-        async with aiofiles.open(full_path, "rb") as f:
-            while True:
-                chunk = await f.read(chunk_size)
-                if not chunk:
-                    break
+    async def _run_fs(self, func: Callable[..., T], *args: Any) -> T:
+        return await asyncio.get_running_loop().run_in_executor(self.fs_executor, func, *args)
+
+    async def _stage(self, stream: AsyncIterator[bytes], hashers: Mapping[str, Any]) -> str:
+        fd, tmp_path = await self._run_fs(mkstemp_shared, self.staging_dir, "upload-")
+        try:
+            # ASGI bodies arrive in small pieces; one large write per buffer keeps the thread hops down
+            chunks = hash_tee(coalesce_chunks(stream, self.write_buffer_size), hashers)
+            await self.io_backend.write_fd(fd, chunks, fsync=self.fsync_policy != FsyncPolicy.NONE)
+        except BaseException:
+            _unlink_quietly(tmp_path)
+            raise
+        return tmp_path
+
+    async def _sync_dirs(self, *paths: str) -> None:
+        if self.fsync_policy == FsyncPolicy.FULL:
+            for directory in {os.path.dirname(path) for path in paths}:
+                await self._run_fs(_fsync_dir, directory)
+
+    async def save(
+        self,
+        path: str,
+        stream: AsyncIterator[bytes],
+        expected_hashes: Mapping[str, str] | None = None,
+        algorithms: Iterable[str] = (),
+    ) -> dict[str, str]:
+        full_path = await self._write_path(path)
+        expected_hashes = expected_hashes or {}
+        hashers = new_hashers(self._algorithms_for({*algorithms, *expected_hashes}))
+
+        tmp_path = await self._stage(stream, hashers)
+        digests = hexdigests(hashers)
+        await self._commit_staged(tmp_path, full_path, digests, expected_hashes)
+        return digests
+
+    async def save_parts(
+        self,
+        path: str,
+        part_paths: Iterable[str],
+        expected_hashes: Mapping[str, str] | None = None,
+        algorithms: Iterable[str] = (),
+    ) -> dict[str, str]:
+        full_path = await self._write_path(path)
+        expected_hashes = expected_hashes or {}
+        requested = self._algorithms_for({*algorithms, *expected_hashes})
+        new_hashers(requested)
+
+        tmp_path = await self._run_fs(self._assemble, list(part_paths))
+        try:
+            digests: dict[str, str] = {}
+            if requested:
+                loop = asyncio.get_running_loop()
+                _, digests = await loop.run_in_executor(self.hash_executor, hash_file, tmp_path, sorted(requested), self.hash_buffer_size)
+        except BaseException:
+            _unlink_quietly(tmp_path)
+            raise
+
+        await self._commit_staged(tmp_path, full_path, digests, expected_hashes)
+        return digests
+
+    def _algorithms_for(self, requested: set[str]) -> set[str]:
+        return requested
+
+    def _assemble(self, part_paths: list[str]) -> str:
+        fd, tmp_path = mkstemp_shared(self.staging_dir, "assemble-")
+        try:
+            for part_path in part_paths:
+                src_fd = os.open(part_path, os.O_RDONLY)
+                try:
+                    _copy_file(src_fd, fd)
+                finally:
+                    os.close(src_fd)
+            if self.fsync_policy != FsyncPolicy.NONE:
+                os.fsync(fd)
+        except BaseException:
+            _unlink_quietly(tmp_path)
+            raise
+        finally:
+            os.close(fd)
+        return tmp_path
+
+    async def _commit_staged(self, tmp_path: str, full_path: str, digests: Mapping[str, str], expected_hashes: Mapping[str, str]) -> None:
+        try:
+            verify_digests(digests, expected_hashes)
+            inode = await self._run_fs(_replace_tracked, tmp_path, full_path)
+        except BaseException:
+            # Readers only ever see committed objects; a failed upload is just a dropped temp file
+            _unlink_quietly(tmp_path)
+            raise
+
+        await self._sync_dirs(full_path)
+        await self._remember_digests(full_path, digests, inode)
+
+    async def _remember_digests(self, full_path: str, digests: Mapping[str, str], inode: tuple[int, int]) -> None:
+        # Only cached while the path still holds the inode that was hashed; if another save replaced it since, nothing is stored
+        if self.digest_cache and digests:
+            try:
+                file_fingerprint = await self._run_fs(_fingerprint_of, full_path, inode)
+            except FileNotFoundError:
+                return
+            if file_fingerprint is not None:
+                self.digest_cache.put(full_path, file_fingerprint, digests)
+
+    async def local_path(self, path: str) -> str | None:
+        return await self._resolve(path)
+
+    async def read(
+        self,
+        path: str,
+        chunk_size: int | None = None,
+        offset: int = 0,
+        length: int | None = None,
+    ) -> AsyncIterator[bytes]:
+        full_path = await self._resolve(path)
+        async with self.io_backend.open_reader(full_path) as reader:
+            if not chunk_size:
+                span = length if length is not None else reader.size - offset
+                chunk_size = adaptive_chunk_size(span, self.chunk_size, self.max_chunk_size)
+            async for chunk in reader.chunks(offset, length, chunk_size):
                 yield chunk
 
-    async def delete(self, path: str) -> None:
+    async def delete(self, path: str) -> bool:
         full_path = self._full_path(path)
-        try:
-            os.remove(full_path)
-        except FileNotFoundError:
-            pass
+        paths = [full_path]
+        if self.shard_levels and self.shard_fallback:
+            paths.append(self._flat_path(path))
+        removed = False
+        for candidate in paths:
+            if self.digest_cache:
+                self.digest_cache.invalidate(candidate)
+            try:
+                await self._run_fs(os.remove, candidate)
+                removed = True
+            except FileNotFoundError:
+                pass
+        return removed
 
     async def exists(self, path: str) -> bool:
-        full_path = self._full_path(path)
-        return os.path.exists(full_path)
+        return (await self._run_fs(self._locate, path))[1] is not None
 
     async def size(self, path: str) -> int:
-        full_path = self._full_path(path)
-        return os.path.getsize(full_path)
+        return (await self._stat(path))[1].st_size
+
+    async def stat(self, path: str) -> FileStat:
+        _, stat_result = await self._stat(path)
+        return FileStat(size=stat_result.st_size, mtime_ns=stat_result.st_mtime_ns)
+
+    def _roots(self) -> list[str]:
+        # The flat tree plus every leaf of the shard tree; ids below each root are stored under their plain relative path
+        level = [self.shards_dir] if self.shard_levels else []
+        for _ in range(self.shard_levels):
+            children = []
+            for directory in level:
+                try:
+                    with os.scandir(directory) as entries:
+                        children.extend(entry.path for entry in entries if entry.is_dir(follow_symlinks=False))
+                except FileNotFoundError:
+                    pass
+            level = children
+        return [self.objects_dir, *level]
+
+    def _walk(self, root: str) -> Iterator[os.DirEntry]:
+        stack = [root]
+        while stack:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.path in (self.internal_dir, self.shards_dir):
+                        continue
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        yield entry
+
+    def scan(self) -> Iterator[tuple[str, FileStat]]:
+        for root in self._roots():
+            for entry in self._walk(root):
+                stat_result = entry.stat(follow_symlinks=False)
+                path = os.path.relpath(entry.path, root)
+                yield path, FileStat(size=stat_result.st_size, mtime_ns=stat_result.st_mtime_ns)
+
+    def _migrate_flat(self) -> int:
+        moved = 0
+        directories = set()
+        for entry in self._walk(self.objects_dir):
+            flat_path = entry.path
+            shard_path = self._shard_path(flat_path)
+            directories.add(os.path.dirname(flat_path))
+            os.makedirs(os.path.dirname(shard_path), exist_ok=True)
+            try:
+                # link never clobbers: if the id was rewritten since the migration started, the sharded copy is newer
+                os.link(flat_path, shard_path)
+                moved += 1
+            except FileExistsError:
+                pass
+            except FileNotFoundError:
+                continue
+            _unlink_quietly(flat_path)
+            if self.digest_cache:
+                self.digest_cache.invalidate(flat_path)
+        for directory in sorted(directories, key=len, reverse=True):
+            while directory != self.objects_dir:
+                try:
+                    os.rmdir(directory)
+                except OSError:
+                    break
+                directory = os.path.dirname(directory)
+        return moved
+
+    async def migrate_to_shards(self) -> int:
+        if not self.shard_levels:
+            raise ValueError("Sharding is not enabled")
+        return await self._run_fs(self._migrate_flat)
 
     async def hash(
         self,
@@ -55,12 +406,100 @@ class LocalFileDriver(StorageDriver):
         algorithm: str,
         chunk_size: int | None = None,
     ) -> str:
-        if algorithm not in hashlib.algorithms_available:
-            raise ValueError(f"Unsupported hash algorithm: {algorithm}")
+        return (await self.hashes(path, [algorithm], chunk_size))[algorithm]
+
+    async def hashes(self, path: str, algorithms: Iterable[str], chunk_size: int | None = None) -> dict[str, str]:
+        algorithms = set(algorithms)
+        new_hashers(algorithms)
+
+        full_path, stat_result = await self._stat(path)
+        digests = self.digest_cache.get(full_path, fingerprint(stat_result), algorithms) if self.digest_cache else {}
+        missing = algorithms - digests.keys()
+        if not missing:
+            return digests
+
+        if stat_result.st_size >= self.hash_inline_threshold:
+            loop = asyncio.get_running_loop()
+            file_fingerprint, computed = await loop.run_in_executor(self.hash_executor, hash_file, full_path, sorted(missing), self.hash_buffer_size)
+        else:
+            chunk_size = chunk_size or adaptive_chunk_size(stat_result.st_size, self.chunk_size, self.max_chunk_size)
+            file_fingerprint, computed = await self._hash_inline(full_path, missing, chunk_size)
+
+        if self.digest_cache:
+            self.digest_cache.put(full_path, file_fingerprint, computed)
+        return {**digests, **computed}
+
+    async def _hash_inline(self, full_path: str, algorithms: Iterable[str], chunk_size: int) -> tuple[Fingerprint, dict[str, str]]:
+        hashers = new_hashers(algorithms)
+        buffer = bytearray(chunk_size)
+        view = memoryview(buffer)
+        async with aiofiles.open(full_path, "rb", buffering=0) as f:
+            # Fingerprint the open descriptor so a concurrent replace can't poison the cache
+            file_fingerprint = fingerprint(os.fstat(f.fileno()))
+            while read := await f.readinto(buffer):
+                for hasher in hashers.values():
+                    hasher.update(view[:read])
+        return file_fingerprint, hexdigests(hashers)
+
+    def _dir_keys(self, directory: str, rel: str, prefix: str, cursor: str, after: str) -> Iterator[tuple[str, str | None]]:
+        # A directory sorts as its name plus "/", which is where its ids fall among its siblings'
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.path in (self.internal_dir, self.shards_dir):
+                        continue
+                    if entry.is_dir(follow_symlinks=False):
+                        name = rel + entry.name + "/"
+                        # Ids under a directory are a contiguous range, so whole subtrees outside the prefix or behind the cursor are skipped
+                        if name > after and (name.startswith(prefix) or prefix.startswith(name)) and not (cursor > name and not cursor.startswith(name)):
+                            yield name, entry.path
+                    elif entry.is_file(follow_symlinks=False):
+                        name = rel + entry.name
+                        if name > after and name > cursor and name.startswith(prefix):
+                            yield name, None
+        except (FileNotFoundError, NotADirectoryError):
+            return
 
-        hash_func = hashlib.new(algorithm)
+    def _iter_names(self, directory: str, rel: str, prefix: str, cursor: str, batch_size: int) -> Iterator[str]:
+        # Yields ids in name order and lazily, so a page stops descending once it is full. Each directory is
+        # scanned for only its next batch_size entries, so a page over one flat directory of N files holds
+        # O(batch_size) names and costs O(N log batch_size); the directory is scanned again only if the batch
+        # runs out before the page is full.
+        after = ""
+        while True:
+            batch = heapq.nsmallest(batch_size, self._dir_keys(directory, rel, prefix, cursor, after))
+            for name, subdirectory in batch:
+                if subdirectory is None:
+                    yield name
+                else:
+                    yield from self._iter_names(subdirectory, name, prefix, cursor, batch_size)
+            if len(batch) < batch_size:
+                return
+            after = batch[-1][0]
 
-        async for chunk in self.read(path, chunk_size):
-            hash_func.update(chunk)
+    def _list_page(self, prefix: str, cursor: str | None, limit: int) -> list[tuple[str, FileStat]]:
+        start = prefix.rpartition("/")[0]
+        rel_start = os.path.relpath(self._flat_path(start), self.objects_dir) if start else ""
+        rel_root = start + "/" if start else ""
+        roots = self._roots()
+        flat_names = self._iter_names(os.path.join(roots[0], rel_start), rel_root, prefix, cursor or "", limit + 1)
+        if self.shard_levels:
+            # Ids already linked into the shard tree are listed from there
+            flat_names = (name for name in flat_names if not os.path.lexists(self._shard_path(os.path.join(self.objects_dir, name))))
+        names = [flat_names, *(self._iter_names(os.path.join(root, rel_start), rel_root, prefix, cursor or "", limit + 1) for root in roots[1:])]
+        # Every root yields in name order, so the merge stops after `limit` ids. With sharding on, each shard leaf
+        # holds a hashed slice of the namespace and has to be read for every page.
+        # A migration racing the listing can still surface an id twice, hence the spare slot and the dedupe.
+        page = []
+        for name in dict.fromkeys(itertools.islice(heapq.merge(*names), limit + 1)):
+            if len(page) == limit:
+                break
+            _, stat_result = self._locate(name)
+            if stat_result is None:
+                continue
+            page.append((name, FileStat(size=stat_result.st_size, mtime_ns=stat_result.st_mtime_ns)))
+        return page
 
-        return hash_func.hexdigest()
+    async def list(self, prefix: str = "", cursor: str | None = None, limit: int = 1000) -> AsyncIterator[tuple[str, FileStat]]:
+        for entry in await self._run_fs(self._list_page, prefix, cursor, limit):
+            yield entry
@@ -0,0 +1,514 @@
+import asyncio
+import contextlib
+import errno
+import hashlib
+import heapq
+import itertools
+import os
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterable, Mapping, Sequence
+from concurrent.futures import Executor
+from functools import partial
+from typing import TypeVar
+
+from app.storage.base import FileStat, StorageDriver
+
+T = TypeVar("T")
+
+_END = object()
+
+
+def _worse(current: BaseException | None, error: BaseException) -> BaseException:
+    # A missing copy is expected on members that don't hold the id; any other disk error says more
+    if current is None or (isinstance(current, FileNotFoundError) and not isinstance(error, FileNotFoundError)):
+        return error
+    return current
+
+
+class _Fanout:
+    # Feeds one upload stream to several writers through small queues, so the slowest disk sets the pace
+    # without buffering the body; a writer that fails is dropped instead of stalling the others.
+    def __init__(self, stream: AsyncIterator[bytes], count: int, depth: int = 4):
+        self.stream = stream
+        self.queues: list[asyncio.Queue] = [asyncio.Queue(maxsize=depth) for _ in range(count)]
+        self.closed = [False] * count
+
+    async def pump(self) -> None:
+        item: object = _END
+        try:
+            async for chunk in self.stream:
+                if all(self.closed):
+                    break
+                # Upstream may hand out views into a buffer it reuses, and each writer consumes at its own pace
+                chunk = chunk if isinstance(chunk, bytes) else bytes(chunk)
+                for index, queue in enumerate(self.queues):
+                    if not self.closed[index]:
+                        await queue.put(chunk)
+        except Exception as e:
+            item = e
+        for index, queue in enumerate(self.queues):
+            if not self.closed[index]:
+                await queue.put(item)
+
+    async def reader(self, index: int) -> AsyncIterator[bytes]:
+        queue = self.queues[index]
+        while (item := await queue.get()) is not _END:
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+    def close(self, index: int) -> None:
+        self.closed[index] = True
+        queue = self.queues[index]
+        while not queue.empty():
+            queue.get_nowait()
+
+
+class OfflineDriver(StorageDriver):
+    # Stands in for a member whose directory was unusable at startup, so every other id keeps its placement
+    def __init__(self, name: str, error: OSError):
+        self.name = name
+        self.error = error
+
+    def _unavailable(self) -> OSError:
+        return OSError(errno.ENODEV, f"Replica '{self.name}' is offline: {self.error}")
+
+    async def save(
+        self,
+        path: str,
+        stream: AsyncIterator[bytes],
+        expected_hashes: Mapping[str, str] | None = None,
+        algorithms: Iterable[str] = (),
+    ) -> dict[str, str]:
+        raise self._unavailable()
+
+    async def read(
+        self,
+        path: str,
+        chunk_size: int | None = None,
+        offset: int = 0,
+        length: int | None = None,
+    ) -> AsyncIterator[bytes]:
+        raise self._unavailable()
+        yield b""
+
+    async def delete(self, path: str) -> bool:
+        raise self._unavailable()
+
+    async def exists(self, path: str) -> bool:
+        raise self._unavailable()
+
+    async def size(self, path: str) -> int:
+        raise self._unavailable()
+
+    async def stat(self, path: str) -> FileStat:
+        raise self._unavailable()
+
+    async def hash(self, path: str, algorithm: str, chunk_size: int | None = None) -> str:
+        raise self._unavailable()
+
+    async def list(self, prefix: str = "", cursor: str | None = None, limit: int = 1000) -> AsyncIterator[tuple[str, FileStat]]:
+        raise self._unavailable()
+        yield
+
+
+class ReplicatedDriver(StorageDriver):
+    # Spreads ids over several member drivers (one per disk) and keeps `copies` of each on the members that rank
+    # highest for it, so load scales with the number of disks and any copies - 1 of them can be lost.
+    # Reads go to the least busy copy and hedge onto the next one when the first chunk is slower than
+    # hedge_delay; a copy that fails mid-stream hands over to the next at the same offset.
+    # Ids whose copies diverged (a member failed a write or delete, or a read found a placed copy missing) are
+    # remembered and repaired in the background; the newest copy wins. The record is in memory only, so after a
+    # restart app.tools.repair_replicas re-checks every id.
+    def __init__(
+        self,
+        replicas: Sequence[StorageDriver],
+        copies: int = 2,
+        min_copies: int = 1,
+        hedge_delay: float = 0.02,
+        fs_executor: Executor | None = None,
+    ):
+        if not replicas:
+            raise ValueError("At least one replica is required")
+        self.replicas = list(replicas)
+        self.copies = min(copies, len(self.replicas))
+        self.min_copies = min(min_copies, self.copies)
+        self.hedge_delay = hedge_delay
+        self.fs_executor = fs_executor
+        self.hedges = 0
+        self.failovers = 0
+        self.degraded_writes = 0
+        self.repaired = 0
+        # Members that were offline at startup keep their slot in the placement but are never asked
+        self.down = {index for index, replica in enumerate(self.replicas) if isinstance(replica, OfflineDriver)}
+        self._reading = [0] * len(self.replicas)
+        self._turns = itertools.count()
+        # Ids to repair, mapped to whether the id should exist (False: it was deleted and stale copies remain)
+        self._repairs: dict[str, bool] = {}
+        self._locks: dict[str, asyncio.Lock] = {}
+        self._lock_users: dict[str, int] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    def _placement(self, path: str) -> list[int]:
+        # Rendezvous hashing: every id ranks the members independently, so ids spread evenly and
+        # adding a member only moves the ids it now wins
+        def score(index: int) -> bytes:
+            return hashlib.blake2b(f"{index}:{path}".encode(), digest_size=8).digest()
+
+        return sorted(range(len(self.replicas)), key=score, reverse=True)
+
+    def _targets(self, path: str) -> list[int]:
+        # While a member is down, the next member in its ids' ranking stands in for it
+        return [index for index in self._placement(path) if index not in self.down][: self.copies]
+
+    def _read_order(self, path: str) -> list[int]:
+        ranked = [index for index in self._placement(path) if index not in self.down]
+        placed, others = ranked[: self.copies], ranked[self.copies :]
+        # Least busy copy first; rotating the ties spreads a hot id over every disk that holds it.
+        # The other members are only asked once the placed copies are missing (members added or reordered).
+        if placed:
+            shift = next(self._turns) % len(placed)
+            placed = placed[shift:] + placed[:shift]
+            placed.sort(key=lambda index: self._reading[index])
+        return placed + others
+
+    @contextlib.asynccontextmanager
+    async def _locked(self, path: str) -> AsyncIterator[None]:
+        # Writes, deletes and repairs of one id are ordered, so a repair never copies over a newer write
+        lock = self._locks.setdefault(path, asyncio.Lock())
+        self._lock_users[path] = self._lock_users.get(path, 0) + 1
+        try:
+            async with lock:
+                yield
+        finally:
+            self._lock_users[path] -= 1
+            if not self._lock_users[path]:
+                del self._lock_users[path]
+                del self._locks[path]
+
+    def _spawn(self, coro: Awaitable[None]) -> None:
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _schedule_repair(self, path: str, present: bool = True) -> None:
+        self._repairs[path] = present
+        self._spawn(self._repair_quietly(path))
+
+    async def _repair_quietly(self, path: str) -> None:
+        with contextlib.suppress(OSError):
+            await self.repair([path])
+
+    async def startup(self) -> None:
+        await asyncio.gather(*(replica.startup() for index, replica in enumerate(self.replicas) if index not in self.down))
+
+    async def shutdown(self) -> None:
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        await asyncio.gather(*(replica.shutdown() for index, replica in enumerate(self.replicas) if index not in self.down))
+
+    async def _write(self, path: str, targets: list[int], write: Callable[[int], Awaitable[dict[str, str]]]) -> dict[str, str]:
+        results = await asyncio.gather(*(write(index) for index in targets), return_exceptions=True)
+        written = [index for index, result in zip(targets, results, strict=True) if not isinstance(result, BaseException)]
+        failed = [index for index, result in zip(targets, results, strict=True) if isinstance(result, BaseException)]
+        errors = [result for result in results if isinstance(result, BaseException)]
+        # Bad ids, digest mismatches and client disconnects fail every copy alike; only disk errors are survivable
+        fatal = next((error for error in errors if not isinstance(error, OSError)), None)
+        if fatal is not None or len(written) < self.min_copies:
+            if not await self._delete_from(path, written):
+                # A copy of the rejected write survived; the repair settles on whichever copy is newest
+                self._schedule_repair(path)
+            raise fatal or errors[0]
+
+        if failed:
+            # Whatever older version the failed members still hold must not be served again
+            self.degraded_writes += 1
+            await self._delete_from(path, failed)
+            self._schedule_repair(path)
+        else:
+            self._repairs.pop(path, None)
+        await self._align_mtimes(path, written)
+        return results[targets.index(written[0])]
+
+    async def _delete_from(self, path: str, indexes: Iterable[int]) -> bool:
+        # Reports whether every copy went; the caller records the id for repair otherwise
+        removed = True
+        for index in indexes:
+            try:
+                await self.replicas[index].delete(path)
+            except OSError:
+                removed = False
+        return removed
+
+    async def _set_mtime(self, index: int, path: str, mtime_ns: int) -> None:
+        local_path = await self.replicas[index].local_path(path)
+        if local_path is not None:
+            with contextlib.suppress(OSError):
+                await asyncio.get_running_loop().run_in_executor(self.fs_executor, partial(os.utime, local_path, ns=(mtime_ns, mtime_ns)))
+
+    async def _align_mtimes(self, path: str, indexes: list[int]) -> None:
+        # Copies share one mtime, so validators don't depend on which copy answers
+        if len(indexes) < 2:
+            return
+        mtime_ns = (await self.replicas[indexes[0]].stat(path)).mtime_ns
+        for index in indexes[1:]:
+            await self._set_mtime(index, path, mtime_ns)
+
+    async def save(
+        self,
+        path: str,
+        stream: AsyncIterator[bytes],
+        expected_hashes: Mapping[str, str] | None = None,
+        algorithms: Iterable[str] = (),
+    ) -> dict[str, str]:
+        targets = self._targets(path)
+        algorithms = list(algorithms)
+        fanout = _Fanout(stream, len(targets))
+
+        async def write(index: int) -> dict[str, str]:
+            slot = targets.index(index)
+            try:
+                return await self.replicas[index].save(path, fanout.reader(slot), expected_hashes=expected_hashes, algorithms=algorithms)
+            finally:
+                fanout.close(slot)
+
+        pump = asyncio.ensure_future(fanout.pump())
+        try:
+            async with self._locked(path):
+                return await self._write(path, targets, write)
+        finally:
+            pump.cancel()
+            await asyncio.gather(pump, return_exceptions=True)
+
+    async def save_parts(
+        self,
+        path: str,
+        part_paths: Iterable[str],
+        expected_hashes: Mapping[str, str] | None = None,
+        algorithms: Iterable[str] = (),
+    ) -> dict[str, str]:
+        targets = self._targets(path)
+        part_paths = list(part_paths)
+        algorithms = list(algorithms)
+
+        async def write(index: int) -> dict[str, str]:
+            return await self.replicas[index].save_parts(path, part_paths, expected_hashes=expected_hashes, algorithms=algorithms)
+
+        async with self._locked(path):
+            return await self._write(path, targets, write)
+
+    async def _open(self, index: int, path: str, chunk_size: int | None, offset: int, length: int | None) -> tuple[AsyncIterator[bytes], bytes | None]:
+        # The hedge races on the first chunk, which covers the open, the seek and the first read
+        stream = self.replicas[index].read(path, chunk_size=chunk_size, offset=offset, length=length)
+        try:
+            return stream, await anext(stream, None)
+        except BaseException:
+            await stream.aclose()
+            raise
+
+    async def _race(
+        self, path: str, order: list[int], chunk_size: int | None, offset: int, length: int | None, failed: list[int]
+    ) -> tuple[int, AsyncIterator[bytes], bytes | None]:
+        waiting = list(order)
+        pending: dict[asyncio.Future, int] = {}
+        error: BaseException | None = None
+        try:
+            while True:
+                if waiting:
+                    if pending:
+                        self.hedges += 1
+                    index = waiting.pop(0)
+                    pending[asyncio.ensure_future(self._open(index, path, chunk_size, offset, length))] = index
+                if not pending:
+                    raise error or FileNotFoundError(path)
+                # A copy that fails or is slower than hedge_delay brings in the next one
+                done, _ = await asyncio.wait(pending, timeout=self.hedge_delay if waiting else None, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    index = pending.pop(task)
+                    try:
+                        stream, first = task.result()
+                    except OSError as e:
+                        error = _worse(error, e)
+                        failed.append(index)
+                        continue
+                    return index, stream, first
+        finally:
+            for task in pending:
+                task.cancel()
+            for result in await asyncio.gather(*pending, return_exceptions=True):
+                if isinstance(result, tuple):
+                    await result[0].aclose()
+
+    async def read(
+        self,
+        path: str,
+        chunk_size: int | None = None,
+        offset: int = 0,
+        length: int | None = None,
+    ) -> AsyncIterator[bytes]:
+        order = self._read_order(path)
+        placed = set(order[: self.copies])
+        failed: list[int] = []
+        while True:
+            index, stream, chunk = await self._race(path, order, chunk_size, offset, length, failed)
+            if placed.intersection(failed) and path not in self._repairs:
+                # Read repair: a placed copy is missing or unreadable while another one serves the id
+                self._schedule_repair(path)
+            order.remove(index)
+            self._reading[index] += 1
+            try:
+                while chunk is not None:
+                    yield chunk
+                    offset += len(chunk)
+                    length = None if length is None else length - len(chunk)
+                    try:
+                        chunk = await anext(stream, None)
+                    except OSError:
+                        # A disk failing mid-stream hands over to the next copy at the same position
+                        if not order:
+                            raise
+                        self.failovers += 1
+                        failed.append(index)
+                        break
+                else:
+                    return
+            finally:
+                self._reading[index] -= 1
+                await stream.aclose()
+
+    async def _first(self, path: str, call: Callable[[StorageDriver], Awaitable[T]]) -> T:
+        error: BaseException | None = None
+        for index in self._read_order(path):
+            try:
+                return await call(self.replicas[index])
+            except OSError as e:
+                error = _worse(error, e)
+        raise error or FileNotFoundError(path)
+
+    async def delete(self, path: str) -> bool:
+        # Every member is asked, so copies left behind by earlier placements go too
+        async with self._locked(path):
+            results = await asyncio.gather(*(replica.delete(path) for replica in self.replicas), return_exceptions=True)
+            for result in results:
+                if isinstance(result, BaseException) and not isinstance(result, OSError):
+                    raise result
+            if all(isinstance(result, BaseException) for result in results):
+                raise results[0]
+            if any(isinstance(result, BaseException) for result in results):
+                # A member that couldn't delete may still hold the id and serve it again
+                self._schedule_repair(path, present=False)
+            else:
+                self._repairs.pop(path, None)
+        return any(result is True for result in results)
+
+    async def _repair(self, path: str, present: bool) -> bool:
+        live = [index for index in range(len(self.replicas)) if index not in self.down]
+        if not present:
+            return await self._delete_from(path, live)
+
+        stats = await asyncio.gather(*(self.replicas[index].stat(path) for index in live), return_exceptions=True)
+        errors = [result for result in stats if isinstance(result, OSError) and not isinstance(result, FileNotFoundError)]
+        holders = {index: result for index, result in zip(live, stats, strict=True) if isinstance(result, FileStat)}
+        if not holders:
+            return not errors
+        source = max(holders, key=lambda index: (holders[index].mtime_ns, holders[index].size))
+        newest = holders[source]
+        targets = self._targets(path)
+        repaired = True
+        for index in targets:
+            current = holders.get(index)
+            if current is not None and (current.mtime_ns, current.size) == (newest.mtime_ns, newest.size):
+                continue
+            try:
+                await self.replicas[index].save(path, self.replicas[source].read(path))
+            except OSError:
+                repaired = False
+                continue
+            await self._set_mtime(index, path, newest.mtime_ns)
+            self.repaired += 1
+        # Copies off the placement are only read as a fallback, but a stale one must not be
+        stale = [index for index, current in holders.items() if index not in targets and (current.mtime_ns, current.size) != (newest.mtime_ns, newest.size)]
+        return await self._delete_from(path, stale) and repaired and not errors
+
+    async def repair(self, paths: Iterable[str] | None = None) -> int:
+        # Brings the given ids (by default the ones recorded as diverged) back to `copies` matching copies;
+        # returns how many are still unrepaired, e.g. because a member is down
+        paths = list(self._repairs) if paths is None else list(paths)
+        unrepaired = 0
+        for path in paths:
+            async with self._locked(path):
+                present = self._repairs.pop(path, True)
+                try:
+                    done = await self._repair(path, present)
+                except OSError:
+                    done = False
+                if not done:
+                    self._repairs[path] = present
+                    unrepaired += 1
+        return unrepaired
+
+    async def exists(self, path: str) -> bool:
+        for index in self._read_order(path):
+            with contextlib.suppress(OSError):
+                if await self.replicas[index].exists(path):
+                    return True
+        return False
+
+    async def size(self, path: str) -> int:
+        return await self._first(path, lambda replica: replica.size(path))
+
+    async def stat(self, path: str) -> FileStat:
+        return await self._first(path, lambda replica: replica.stat(path))
+
+    async def hash(self, path: str, algorithm: str, chunk_size: int | None = None) -> str:
+        return await self._first(path, lambda replica: replica.hash(path, algorithm, chunk_size))
+
+    async def hashes(self, path: str, algorithms: Iterable[str], chunk_size: int | None = None) -> dict[str, str]:
+        algorithms = list(algorithms)
+        return await self._first(path, lambda replica: replica.hashes(path, algorithms, chunk_size))
+
+    async def local_path(self, path: str) -> str | None:
+        # Only a copy that is there right now can be handed to sendfile; otherwise read() does the failover
+        loop = asyncio.get_running_loop()
+        for index in self._read_order(path)[: self.copies]:
+            local_path = await self.replicas[index].local_path(path)
+            if local_path is not None and await loop.run_in_executor(self.fs_executor, os.path.exists, local_path):
+                return local_path
+        return None
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "replicas": len(self.replicas),
+            "copies": self.copies,
+            "hedges": self.hedges,
+            "failovers": self.failovers,
+            "degraded_writes": self.degraded_writes,
+            "down": len(self.down),
+            "pending_repairs": len(self._repairs),
+            "repaired": self.repaired,
+        }
+
+    # Each member's page holds its first `limit` ids after the cursor, so the merged page is exact
+    async def list(self, prefix: str = "", cursor: str | None = None, limit: int = 1000) -> AsyncIterator[tuple[str, FileStat]]:
+        async def page(replica: StorageDriver) -> list[tuple[str, FileStat]]:
+            return [entry async for entry in replica.list(prefix=prefix, cursor=cursor, limit=limit)]
+
+        live = [replica for index, replica in enumerate(self.replicas) if index not in self.down]
+        pages = await asyncio.gather(*(page(replica) for replica in live), return_exceptions=True)
+        for result in pages:
+            if isinstance(result, BaseException) and not isinstance(result, OSError):
+                raise result
+        readable = [result for result in pages if not isinstance(result, BaseException)]
+        if not readable:
+            raise pages[0]
+
+        emitted = 0
+        previous = None
+        for name, file_stat in heapq.merge(*readable, key=lambda entry: entry[0]):
+            if name == previous:
+                continue
+            if emitted == limit:
+                return
+            previous = name
+            emitted += 1
+            yield name, file_stat
@@ -0,0 +1,347 @@
+import asyncio
+import contextlib
+import os
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterable, Mapping
+from functools import partial
+from typing import Any, TypeVar
+
+from app.storage.base import FileStat, StorageDriver
+from app.storage.enums import TierMode
+from app.storage.local import LocalFileDriver
+from app.utils.helpers import bounded_map
+
+T = TypeVar("T")
+
+
+class TieredDriver(StorageDriver):
+    # The capacity tier holds every object; the fast tier holds a byte-bounded, size-aware LRU subset.
+    # Writes land on the fast tier first and reach capacity before returning (write-through) or from
+    # background flush workers (write-back; dirty objects are never evicted). Reads that miss the fast
+    # tier are served from capacity and promote the object in the background.
+    def __init__(
+        self,
+        fast: LocalFileDriver,
+        capacity: StorageDriver,
+        max_bytes: int,
+        mode: TierMode = TierMode.WRITE_THROUGH,
+        promote_max_size: int | None = None,
+        workers: int = 4,
+        retry_delay: float = 1.0,
+    ):
+        self.fast = fast
+        self.capacity = capacity
+        self.max_bytes = max_bytes
+        self.mode = mode
+        # Anything bigger would flush most of the tier for a single object
+        self.promote_max_size = max_bytes // 4 if promote_max_size is None else promote_max_size
+        self.workers = workers
+        self.retry_delay = retry_delay
+        self.hits = 0
+        self.misses = 0
+        self.promotions = 0
+        self.evictions = 0
+        self.flush_failures = 0
+        self._resident: OrderedDict[str, int] = OrderedDict()
+        self._resident_bytes = 0
+        self._dirty: set[str] = set()
+        # Per-id locks order saves, deletes, promotions, flushes and evictions of the same object
+        self._locks: dict[str, asyncio.Lock] = {}
+        self._lock_users: dict[str, int] = {}
+        self._promoting: set[str] = set()
+        self._promote_slots: asyncio.Semaphore | None = None
+        self._flush_queue: asyncio.Queue[str] | None = None
+        self._tasks: set[asyncio.Task] = set()
+
+    @property
+    def write_back(self) -> bool:
+        return self.mode == TierMode.WRITE_BACK
+
+    async def _run_fs(self, func: Callable[..., T], *args: Any) -> T:
+        return await asyncio.get_running_loop().run_in_executor(self.fast.fs_executor, func, *args)
+
+    @contextlib.asynccontextmanager
+    async def _locked(self, path: str) -> AsyncIterator[None]:
+        lock = self._locks.setdefault(path, asyncio.Lock())
+        self._lock_users[path] = self._lock_users.get(path, 0) + 1
+        try:
+            async with lock:
+                yield
+        finally:
+            self._lock_users[path] -= 1
+            if not self._lock_users[path]:
+                del self._lock_users[path]
+                del self._locks[path]
+
+    def _spawn(self, coro: Awaitable[None]) -> None:
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _track(self, path: str, size: int) -> None:
+        self._untrack(path)
+        self._resident[path] = size
+        self._resident_bytes += size
+
+    def _untrack(self, path: str) -> None:
+        size = self._resident.pop(path, None)
+        if size is not None:
+            self._resident_bytes -= size
+
+    def _touch(self, path: str) -> bool:
+        if path not in self._resident:
+            return False
+        self._resident.move_to_end(path)
+        return True
+
+    async def _ensure_parent(self, driver: StorageDriver, path: str) -> None:
+        # Ids with directories need them on whichever tier the copy lands on
+        local_path = await driver.local_path(path)
+        if local_path is not None:
+            await self._run_fs(partial(os.makedirs, os.path.dirname(local_path), exist_ok=True))
+
+    async def _copy_mtime(self, driver: StorageDriver, path: str, mtime_ns: int) -> None:
+        # Both copies keep the same mtime, so validators don't change when an object moves between tiers
+        local_path = await driver.local_path(path)
+        if local_path is not None:
+            with contextlib.suppress(FileNotFoundError):
+                await self._run_fs(partial(os.utime, local_path, ns=(mtime_ns, mtime_ns)))
+
+    async def _copy(self, source: StorageDriver, target: StorageDriver, path: str) -> FileStat:
+        file_stat = await source.stat(path)
+        await self._ensure_parent(target, path)
+        await target.save(path, source.read(path))
+        await self._copy_mtime(target, path, file_stat.mtime_ns)
+        return file_stat
+
+    def _queue(self) -> asyncio.Queue[str]:
+        if self._flush_queue is None:
+            raise RuntimeError("TieredDriver.startup() was not called")
+        return self._flush_queue
+
+    async def _committed(self, path: str) -> None:
+        # Called with the id locked, right after a new version landed on the fast tier
+        self._track(path, (await self.fast.stat(path)).size)
+        if self.write_back:
+            self._dirty.add(path)
+            self._queue().put_nowait(path)
+            return
+        try:
+            await self._copy(self.fast, self.capacity, path)
+        except BaseException:
+            # The write failed, so the previous version in capacity stays authoritative
+            self._untrack(path)
+            await self.fast.delete(path)
+            raise
+
+    async def save(
+        self,
+        path: str,
+        stream: AsyncIterator[bytes],
+        expected_hashes: Mapping[str, str] | None = None,
+        algorithms: Iterable[str] = (),
+    ) -> dict[str, str]:
+        async with self._locked(path):
+            await self._ensure_parent(self.fast, path)
+            digests = await self.fast.save(path, stream, expected_hashes=expected_hashes, algorithms=algorithms)
+            await self._committed(path)
+        await self._enforce_budget()
+        return digests
+
+    async def save_parts(
+        self,
+        path: str,
+        part_paths: Iterable[str],
+        expected_hashes: Mapping[str, str] | None = None,
+        algorithms: Iterable[str] = (),
+    ) -> dict[str, str]:
+        async with self._locked(path):
+            await self._ensure_parent(self.fast, path)
+            digests = await self.fast.save_parts(path, part_paths, expected_hashes=expected_hashes, algorithms=algorithms)
+            await self._committed(path)
+        await self._enforce_budget()
+        return digests
+
+    def _schedule_promotion(self, path: str) -> None:
+        if path in self._promoting or self._promote_slots is None:
+            return
+        self._promoting.add(path)
+        self._spawn(self._promote(path, self._promote_slots))
+
+    async def _promote(self, path: str, slots: asyncio.Semaphore) -> None:
+        try:
+            async with slots, self._locked(path):
+                if path in self._resident:
+                    return
+                try:
+                    file_stat = await self.capacity.stat(path)
+                    if file_stat.size > self.promote_max_size:
+                        return
+                    await self._copy(self.capacity, self.fast, path)
+                except Exception:
+                    # Promotion is an optimisation: the object stays readable from capacity
+                    with contextlib.suppress(Exception):
+                        await self.fast.delete(path)
+                    return
+                self._track(path, file_stat.size)
+                self.promotions += 1
+            await self._enforce_budget()
+        finally:
+            self._promoting.discard(path)
+
+    async def _enforce_budget(self) -> None:
+        while self._resident_bytes > self.max_bytes:
+            victim = next((path for path in self._resident if path not in self._dirty and path not in self._locks), None)
+            if victim is None:
+                return
+            async with self._locked(victim):
+                if victim not in self._resident or victim in self._dirty:
+                    continue
+                self._untrack(victim)
+                await self.fast.delete(victim)
+                self.evictions += 1
+
+    async def _flush_worker(self, queue: asyncio.Queue[str]) -> None:
+        while True:
+            path = await queue.get()
+            try:
+                async with self._locked(path):
+                    if path in self._dirty:
+                        await self._copy(self.fast, self.capacity, path)
+                        self._dirty.discard(path)
+            except FileNotFoundError:
+                self._dirty.discard(path)
+            except Exception:
+                self.flush_failures += 1
+                asyncio.get_running_loop().call_later(self.retry_delay, queue.put_nowait, path)
+            finally:
+                queue.task_done()
+            # Flushed objects become evictable
+            await self._enforce_budget()
+
+    async def flush(self) -> None:
+        if self._flush_queue is not None:
+            await self._flush_queue.join()
+
+    async def _reconcile(self, path: str) -> None:
+        fast_stat = await self.fast.stat(path)
+        try:
+            capacity_stat = await self.capacity.stat(path)
+        except FileNotFoundError:
+            capacity_stat = None
+        if capacity_stat is not None and capacity_stat.mtime_ns == fast_stat.mtime_ns and capacity_stat.size == fast_stat.size:
+            return
+        if self.write_back:
+            # A write acknowledged before a crash or restart that never reached capacity
+            self._dirty.add(path)
+            self._queue().put_nowait(path)
+        else:
+            # Write-through never acknowledges a write capacity doesn't have, so the fast copy is stale
+            self._untrack(path)
+            await self.fast.delete(path)
+
+    async def startup(self) -> None:
+        await self.fast.startup()
+        await self.capacity.startup()
+        self._promote_slots = asyncio.Semaphore(self.workers)
+        if self.write_back:
+            self._flush_queue = asyncio.Queue()
+            for _ in range(self.workers):
+                self._spawn(self._flush_worker(self._flush_queue))
+
+        entries = await self._run_fs(lambda: sorted(self.fast.scan(), key=lambda entry: entry[1].mtime_ns))
+        for path, file_stat in entries:
+            self._track(path, file_stat.size)
+        async for _ in bounded_map(self._reconcile, [path for path, _ in entries], self.workers):
+            pass
+        await self._enforce_budget()
+
+    async def shutdown(self) -> None:
+        await self.flush()
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        await self.fast.shutdown()
+        await self.capacity.shutdown()
+
+    async def read(
+        self,
+        path: str,
+        chunk_size: int | None = None,
+        offset: int = 0,
+        length: int | None = None,
+    ) -> AsyncIterator[bytes]:
+        if self._touch(path):
+            self.hits += 1
+            started = False
+            try:
+                async for chunk in self.fast.read(path, chunk_size=chunk_size, offset=offset, length=length):
+                    started = True
+                    yield chunk
+                return
+            except FileNotFoundError:
+                # Evicted between the lookup and the open
+                if started:
+                    raise
+        else:
+            self.misses += 1
+            self._schedule_promotion(path)
+        async for chunk in self.capacity.read(path, chunk_size=chunk_size, offset=offset, length=length):
+            yield chunk
+
+    async def _metadata(self, path: str, call: Callable[[StorageDriver], Awaitable[T]]) -> T:
+        if path in self._resident:
+            with contextlib.suppress(FileNotFoundError):
+                return await call(self.fast)
+        return await call(self.capacity)
+
+    async def delete(self, path: str) -> bool:
+        async with self._locked(path):
+            self._untrack(path)
+            self._dirty.discard(path)
+            removed_fast = await self.fast.delete(path)
+            removed_capacity = await self.capacity.delete(path)
+        return removed_fast or removed_capacity
+
+    async def exists(self, path: str) -> bool:
+        return (path in self._resident and await self.fast.exists(path)) or await self.capacity.exists(path)
+
+    async def size(self, path: str) -> int:
+        return await self._metadata(path, lambda driver: driver.size(path))
+
+    async def stat(self, path: str) -> FileStat:
+        return await self._metadata(path, lambda driver: driver.stat(path))
+
+    async def hash(self, path: str, algorithm: str, chunk_size: int | None = None) -> str:
+        return await self._metadata(path, lambda driver: driver.hash(path, algorithm, chunk_size))
+
+    async def hashes(self, path: str, algorithms: Iterable[str], chunk_size: int | None = None) -> dict[str, str]:
+        algorithms = list(algorithms)
+        return await self._metadata(path, lambda driver: driver.hashes(path, algorithms, chunk_size))
+
+    async def local_path(self, path: str) -> str | None:
+        if self._touch(path):
+            self.hits += 1
+            # Nothing pins the fast copy until the caller opens it. An eviction in between is untracked first,
+            # so a caller that finds the file gone and asks again (as SendfileResponse does) gets the capacity copy.
+            return await self.fast.local_path(path)
+        self.misses += 1
+        self._schedule_promotion(path)
+        return await self.capacity.local_path(path)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "promotions": self.promotions,
+            "evictions": self.evictions,
+            "flush_failures": self.flush_failures,
+            "resident_objects": len(self._resident),
+            "resident_bytes": self._resident_bytes,
+            "max_bytes": self.max_bytes,
+            "dirty": len(self._dirty),
+        }
+
+    # Capacity is authoritative for listings; with write-back, new objects show up once they are flushed
+    def list(self, prefix: str = "", cursor: str | None = None, limit: int = 1000) -> AsyncIterator[tuple[str, FileStat]]:
+        return self.capacity.list(prefix=prefix, cursor=cursor, limit=limit)
@@ -0,0 +1,22 @@
+import asyncio
+
+from app.config.settings import Settings
+from app.storage.cas import ContentAddressedDriver
+from app.storage.factory import base_drivers, build_storage_driver
+
+
+# Safe against a live store: a save that links to a blob just as it is collected keeps its data, only that
+# content is no longer deduplicated against later uploads.
+async def main() -> None:
+    settings = Settings()
+    drivers = [driver for driver in base_drivers(build_storage_driver(settings)) if isinstance(driver, ContentAddressedDriver)]
+    if not drivers:
+        raise SystemExit("storage_driver is not cas; there are no blobs to collect")
+
+    for driver in drivers:
+        removed = await driver.collect_garbage()
+        print(f"Removed {removed} unreferenced blobs from {driver.blobs_dir}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,32 @@
+import asyncio
+
+from app.config.settings import Settings
+from app.storage.factory import base_drivers, build_storage_driver
+from app.storage.local import LocalFileDriver
+from app.storage.replicated import OfflineDriver
+
+
+# Safe against a live store: the service keeps serving flat ids until they are moved, as long as it runs with
+# the same shard settings and shard_fallback enabled. Logical ids don't change, so the metadata index stays valid.
+async def main() -> None:
+    settings = Settings()
+    if not settings.shard_levels:
+        raise SystemExit("Set shard_levels to the target layout before migrating")
+
+    # Every directory the stack stores objects in (tiers, replicas) is migrated; wrappers don't change the layout
+    layers = list(base_drivers(build_storage_driver(settings)))
+    drivers = [layer for layer in layers if isinstance(layer, LocalFileDriver)]
+    if not drivers:
+        raise SystemExit(f"storage_driver={settings.storage_driver.value} has no local directories to migrate")
+
+    for driver in drivers:
+        moved = await driver.migrate_to_shards()
+        print(f"Moved {moved} files into {driver.shards_dir}")
+    for layer in layers:
+        if isinstance(layer, OfflineDriver):
+            print(f"Skipped {layer.name}, which is offline; run again once it is back")
+    print("shard_fallback can be disabled once no flat files remain")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,25 @@
+import asyncio
+import os
+
+from app.config.settings import Settings
+from app.storage.factory import build_storage_driver
+from app.storage.index import MetadataIndex
+from app.storage.indexed import IndexedDriver
+from app.storage.local import INTERNAL_DIR
+
+
+# Only the driver stack and the index are built: starting the full app here would clear the running service's
+# ingest spool, collect CAS blobs and rebuild the index a second time from IndexedDriver.startup().
+async def main() -> None:
+    settings = Settings()
+    index = MetadataIndex(settings.metadata_index_path or os.path.join(settings.base_dir, INTERNAL_DIR, "index.sqlite3"))
+    try:
+        driver = IndexedDriver(build_storage_driver(settings), index)
+        count = await driver.rebuild()
+        print(f"Indexed {count} files from {index.db_path}")
+    finally:
+        index.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
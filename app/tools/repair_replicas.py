@@ -0,0 +1,32 @@
+import asyncio
+
+from app.config.settings import Settings
+from app.storage.factory import build_storage_driver, driver_stack
+from app.storage.replicated import ReplicatedDriver
+
+
+# Safe against a live store. The running service only remembers diverged ids until it restarts; this pass
+# checks every id, brings each back to replica_copies matching copies (the newest wins) and drops stale strays.
+# Ids deleted while a member was down can't be told apart from live ones and come back once it returns.
+async def main(page_size: int = 1000) -> None:
+    settings = Settings()
+    driver = next((layer for layer in driver_stack(build_storage_driver(settings)) if isinstance(layer, ReplicatedDriver)), None)
+    if driver is None:
+        raise SystemExit("replica_dirs is not set; there is nothing to repair")
+
+    checked = unrepaired = 0
+    cursor = None
+    while True:
+        page = [file_id async for file_id, _ in driver.list(cursor=cursor, limit=page_size)]
+        unrepaired += await driver.repair(page)
+        checked += len(page)
+        if len(page) < page_size:
+            break
+        cursor = page[-1]
+    print(f"Checked {checked} files, copied {driver.repaired} replicas; {unrepaired} files could not be repaired")
+    if driver.down:
+        print(f"{len(driver.down)} replica directories are offline; run again once they are back")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
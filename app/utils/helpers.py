@@ -1,16 +1,119 @@
+import asyncio
+import base64
+import binascii
+import os
+import tempfile
+from collections.abc import Awaitable, Callable, Iterable
 from pathlib import Path
-from typing import AsyncIterator
+from typing import AsyncIterator, TypeVar
 
+T = TypeVar("T")
+R = TypeVar("R")
 
-def safe_join(base_dir: str, relative_path: str) -> str:
-    base = Path(base_dir).resolve()
+
+def safe_join(base_dir: str, relative_path: str, base_resolved: bool = False) -> str:
+    base = Path(base_dir) if base_resolved else Path(base_dir).resolve()
     target = (base / relative_path).resolve()
 
-    if not str(target).startswith(str(base)):
+    if target != base and base not in target.parents:
         raise ValueError("Path escapes base directory")
 
     return str(target)
 
 
+def fast_safe_join(resolved_base: str, relative_path: str) -> str:
+    # Purely lexical, so it can run on the event loop: a relative path without ".." can't leave the base.
+    # Symlinks aren't looked at here; callers check them in the syscall that touches the file anyway.
+    if "\0" in relative_path or os.path.isabs(relative_path) or ".." in relative_path.split(os.sep):
+        raise ValueError("Path escapes base directory")
+    return os.path.normpath(os.path.join(resolved_base, relative_path))
+
+
+def _current_umask() -> int:
+    # os.umask can only be read by setting it, so this runs once at import, before any worker threads exist
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+UMASK = _current_umask()
+
+
+def mkstemp_shared(directory: str, prefix: str) -> tuple[int, str]:
+    # mkstemp creates 0600 files; staged files get renamed into place, so they take the mode open() would have given them
+    fd, path = tempfile.mkstemp(dir=directory, prefix=prefix)
+    try:
+        os.fchmod(fd, 0o666 & ~UMASK)
+    except BaseException:
+        os.close(fd)
+        os.unlink(path)
+        raise
+    return fd, path
+
+
+def adaptive_chunk_size(span: int, min_chunk: int, max_chunk: int) -> int:
+    # Roughly 16 reads per object, so big files take few awaits and small ones don't over-allocate
+    return max(min_chunk, min(max_chunk, span // 16))
+
+
+async def coalesce_chunks(stream: AsyncIterator[bytes], buffer_size: int) -> AsyncIterator[bytes | memoryview]:
+    # Yields views into a single reused buffer: each chunk must be consumed before the next is pulled
+    buffer = bytearray(buffer_size)
+    view = memoryview(buffer)
+    filled = 0
+    async for chunk in stream:
+        size = len(chunk)
+        if filled + size > buffer_size and filled:
+            yield view[:filled]
+            filled = 0
+        if size >= buffer_size:
+            yield chunk
+            continue
+        view[filled : filled + size] = chunk
+        filled += size
+    if filled:
+        yield view[:filled]
+
+
+async def bounded_map(func: Callable[[T], Awaitable[R]], items: Iterable[T], limit: int) -> AsyncIterator[tuple[T, R | Exception]]:
+    # At most `limit` calls in flight and results yielded as they finish, so memory stays flat for any input size
+    iterator = iter(items)
+    results: asyncio.Queue[tuple[T, R | Exception] | None] = asyncio.Queue(maxsize=limit)
+
+    async def worker() -> None:
+        for item in iterator:
+            try:
+                result: R | Exception = await func(item)
+            except Exception as e:
+                result = e
+            await results.put((item, result))
+        await results.put(None)
+
+    workers = [asyncio.create_task(worker()) for _ in range(limit)]
+    try:
+        running = len(workers)
+        while running:
+            entry = await results.get()
+            if entry is None:
+                running -= 1
+            else:
+                yield entry
+    finally:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+
+def encode_cursor(file_id: str) -> str:
+    return base64.urlsafe_b64encode(file_id.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> str:
+    try:
+        return base64.b64decode(token + "=" * (-len(token) % 4), altchars=b"-_", validate=True).decode()
+    except (binascii.Error, UnicodeDecodeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
 async def _to_stream(data: bytes) -> AsyncIterator[bytes]:
     yield data
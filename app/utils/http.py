@@ -0,0 +1,142 @@
+from collections.abc import AsyncIterator, Callable
+from email.utils import formatdate, parsedate_to_datetime
+
+from app.storage.base import FileStat
+
+ETAG_ALGORITHM = "sha256"
+MAX_RANGES = 64
+
+
+class RangeNotSatisfiableError(ValueError):
+    pass
+
+
+def make_etag(file_stat: FileStat) -> str:
+    digest = file_stat.digests.get(ETAG_ALGORITHM)
+    if digest:
+        return f'"{digest}"'
+    return f'"{file_stat.mtime_ns:x}-{file_stat.size:x}"'
+
+
+def make_last_modified(file_stat: FileStat) -> str:
+    return formatdate(file_stat.mtime_ns / 1e9, usegmt=True)
+
+
+def _parse_http_date(value: str) -> float | None:
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def _etag_matches(header: str, etag: str, weak: bool) -> bool:
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            if not weak:
+                continue
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def is_not_modified(if_none_match: str | None, if_modified_since: str | None, etag: str, file_stat: FileStat) -> bool:
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag, weak=True)
+    if if_modified_since is not None:
+        since = _parse_http_date(if_modified_since)
+        return since is not None and int(file_stat.mtime_ns // 1_000_000_000) <= since
+    return False
+
+
+def if_range_matches(if_range: str | None, etag: str, file_stat: FileStat) -> bool:
+    if if_range is None:
+        return True
+    if if_range.startswith('"') or if_range.startswith("W/"):
+        return _etag_matches(if_range, etag, weak=False)
+    date = _parse_http_date(if_range)
+    return date is not None and int(file_stat.mtime_ns // 1_000_000_000) == date
+
+
+def parse_accept_encoding(header: str | None) -> set[str]:
+    accepted = set()
+    for item in (header or "").split(","):
+        coding, _, params = item.partition(";")
+        coding = coding.strip().lower()
+        if not coding or coding == "*":
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            accepted.add(coding)
+    return accepted
+
+
+# Returns half-open (start, end) ranges, or None when the header must be ignored
+def parse_range_header(header: str, size: int) -> list[tuple[int, int]] | None:
+    unit, _, specs = header.partition("=")
+    if unit.strip().lower() != "bytes" or not specs.strip():
+        return None
+
+    parts = specs.split(",")
+    if len(parts) > MAX_RANGES:
+        return None
+
+    ranges = []
+    for part in parts:
+        first, sep, last = part.strip().partition("-")
+        if not sep:
+            return None
+        try:
+            if not first:
+                suffix = int(last)
+                if suffix <= 0:
+                    continue
+                ranges.append((max(size - suffix, 0), size))
+                continue
+            start = int(first)
+            end = int(last) + 1 if last else None
+        except ValueError:
+            return None
+        if start < 0 or (end is not None and end <= start):
+            return None
+        if start >= size:
+            continue
+        ranges.append((start, size if end is None else min(end, size)))
+
+    if not ranges:
+        raise RangeNotSatisfiableError(f"bytes */{size}")
+    return ranges
+
+
+def multipart_byteranges(
+    ranges: list[tuple[int, int]],
+    size: int,
+    content_type: str,
+    boundary: str,
+    read: Callable[[int, int], AsyncIterator[bytes]],
+) -> tuple[int, AsyncIterator[bytes]]:
+    def part_header(start: int, end: int) -> bytes:
+        return f"--{boundary}\r\nContent-Type: {content_type}\r\nContent-Range: bytes {start}-{end - 1}/{size}\r\n\r\n".encode("latin-1")
+
+    closing = f"--{boundary}--\r\n".encode("latin-1")
+    content_length = sum(len(part_header(start, end)) + (end - start) + 2 for start, end in ranges) + len(closing)
+
+    async def body() -> AsyncIterator[bytes]:
+        for start, end in ranges:
+            yield part_header(start, end)
+            async for chunk in read(start, end - start):
+                yield chunk
+            yield b"\r\n"
+        yield closing
+
+    return content_length, body()
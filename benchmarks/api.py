@@ -0,0 +1,204 @@
+import argparse
+import asyncio
+import contextlib
+import hashlib
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable
+
+import httpx
+
+from app.config.settings import Settings
+from app.core.app_factory import create_app
+from benchmarks.common import Result, add_report_arguments, format_size, measure, parse_list, parse_size, report
+
+SCENARIOS = ("upload", "upload_hash", "upload_background", "download", "delete", "mixed")
+# Files that download-style scenarios cycle over, so reads aren't all served from one hot object
+SEED_FILES = 32
+
+
+@contextlib.asynccontextmanager
+async def asgi_client(base_dir: str, args: argparse.Namespace) -> AsyncIterator[tuple[httpx.AsyncClient, int | None]]:
+    settings = Settings(debug=False, base_dir=base_dir, ingest_max_pending=args.max_pending)
+    app = create_app(settings)
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            yield client, None
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextlib.asynccontextmanager
+async def uvicorn_client(base_dir: str, args: argparse.Namespace) -> AsyncIterator[tuple[httpx.AsyncClient, int | None]]:
+    port = _free_port()
+    # Settings are case-sensitive, so the environment uses the field names as-is
+    env = {**os.environ, "base_dir": base_dir, "debug": "false", "ingest_max_pending": str(args.max_pending)}
+    command = [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"]
+    server = subprocess.Popen(command, env=env)
+    limits = httpx.Limits(max_connections=max(args.concurrency_levels), max_keepalive_connections=max(args.concurrency_levels))
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=None, limits=limits) as client:
+            deadline = time.monotonic() + 30
+            while True:
+                try:
+                    (await client.get("/ping")).raise_for_status()
+                    break
+                except httpx.TransportError:
+                    if server.poll() is not None or time.monotonic() > deadline:
+                        raise RuntimeError("uvicorn did not start") from None
+                    await asyncio.sleep(0.1)
+            yield client, server.pid
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def _check(response: httpx.Response, expected: int) -> None:
+    if response.status_code != expected:
+        raise RuntimeError(f"{response.request.method} {response.request.url} returned {response.status_code}")
+
+
+async def _seed(client: httpx.AsyncClient, names: list[str], payload: bytes, concurrency: int) -> None:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def put(name: str) -> None:
+        async with semaphore:
+            _check(await client.post("/files", headers={"X-File-Id": name}, content=payload), 204)
+
+    await asyncio.gather(*(put(name) for name in names))
+
+
+async def _wait_for_jobs(client: httpx.AsyncClient, job_ids: list[str]) -> None:
+    for job_id in job_ids:
+        while True:
+            job = (await client.get(f"/jobs/{job_id}")).json()
+            if job["status"] in ("done", "failed"):
+                break
+            await asyncio.sleep(0.005)
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    target: str,
+    scenario: str,
+    size: int,
+    concurrency: int,
+    args: argparse.Namespace,
+    rss_pid: int | None,
+) -> Result:
+    payload = os.urandom(size)
+    digest = hashlib.sha256(payload).hexdigest()
+    prefix = f"bench-{scenario}-{size}-{concurrency}"
+    operations = args.operations
+    job_ids: list[str] = []
+
+    async def upload(i: int) -> int:
+        _check(await client.post("/files", headers={"X-File-Id": f"{prefix}-{i}"}, content=payload), 204)
+        return size
+
+    async def upload_hash(i: int) -> int:
+        headers = {"X-File-Id": f"{prefix}-{i}", "X-File-Hash": digest, "X-File-Hash-Algorithm": "sha256"}
+        _check(await client.post("/files", headers=headers, content=payload), 204)
+        return size
+
+    async def upload_background(i: int) -> int:
+        response = await client.post("/files", params={"background": "true"}, headers={"X-File-Id": f"{prefix}-{i}"}, content=payload)
+        _check(response, 202)
+        job_ids.append(response.json()["job_id"])
+        return size
+
+    async def download(i: int) -> int:
+        response = await client.get(f"/files/{prefix}-seed-{i % SEED_FILES}")
+        _check(response, 200)
+        return len(response.content)
+
+    async def delete(i: int) -> int:
+        _check(await client.delete(f"/files/{prefix}-{i}"), 204)
+        return 0
+
+    async def mixed(i: int) -> int:
+        # 75% reads, 20% overwrites of the same objects, 5% deletes of scratch objects
+        slot = i % 20
+        if slot < 15:
+            return await download(i)
+        if slot < 19:
+            _check(await client.post("/files", headers={"X-File-Id": f"{prefix}-seed-{i % SEED_FILES}"}, content=payload), 204)
+            return size
+        return await delete(i)
+
+    operation: Callable[[int], Awaitable[int]]
+    match scenario:
+        case "upload":
+            operation = upload
+        case "upload_hash":
+            operation = upload_hash
+        case "upload_background":
+            operation = upload_background
+        case "download":
+            await _seed(client, [f"{prefix}-seed-{i}" for i in range(SEED_FILES)], payload, concurrency)
+            operation = download
+        case "delete":
+            await _seed(client, [f"{prefix}-{i}" for i in range(operations)], payload, concurrency)
+            operation = delete
+        case "mixed":
+            await _seed(client, [f"{prefix}-seed-{i}" for i in range(SEED_FILES)], payload, concurrency)
+            await _seed(client, [f"{prefix}-{i}" for i in range(19, operations, 20)], payload, concurrency)
+            operation = mixed
+        case _:
+            raise ValueError(f"Unknown scenario: {scenario}")
+
+    if scenario != "upload_background":
+        return await measure(target, scenario, size, concurrency, operations, operation, rss_pid)
+
+    # Background uploads are only done once the workers have written them, so that wait is part of the run
+    started = time.perf_counter()
+    result = await measure(target, scenario, size, concurrency, operations, operation, rss_pid)
+    await _wait_for_jobs(client, job_ids)
+    result.seconds = round(time.perf_counter() - started, 6)
+    result.mb_per_s = round(result.bytes / result.seconds / 1_000_000, 3)
+    result.ops_per_s = round(operations / result.seconds, 3)
+    return result
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description="Throughput and latency of the files API, in-process (ASGI) or against uvicorn")
+    parser.add_argument("--target", choices=("asgi", "uvicorn", "both"), default="asgi")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--sizes", default="4KiB,256KiB,8MiB", help="Comma-separated object sizes")
+    parser.add_argument("--concurrency", default="1,16,64", help="Comma-separated concurrency levels")
+    parser.add_argument("--operations", type=int, default=200, help="Requests per scenario, size and concurrency level")
+    parser.add_argument("--max-pending", type=int, default=1024, help="Ingest queue bound for background uploads")
+    add_report_arguments(parser)
+    args = parser.parse_args()
+    args.sizes = parse_list(args.sizes, parse_size)
+    args.concurrency_levels = parse_list(args.concurrency)
+    scenarios = [scenario for scenario in args.scenarios.split(",") if scenario]
+    targets = {"asgi": [("asgi", asgi_client)], "uvicorn": [("uvicorn", uvicorn_client)]}
+    targets["both"] = targets["asgi"] + targets["uvicorn"]
+
+    results = []
+    for target, client_factory in targets[args.target]:
+        for scenario in scenarios:
+            for size in args.sizes:
+                for concurrency in args.concurrency_levels:
+                    # A fresh store per run keeps directory size and page cache effects comparable
+                    with tempfile.TemporaryDirectory(prefix="keeper-bench-") as base_dir:
+                        async with client_factory(base_dir, args) as (client, rss_pid):
+                            result = await run_scenario(client, target, scenario, size, concurrency, args, rss_pid)
+                    print(result.describe(), file=sys.stderr)
+                    results.append(result)
+    print(f"{len(results)} runs over sizes {', '.join(format_size(size) for size in args.sizes)}", file=sys.stderr)
+    return report(results, args)
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
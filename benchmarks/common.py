@@ -0,0 +1,195 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from collections.abc import Awaitable, Callable, Sequence
+from dataclasses import asdict, dataclass
+
+_SUFFIXES = {"k": 1024, "m": 1024**2, "g": 1024**3}
+
+
+def parse_size(value: str) -> int:
+    value = value.strip().lower().removesuffix("ib").removesuffix("b")
+    if value and value[-1] in _SUFFIXES:
+        return int(float(value[:-1]) * _SUFFIXES[value[-1]])
+    return int(value)
+
+
+def parse_list(value: str, parse: Callable[[str], int] = int) -> list[int]:
+    return [parse(item) for item in value.split(",") if item.strip()]
+
+
+def format_size(size: int) -> str:
+    for suffix, factor in (("GiB", 1024**3), ("MiB", 1024**2), ("KiB", 1024)):
+        if size >= factor and size % factor == 0:
+            return f"{size // factor}{suffix}"
+    return f"{size}B"
+
+
+def percentile(sorted_values: Sequence[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def peak_rss_mib(pid: int | None = None) -> float | None:
+    # VmHWM is the peak resident set of another process; ru_maxrss covers our own (KiB on Linux, bytes on macOS)
+    if pid is not None:
+        try:
+            with open(f"/proc/{pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmHWM:"):
+                        return int(line.split()[1]) / 1024
+        except OSError:
+            return None
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+@dataclass
+class Result:
+    target: str
+    scenario: str
+    size: int
+    concurrency: int
+    operations: int
+    errors: int
+    seconds: float
+    bytes: int
+    mb_per_s: float
+    ops_per_s: float
+    p50_ms: float
+    p99_ms: float
+    max_ms: float
+    peak_rss_mib: float | None
+
+    @property
+    def key(self) -> tuple[str, str, int, int]:
+        return self.target, self.scenario, self.size, self.concurrency
+
+    def describe(self) -> str:
+        return (
+            f"{self.target:>11} {self.scenario:>17} {format_size(self.size):>7} x{self.concurrency:<4} "
+            f"{self.mb_per_s:9.1f} MB/s {self.ops_per_s:9.1f} op/s  p50 {self.p50_ms:8.2f} ms  p99 {self.p99_ms:8.2f} ms"
+            + (f"  errors {self.errors}" if self.errors else "")
+        )
+
+
+async def measure(
+    target: str,
+    scenario: str,
+    size: int,
+    concurrency: int,
+    operations: int,
+    operation: Callable[[int], Awaitable[int]],
+    rss_pid: int | None = None,
+) -> Result:
+    # `operation(i)` performs one request and returns the payload bytes it moved
+    latencies: list[float] = []
+    moved = 0
+    errors = 0
+    next_index = 0
+
+    async def worker() -> None:
+        nonlocal moved, errors, next_index
+        while next_index < operations:
+            index = next_index
+            next_index += 1
+            started = time.perf_counter()
+            try:
+                # Awaited before the add: `moved += await ...` would read `moved` first and lose concurrent updates
+                count = await operation(index)
+            except Exception:
+                errors += 1
+                continue
+            moved += count
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    seconds = time.perf_counter() - started
+
+    latencies.sort()
+    return Result(
+        target=target,
+        scenario=scenario,
+        size=size,
+        concurrency=concurrency,
+        operations=operations,
+        errors=errors,
+        seconds=round(seconds, 6),
+        bytes=moved,
+        # Decimal megabytes, as storage throughput is usually quoted
+        mb_per_s=round(moved / seconds / 1_000_000, 3),
+        ops_per_s=round(operations / seconds, 3),
+        p50_ms=round(percentile(latencies, 0.50) * 1000, 3),
+        p99_ms=round(percentile(latencies, 0.99) * 1000, 3),
+        max_ms=round((latencies[-1] if latencies else 0.0) * 1000, 3),
+        peak_rss_mib=peak_rss_mib(rss_pid),
+    )
+
+
+def _git_revision() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def add_report_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    parser.add_argument("--baseline", help="Compare against a previous JSON report")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed throughput drop / p99 increase before failing (fraction)")
+
+
+def report(results: list[Result], args: argparse.Namespace) -> int:
+    document = {
+        "meta": {
+            "revision": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "argv": sys.argv[1:],
+        },
+        "results": [asdict(result) for result in results],
+    }
+    text = json.dumps(document, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+        print(f"Wrote {len(results)} results to {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+    if not args.baseline:
+        return 0
+    with open(args.baseline) as f:
+        baseline = {Result(**entry).key: Result(**entry) for entry in json.load(f)["results"]}
+    return compare(results, baseline, args.tolerance)
+
+
+def compare(results: list[Result], baseline: dict[tuple[str, str, int, int], Result], tolerance: float) -> int:
+    regressions = 0
+    for result in results:
+        before = baseline.get(result.key)
+        # Compared on ops/s, which also covers scenarios that move no payload (deletes)
+        if before is None or not before.ops_per_s or not before.p99_ms:
+            continue
+        throughput = result.ops_per_s / before.ops_per_s - 1
+        tail = result.p99_ms / before.p99_ms - 1
+        regressed = throughput < -tolerance or tail > tolerance
+        regressions += regressed
+        print(
+            f"{'REGRESSION' if regressed else 'ok':>10} {result.target} {result.scenario} {format_size(result.size)} x{result.concurrency}: "
+            f"throughput {throughput:+.1%}, p99 {tail:+.1%}",
+            file=sys.stderr,
+        )
+    return 1 if regressions else 0
@@ -0,0 +1,97 @@
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+from collections.abc import AsyncIterator
+
+from app.config.settings import Settings
+from app.core.resources import AppResources
+from app.storage.base import StorageDriver
+from app.storage.enums import Compression, StorageDriverType
+from benchmarks.common import Result, add_report_arguments, measure, parse_list, parse_size, report
+
+SCENARIOS = ("save", "read", "hash", "delete")
+SEED_FILES = 32
+
+
+async def _stream(payload: bytes, chunk_size: int = 64 * 1024) -> AsyncIterator[bytes]:
+    view = memoryview(payload)
+    for offset in range(0, len(payload), chunk_size):
+        yield bytes(view[offset : offset + chunk_size])
+
+
+async def run_scenario(driver: StorageDriver, target: str, scenario: str, size: int, concurrency: int, operations: int) -> Result:
+    payload = os.urandom(size)
+    prefix = f"bench-{scenario}-{size}-{concurrency}"
+
+    async def save(i: int) -> int:
+        await driver.save(f"{prefix}-{i}", _stream(payload))
+        return size
+
+    async def read(i: int) -> int:
+        total = 0
+        async for chunk in driver.read(f"{prefix}-seed-{i % SEED_FILES}"):
+            total += len(chunk)
+        return total
+
+    async def hash_file(i: int) -> int:
+        # Distinct files so the digest cache doesn't turn this into a stat benchmark
+        await driver.hash(f"{prefix}-{i}", "sha256")
+        return size
+
+    async def delete(i: int) -> int:
+        await driver.delete(f"{prefix}-{i}")
+        return 0
+
+    operations_by_scenario = {"save": save, "read": read, "hash": hash_file, "delete": delete}
+    if scenario == "read":
+        await asyncio.gather(*(driver.save(f"{prefix}-seed-{i}", _stream(payload)) for i in range(SEED_FILES)))
+    elif scenario in ("hash", "delete"):
+        await asyncio.gather(*(driver.save(f"{prefix}-{i}", _stream(payload)) for i in range(operations)))
+    return await measure(target, scenario, size, concurrency, operations, operations_by_scenario[scenario])
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description="Throughput and latency of storage drivers, without HTTP in the way")
+    parser.add_argument("--drivers", default="local,cas,local+gzip", help="Comma-separated: local, cas, local+gzip, local+index, local+replicas")
+    parser.add_argument("--replicas", type=int, default=3, help="Directories for the +replicas targets (point TMPDIR at the disks to compare)")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--sizes", default="4KiB,256KiB,8MiB")
+    parser.add_argument("--concurrency", default="1,16,64")
+    parser.add_argument("--operations", type=int, default=200)
+    add_report_arguments(parser)
+    args = parser.parse_args()
+
+    results = []
+    for target in args.drivers.split(","):
+        driver_name, _, option = target.partition("+")
+        for scenario in args.scenarios.split(","):
+            for size in parse_list(args.sizes, parse_size):
+                for concurrency in parse_list(args.concurrency):
+                    with tempfile.TemporaryDirectory(prefix="keeper-bench-") as base_dir:
+                        replica_dirs = [os.path.join(base_dir, f"replica-{i}") for i in range(args.replicas)] if option == "replicas" else []
+                        for replica_dir in replica_dirs:
+                            os.makedirs(replica_dir)
+                        # Built the way the app builds it, so executors and caches match production
+                        settings = Settings(
+                            base_dir=base_dir,
+                            storage_driver=StorageDriverType(driver_name),
+                            compression=Compression.GZIP if option == "gzip" else Compression.NONE,
+                            metadata_index=option == "index",
+                            replica_dirs=replica_dirs,
+                            metrics_enabled=False,
+                        )
+                        resources = AppResources(settings)
+                        await resources.startup()
+                        try:
+                            result = await run_scenario(resources.driver, target, scenario, size, concurrency, args.operations)
+                        finally:
+                            await resources.shutdown()
+                    print(result.describe(), file=sys.stderr)
+                    results.append(result)
+    return report(results, args)
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
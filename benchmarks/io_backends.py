@@ -0,0 +1,49 @@
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.storage.io_backends import AiofilesBackend, IOBackend, PreadBackend
+from app.storage.local import LocalFileDriver
+
+
+async def _download(driver: LocalFileDriver, path: str) -> int:
+    total = 0
+    async for chunk in driver.read(path):
+        total += len(chunk)
+    return total
+
+
+async def run_backend(name: str, backend: IOBackend, base_dir: str, args: argparse.Namespace) -> None:
+    driver = LocalFileDriver(base_dir, default_chunk_size=args.chunk_size, max_chunk_size=args.chunk_size, io_backend=backend)
+    started = time.perf_counter()
+    totals = await asyncio.gather(*(_download(driver, f"object-{i % args.files}") for i in range(args.requests)))
+    elapsed = time.perf_counter() - started
+    mib = sum(totals) / (1024 * 1024)
+    print(f"{name:>10}: {args.requests} reads, {mib:.0f} MiB in {elapsed:.2f}s ({mib / elapsed:.0f} MiB/s)")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare local driver read throughput across I/O backends")
+    parser.add_argument("--files", type=int, default=8)
+    parser.add_argument("--size", type=int, default=32 * 1024 * 1024)
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--chunk-size", type=int, default=64 * 1024)
+    parser.add_argument("--workers", type=int, default=16)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as base_dir:
+        for i in range(args.files):
+            with open(os.path.join(base_dir, f"object-{i}"), "wb") as f:
+                f.write(os.urandom(args.size))
+
+        with ThreadPoolExecutor(max_workers=args.workers) as executor:
+            await run_backend("aiofiles", AiofilesBackend(executor), base_dir, args)
+            for batch_chunks in (1, 4, 16):
+                await run_backend(f"pread x{batch_chunks}", PreadBackend(executor, batch_chunks=batch_chunks), base_dir, args)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,39 @@
+import io
+import tarfile
+
+import pytest
+from fastapi import status
+from httpx import ASGITransport, AsyncClient
+
+
+@pytest.mark.asyncio
+async def test_export_and_import_round_trip(app, tmp_path):
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        for name in ("logs-1", "logs-2", "other"):
+            await ac.post("/files", headers={"X-File-Id": name}, content=name.encode() * 10)
+        exported = await ac.post("/files/export", json={"prefix": "logs-", "hashes": ["sha256"], "compression": "gzip"})
+        selected = await ac.post("/files/export", json={"file_ids": ["other"]})
+        for name in ("logs-1", "logs-2"):
+            await ac.delete(f"/files/{name}")
+        imported = await ac.post("/files/import?compression=gzip&verify=true", content=exported.content)
+        restored = await ac.get("/files/logs-2")
+
+    assert exported.status_code == status.HTTP_200_OK
+    assert exported.headers["content-type"] == "application/gzip"
+    assert exported.headers["content-disposition"] == 'attachment; filename="export.tar.gz"'
+    with tarfile.open(fileobj=io.BytesIO(selected.content)) as tar:
+        assert tar.getnames() == ["other"]
+    assert imported.json() == {"imported": 2, "bytes": 120, "skipped": 0, "failed": 0, "errors": []}
+    assert restored.content == b"logs-2" * 10
+
+
+@pytest.mark.asyncio
+async def test_archive_errors(app):
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        bad_hash = await ac.post("/files/export", json={"file_ids": ["a"], "hashes": ["nope"]})
+        bad_prefix = await ac.post("/files/export", json={"prefix": "../"})
+        truncated = await ac.post("/files/import", content=b"\0" * 100)
+
+    assert bad_hash.status_code == status.HTTP_400_BAD_REQUEST
+    assert bad_prefix.status_code == status.HTTP_400_BAD_REQUEST
+    assert truncated.status_code == status.HTTP_400_BAD_REQUEST
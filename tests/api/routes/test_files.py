@@ -1,12 +1,21 @@
 import asyncio
+import contextlib
+import json
+import os
 from hashlib import sha256
 from pathlib import Path
+from unittest import mock
 
 import pytest
 from fastapi import status
 from httpx import ASGITransport, AsyncClient
 
 from app.config.settings import Settings
+from app.core.app_factory import create_app
+from app.storage.enums import Compression, StorageDriverType
+from app.storage.factory import driver_stack
+from app.storage.local import LocalFileDriver
+from app.storage.tiered import TieredDriver
 
 
 @pytest.mark.asyncio
@@ -59,13 +68,43 @@ async def test_upload_file_background(app, override_settings: Settings):
         content = b"Background upload content"
         response = await ac.post("/files", headers=headers, content=content, params={"background": True})
 
-        assert response.status_code == status.HTTP_204_NO_CONTENT
-        # Give some time for background task to complete
-        await asyncio.sleep(0.1)
+        assert response.status_code == status.HTTP_202_ACCEPTED
+        job_url = response.headers["location"]
+        assert job_url == f"/jobs/{response.json()['job_id']}"
+
+        for _ in range(50):
+            job = (await ac.get(job_url)).json()
+            if job["status"] not in ("queued", "running"):
+                break
+            await asyncio.sleep(0.01)
+
+        assert job["status"] == "done"
         saved_path = Path(override_settings.base_dir) / "background_file.txt"
         assert saved_path.read_bytes() == content
 
 
+@pytest.mark.asyncio
+async def test_upload_file_background_queue_full(app, override_settings: Settings):
+    app.state.resources.ingest_queue.max_pending = 0
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        headers = {"X-File-Id": "rejected.txt"}
+        response = await ac.post("/files", headers=headers, content=b"data", params={"background": True})
+
+        assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+        assert response.headers["retry-after"] == "1"
+        assert not (Path(override_settings.base_dir) / "rejected.txt").exists()
+
+
+@pytest.mark.asyncio
+async def test_get_unknown_job(app):
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        response = await ac.get("/jobs/unknown")
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
 @pytest.mark.asyncio
 async def test_upload_file_missing_file_id(app):
     transport = ASGITransport(app=app)
@@ -147,3 +186,337 @@ async def test_delete_nonexistent_file(app):
 
         assert response.status_code == status.HTTP_404_NOT_FOUND
         assert "does not exist" in response.json()["detail"].lower()
+
+
+@pytest.mark.asyncio
+async def test_get_file_streams_when_driver_has_no_local_path(app):
+    file_id = "streamed.txt"
+    content = b"Served through the generic streaming path"
+    transport = ASGITransport(app=app)
+
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        await ac.post("/files", headers={"X-File-Id": file_id}, content=content)
+
+        with mock.patch.object(LocalFileDriver, "local_path", return_value=None):
+            response = await ac.get(f"/files/{file_id}")
+
+        assert response.status_code == 200
+        assert response.content == content
+        assert response.headers["content-disposition"] == f'attachment; filename="{file_id}"'
+
+
+@pytest.mark.asyncio
+async def test_get_file_deleted_before_it_is_opened(app, override_settings: Settings):
+    file_id = "vanishing.txt"
+    transport = ASGITransport(app=app)
+
+    async def deleted_local_path(path):
+        # Deleted between the route's stat and the response opening the file
+        full_path = os.path.join(override_settings.base_dir, path)
+        os.remove(full_path)
+        return full_path
+
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        await ac.post("/files", headers={"X-File-Id": file_id}, content=b"soon gone")
+
+        with mock.patch.object(LocalFileDriver, "local_path", side_effect=deleted_local_path):
+            response = await ac.get(f"/files/{file_id}")
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("local_path", [True, False])
+async def test_get_file_range(app, local_path):
+    file_id = "ranged.txt"
+    content = b"0123456789abcdef"
+    transport = ASGITransport(app=app)
+
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        await ac.post("/files", headers={"X-File-Id": file_id}, content=content)
+
+        with mock.patch.object(LocalFileDriver, "local_path", return_value=None) if not local_path else contextlib.nullcontext():
+            single = await ac.get(f"/files/{file_id}", headers={"Range": "bytes=4-7"})
+            multi = await ac.get(f"/files/{file_id}", headers={"Range": "bytes=0-1,-2"})
+            unsatisfiable = await ac.get(f"/files/{file_id}", headers={"Range": "bytes=100-"})
+
+        assert single.status_code == status.HTTP_206_PARTIAL_CONTENT
+        assert single.content == b"4567"
+        assert single.headers["content-range"] == "bytes 4-7/16"
+
+        assert multi.status_code == status.HTTP_206_PARTIAL_CONTENT
+        assert multi.headers["content-type"].startswith("multipart/byteranges; boundary=")
+        assert int(multi.headers["content-length"]) == len(multi.content)
+        assert b"Content-Range: bytes 0-1/16\r\n\r\n01\r\n" in multi.content
+        assert b"Content-Range: bytes 14-15/16\r\n\r\nef\r\n" in multi.content
+
+        assert unsatisfiable.status_code == status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE
+        assert unsatisfiable.headers["content-range"] == "bytes */16"
+
+
+@pytest.mark.asyncio
+async def test_get_file_conditional(app):
+    file_id = "conditional.txt"
+    transport = ASGITransport(app=app)
+
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        await ac.post("/files", headers={"X-File-Id": file_id}, content=b"cache me")
+
+        first = await ac.get(f"/files/{file_id}")
+        etag = first.headers["etag"]
+        not_modified = await ac.get(f"/files/{file_id}", headers={"If-None-Match": etag})
+        stale_range = await ac.get(f"/files/{file_id}", headers={"Range": "bytes=0-1", "If-Range": '"stale"'})
+
+        assert first.headers["last-modified"]
+        assert not_modified.status_code == status.HTTP_304_NOT_MODIFIED
+        assert not_modified.content == b""
+        assert not_modified.headers["etag"] == etag
+        assert stale_range.status_code == status.HTTP_200_OK
+        assert stale_range.content == b"cache me"
+
+
+@pytest.mark.asyncio
+async def test_cas_driver_round_trip(tmp_path):
+    settings = Settings(debug=True, base_dir=str(tmp_path), storage_driver=StorageDriverType.CAS)
+    app = create_app(settings)
+    content = b"deduplicated content"
+    headers = {"X-File-Hash": sha256(content).hexdigest(), "X-File-Hash-Algorithm": "sha256"}
+
+    async with app.router.lifespan_context(app), AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        first = await ac.post("/files", headers={**headers, "X-File-Id": "a.bin"}, content=content)
+        second = await ac.post("/files", headers={**headers, "X-File-Id": "b.bin"}, content=content)
+        response = await ac.get("/files/b.bin")
+
+    assert first.status_code == second.status_code == status.HTTP_204_NO_CONTENT
+    assert response.content == content
+    assert os.path.samefile(tmp_path / "refs" / "a.bin", tmp_path / "refs" / "b.bin")
+
+
+@pytest.mark.asyncio
+async def test_metadata_index_rebuilt_on_startup(tmp_path):
+    (tmp_path / "preexisting.txt").write_bytes(b"stored before the index existed")
+    settings = Settings(debug=True, base_dir=str(tmp_path), metadata_index=True)
+    app = create_app(settings)
+
+    async with app.router.lifespan_context(app), AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        existing = await ac.get("/files/preexisting.txt")
+        await ac.post("/files", headers={"X-File-Id": "new.txt"}, content=b"fresh")
+        new = await ac.get("/files/new.txt")
+
+    assert existing.content == b"stored before the index existed"
+    assert new.headers["etag"] == f'"{sha256(b"fresh").hexdigest()}"'
+
+
+@pytest.mark.asyncio
+async def test_resources_are_shared_across_requests(app):
+    resources = app.state.resources
+    with mock.patch.object(resources.driver, "save", wraps=resources.driver.save) as save:
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+            await ac.post("/files", headers={"X-File-Id": "one.txt"}, content=b"one")
+            await ac.post("/files", headers={"X-File-Id": "two.txt"}, content=b"two")
+
+    assert save.call_count == 2
+    assert resources.file_service.driver is resources.driver
+    assert resources.ingest_queue.driver is resources.driver
+
+
+@pytest.mark.asyncio
+async def test_lifespan_shuts_down_pools(tmp_path):
+    app = create_app(Settings(debug=True, base_dir=str(tmp_path)))
+    async with app.router.lifespan_context(app):
+        resources = app.state.resources
+
+    with pytest.raises(RuntimeError):
+        resources.fs_executor.submit(os.getpid)
+
+
+@pytest.mark.asyncio
+async def test_batch_streams_ndjson(app):
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        await ac.post("/files", headers={"X-File-Id": "one.txt"}, content=b"1")
+        response = await ac.post("/files/batch", json={"operation": "exists", "file_ids": ["one.txt", "two.txt"]})
+        invalid = await ac.post("/files/batch", json={"operation": "rename", "file_ids": ["one.txt"]})
+
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert sorted(lines, key=lambda item: item["file_id"]) == [{"file_id": "one.txt", "result": True}, {"file_id": "two.txt", "result": False}]
+    assert invalid.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+@pytest.mark.asyncio
+async def test_list_files_with_cursor(app):
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        for name in ["a.txt", "b.txt", "c.txt"]:
+            await ac.post("/files", headers={"X-File-Id": name}, content=b"x")
+        first = [json.loads(line) for line in (await ac.get("/files", params={"limit": 2})).text.splitlines()]
+        second = [json.loads(line) for line in (await ac.get("/files", params={"limit": 2, "cursor": first[-1]["next_cursor"]})).text.splitlines()]
+        escaped = await ac.get("/files", params={"prefix": "../"})
+        bad_cursor = await ac.get("/files", params={"cursor": "!!!"})
+
+    assert [item["file_id"] for item in first[:-1]] == ["a.txt", "b.txt"]
+    assert second == [{"file_id": "c.txt", "size": 1, "mtime_ns": second[0]["mtime_ns"]}]
+    assert escaped.status_code == status.HTTP_400_BAD_REQUEST
+    assert bad_cursor.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.asyncio
+async def test_compressed_store_negotiates_encoding(tmp_path):
+    settings = Settings(debug=True, base_dir=str(tmp_path), compression=Compression.GZIP, metadata_index=True)
+    app = create_app(settings)
+    content = b"compress me please " * 1000
+
+    async with app.router.lifespan_context(app), AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        await ac.post("/files", headers={"X-File-Id": "text.txt"}, content=content)
+        encoded = await ac.get("/files/text.txt", headers={"Accept-Encoding": "gzip"})
+        identity = await ac.get("/files/text.txt", headers={"Accept-Encoding": "identity"})
+        ranged = await ac.get("/files/text.txt", headers={"Accept-Encoding": "gzip", "Range": "bytes=0-7"})
+
+    assert encoded.headers["content-encoding"] == "gzip"
+    assert encoded.content == content
+    assert int(encoded.headers["content-length"]) < len(content)
+    assert encoded.headers["etag"] != identity.headers["etag"]
+    assert "content-encoding" not in identity.headers
+    assert identity.content == content
+    assert identity.headers["etag"] == f'"{sha256(content).hexdigest()}"'
+    assert ranged.content == b"compress"
+
+
+@pytest.mark.asyncio
+async def test_read_cache_serves_hot_objects(tmp_path):
+    settings = Settings(debug=True, base_dir=str(tmp_path), read_cache_bytes=1024 * 1024, metadata_index=True)
+    app = create_app(settings)
+    content = b"hot object"
+
+    async with app.router.lifespan_context(app), AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        await ac.post("/files", headers={"X-File-Id": "hot.txt"}, content=content)
+        responses = [await ac.get("/files/hot.txt") for _ in range(3)]
+        ranged = await ac.get("/files/hot.txt", headers={"Range": "bytes=4-9"})
+        await ac.post("/files", headers={"X-File-Id": "hot.txt"}, content=b"replaced")
+        replaced = await ac.get("/files/hot.txt")
+        stats = app.state.resources.object_cache.stats()
+
+    assert [response.content for response in responses] == [content] * 3
+    assert responses[2].headers["etag"] == f'"{sha256(content).hexdigest()}"'
+    assert ranged.status_code == status.HTTP_206_PARTIAL_CONTENT
+    assert ranged.content == b"object"
+    assert replaced.content == b"replaced"
+    assert stats["hits"] == 2
+
+
+@pytest.mark.asyncio
+async def test_admission_holds_permit_until_response_is_sent(tmp_path):
+    settings = Settings(
+        debug=True,
+        base_dir=str(tmp_path),
+        admission_enabled=True,
+        admission_small_object_size=0,
+        admission_large_streams=1,
+        admission_max_wait=0.05,
+        admission_retry_after=3,
+    )
+    app = create_app(settings)
+    release_body = asyncio.Event()
+
+    async def slow_body():
+        yield b"first"
+        await release_body.wait()
+        yield b"second"
+
+    async with app.router.lifespan_context(app), AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        await ac.post("/files", headers={"X-File-Id": "a.txt"}, content=b"data")
+        upload = asyncio.create_task(ac.post("/files", headers={"X-File-Id": "b.txt", "X-Tenant-Id": "bulk"}, content=slow_body()))
+        await asyncio.sleep(0.01)
+        rejected = await ac.get("/files/a.txt", headers={"X-Tenant-Id": "interactive"})
+        release_body.set()
+        assert (await upload).status_code == status.HTTP_204_NO_CONTENT
+        admitted = await ac.get("/files/a.txt")
+        metrics = await ac.get("/metrics")
+
+    assert rejected.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+    assert rejected.headers["retry-after"] == "3"
+    assert admitted.content == b"data"
+    assert 'keeper_admission_rejected_total{lane="large",reason="timeout"} 1' in metrics.text
+    assert 'keeper_admission_active{lane="large"} 0' in metrics.text
+
+
+@pytest.mark.asyncio
+async def test_replicated_store_serves_after_losing_a_directory(tmp_path):
+    replica_dirs = [tmp_path / name for name in ("disk0", "disk1")]
+    for replica_dir in replica_dirs:
+        replica_dir.mkdir()
+    settings = Settings(debug=True, base_dir=str(tmp_path), replica_dirs=[str(replica_dir) for replica_dir in replica_dirs])
+    app = create_app(settings)
+
+    async with app.router.lifespan_context(app), AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        await ac.post("/files", headers={"X-File-Id": "a.txt"}, content=b"mirrored")
+        os.remove(replica_dirs[0] / "a.txt")
+        responses = [await ac.get("/files/a.txt") for _ in range(2)]
+
+    assert [response.content for response in responses] == [b"mirrored"] * 2
+    assert (replica_dirs[1] / "a.txt").read_bytes() == b"mirrored"
+
+
+@pytest.mark.asyncio
+async def test_replicated_store_starts_with_a_missing_directory(tmp_path):
+    (tmp_path / "disk0").mkdir()
+    settings = Settings(debug=True, base_dir=str(tmp_path), replica_dirs=[str(tmp_path / "disk0"), str(tmp_path / "gone")])
+    app = create_app(settings)
+
+    async with app.router.lifespan_context(app), AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        saved = await ac.post("/files", headers={"X-File-Id": "a.txt"}, content=b"one copy")
+        response = await ac.get("/files/a.txt")
+
+    assert saved.status_code == status.HTTP_204_NO_CONTENT
+    assert response.content == b"one copy"
+
+
+@pytest.mark.asyncio
+async def test_head_and_not_modified_do_not_count_as_tier_reads(tmp_path):
+    (tmp_path / "capacity").mkdir()
+    settings = Settings(debug=True, base_dir=str(tmp_path), tier_capacity_dir=str(tmp_path / "capacity"))
+    app = create_app(settings)
+
+    async with app.router.lifespan_context(app), AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        tiered = next(layer for layer in driver_stack(app.state.resources.driver) if isinstance(layer, TieredDriver))
+        await ac.post("/files", headers={"X-File-Id": "a.txt"}, content=b"tiered")
+        head = await ac.head("/files/a.txt")
+        ranged_head = await ac.head("/files/a.txt", headers={"Range": "bytes=0-1,-2"})
+        not_modified = await ac.get("/files/a.txt", headers={"If-None-Match": head.headers["etag"]})
+        counted = tiered.hits + tiered.misses
+        body = await ac.get("/files/a.txt")
+
+    assert head.status_code == status.HTTP_200_OK
+    assert head.headers["content-length"] == "6"
+    assert head.content == b""
+    assert ranged_head.status_code == status.HTTP_206_PARTIAL_CONTENT
+    assert not_modified.status_code == status.HTTP_304_NOT_MODIFIED
+    assert counted == 0
+    assert body.content == b"tiered"
+    assert tiered.hits + tiered.misses == 1
+
+
+@pytest.mark.asyncio
+async def test_get_file_evicted_from_the_fast_tier_before_it_is_opened(tmp_path):
+    (tmp_path / "capacity").mkdir()
+    settings = Settings(debug=True, base_dir=str(tmp_path), tier_capacity_dir=str(tmp_path / "capacity"))
+    app = create_app(settings)
+
+    async with app.router.lifespan_context(app), AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        tiered = next(layer for layer in driver_stack(app.state.resources.driver) if isinstance(layer, TieredDriver))
+        await ac.post("/files", headers={"X-File-Id": "a.txt"}, content=b"evicted")
+        local_path = tiered.local_path
+
+        async def evicted_after_lookup(path):
+            # The fast copy goes between the lookup and the response opening it
+            full_path = await local_path(path)
+            if tiered.max_bytes:
+                tiered.max_bytes = 0
+                await tiered._enforce_budget()
+            return full_path
+
+        with mock.patch.object(tiered, "local_path", side_effect=evicted_after_lookup):
+            response = await ac.get("/files/a.txt")
+
+    assert tiered.evictions == 1
+    assert response.status_code == status.HTTP_200_OK
+    assert response.content == b"evicted"
@@ -0,0 +1,37 @@
+import pytest
+from fastapi import status
+from httpx import ASGITransport, AsyncClient
+
+from app.config.settings import Settings
+from app.core.app_factory import create_app
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint_reports_requests_and_storage(app):
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        await ac.post("/files", headers={"X-File-Id": "a.txt"}, content=b"hello")
+        await ac.get("/files/a.txt")
+        await ac.get("/files/missing.txt")
+        response = await ac.get("/metrics")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = response.text
+    assert 'keeper_http_requests_total{method="POST",route="/files",status="204"} 1' in body
+    assert 'keeper_http_requests_total{method="GET",route="/files/{file_id}",status="404"} 1' in body
+    assert 'keeper_http_received_bytes_total{route="/files"} 5' in body
+    assert 'keeper_http_sent_bytes_total{route="/files/{file_id}"}' in body
+    assert 'keeper_storage_operation_duration_seconds_count{operation="save"} 1' in body
+    assert 'keeper_storage_bytes_total{direction="write"} 5' in body
+    assert "keeper_http_requests_in_flight 1" in body
+    assert "keeper_ingest_pending_jobs 0" in body
+
+
+@pytest.mark.asyncio
+async def test_metrics_can_be_disabled(tmp_path):
+    app = create_app(Settings(debug=True, base_dir=str(tmp_path), metrics_enabled=False))
+
+    async with app.router.lifespan_context(app), AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        response = await ac.get("/metrics")
+
+    assert response.status_code == status.HTTP_404_NOT_FOUND
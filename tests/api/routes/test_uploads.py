@@ -0,0 +1,47 @@
+import hashlib
+from pathlib import Path
+
+import pytest
+from fastapi import status
+from httpx import ASGITransport, AsyncClient
+
+from app.config.settings import Settings
+
+
+@pytest.mark.asyncio
+async def test_multipart_upload_flow(app, override_settings: Settings):
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        created = await ac.post("/uploads", headers={"X-File-Id": "multi.bin"})
+        upload_id = created.json()["upload_id"]
+        part1 = await ac.put(f"/uploads/{upload_id}/parts/1", content=b"first-")
+        part2 = await ac.put(f"/uploads/{upload_id}/parts/2", content=b"second", headers={"X-Part-Hash": hashlib.sha256(b"second").hexdigest()})
+        listed = await ac.get(f"/uploads/{upload_id}")
+        completed = await ac.post(f"/uploads/{upload_id}/complete")
+        gone = await ac.get(f"/uploads/{upload_id}")
+
+    assert created.status_code == status.HTTP_201_CREATED
+    assert created.headers["location"] == f"/uploads/{upload_id}"
+    assert part1.json() == {"part_number": 1, "size": 6, "sha256": hashlib.sha256(b"first-").hexdigest()}
+    assert part2.status_code == status.HTTP_200_OK
+    assert [part["part_number"] for part in listed.json()["parts"]] == [1, 2]
+    assert completed.status_code == status.HTTP_200_OK
+    assert completed.json()["size"] == 12
+    assert gone.status_code == status.HTTP_404_NOT_FOUND
+    assert (Path(override_settings.base_dir) / "multi.bin").read_bytes() == b"first-second"
+
+
+@pytest.mark.asyncio
+async def test_multipart_upload_errors(app):
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        upload_id = (await ac.post("/uploads", headers={"X-File-Id": "err.bin"})).json()["upload_id"]
+        bad_part = await ac.put(f"/uploads/{upload_id}/parts/0", content=b"x")
+        bad_hash = await ac.put(f"/uploads/{upload_id}/parts/1", content=b"x", headers={"X-Part-Hash": "0" * 64})
+        empty = await ac.post(f"/uploads/{upload_id}/complete")
+        aborted = await ac.delete(f"/uploads/{upload_id}")
+        missing = await ac.put(f"/uploads/{upload_id}/parts/1", content=b"x")
+
+    assert bad_part.status_code == status.HTTP_400_BAD_REQUEST
+    assert bad_hash.status_code == status.HTTP_400_BAD_REQUEST
+    assert empty.status_code == status.HTTP_400_BAD_REQUEST
+    assert aborted.status_code == status.HTTP_204_NO_CONTENT
+    assert missing.status_code == status.HTTP_404_NOT_FOUND
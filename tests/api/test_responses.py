@@ -0,0 +1,80 @@
+import pytest
+from fastapi import HTTPException
+
+from app.api.responses import ZEROCOPY_EXTENSION, SendfileResponse
+
+
+async def _call(response, extensions):
+    messages = []
+
+    async def receive():
+        return {"type": "http.request"}
+
+    async def send(message):
+        if message["type"] == ZEROCOPY_EXTENSION:
+            message = {**message, "data": message["file"].read()}
+        messages.append(message)
+
+    scope = {"type": "http", "method": "GET", "headers": [], "extensions": extensions}
+    await response(scope, receive, send)
+    return messages
+
+
+@pytest.mark.asyncio
+async def test_sendfile_response_uses_zerocopy_when_supported(tmp_path):
+    path = tmp_path / "blob"
+    path.write_bytes(b"zero copy body")
+
+    messages = await _call(SendfileResponse(str(path), count=14), {ZEROCOPY_EXTENSION: {}})
+
+    assert messages[0]["type"] == "http.response.start"
+    assert messages[1]["type"] == ZEROCOPY_EXTENSION
+    assert (messages[1]["offset"], messages[1]["count"]) == (0, 14)
+    assert messages[1]["data"] == b"zero copy body"
+
+
+@pytest.mark.asyncio
+async def test_sendfile_response_falls_back_to_chunks(tmp_path):
+    path = tmp_path / "blob"
+    path.write_bytes(b"chunked body")
+
+    messages = await _call(SendfileResponse(str(path), count=12), {})
+
+    assert [m["type"] for m in messages] == ["http.response.start", "http.response.body"]
+    assert (b"content-length", b"12") in messages[0]["headers"]
+    assert messages[1]["body"] == b"chunked body"
+
+
+@pytest.mark.asyncio
+async def test_sendfile_response_sends_slice(tmp_path, monkeypatch):
+    path = tmp_path / "blob"
+    path.write_bytes(b"0123456789")
+    monkeypatch.setattr(SendfileResponse, "chunk_size", 2)
+
+    messages = await _call(SendfileResponse(str(path), count=5, offset=3, status_code=206), {})
+
+    assert messages[0]["status"] == 206
+    assert b"".join(m["body"] for m in messages[1:]) == b"34567"
+    assert messages[-1]["more_body"] is False
+
+
+@pytest.mark.asyncio
+async def test_sendfile_response_checks_the_file_before_sending_headers(tmp_path):
+    path = tmp_path / "blob"
+    path.write_bytes(b"replaced")
+
+    with pytest.raises(HTTPException) as changed:
+        await _call(SendfileResponse(str(path), count=4, size=4), {})
+    assert changed.value.status_code == 503
+    with pytest.raises(HTTPException) as gone:
+        await _call(SendfileResponse(str(tmp_path / "gone"), count=4, size=4), {})
+    assert gone.value.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_sendfile_response_fails_on_a_short_read(tmp_path):
+    path = tmp_path / "blob"
+    path.write_bytes(b"short")
+
+    with pytest.raises(RuntimeError, match="truncated"):
+        await _call(SendfileResponse(str(path), count=10), {})
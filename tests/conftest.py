@@ -38,8 +38,9 @@ def override_settings(tmp_path: Path) -> Settings:
 
 
 @pytest.fixture
-def app(override_settings: Settings) -> FastAPI:
+async def app(override_settings: Settings) -> AsyncIterator[FastAPI]:
     app = create_app(override_settings)
     app.dependency_overrides[get_settings] = lambda: override_settings
-    yield app
+    async with app.router.lifespan_context(app):
+        yield app
     app.dependency_overrides.clear()
@@ -0,0 +1,79 @@
+import asyncio
+import time
+
+import pytest
+
+from app.core.metrics import LoopLagMonitor, Metrics, Registry
+
+
+def test_counter_and_gauge_render():
+    registry = Registry()
+    requests = registry.counter("requests_total", "Requests", ("route",))
+    in_flight = registry.gauge("in_flight", "In flight")
+
+    requests.inc("/files")
+    requests.inc("/files", amount=2)
+    requests.inc('/odd"route')
+    in_flight.inc()
+    in_flight.dec()
+
+    assert registry.render().splitlines() == [
+        "# HELP requests_total Requests",
+        "# TYPE requests_total counter",
+        'requests_total{route="/files"} 3',
+        'requests_total{route="/odd\\"route"} 1',
+        "# HELP in_flight In flight",
+        "# TYPE in_flight gauge",
+        "in_flight 0",
+    ]
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    latency = registry.histogram("latency_seconds", "Latency", ("op",), buckets=(0.1, 1.0))
+
+    for value in (0.05, 0.1, 0.5, 2.0):
+        latency.observe(value, "read")
+
+    assert registry.render().splitlines()[2:] == [
+        'latency_seconds_bucket{op="read",le="0.1"} 2',
+        'latency_seconds_bucket{op="read",le="1"} 3',
+        'latency_seconds_bucket{op="read",le="+Inf"} 4',
+        'latency_seconds_sum{op="read"} 2.65',
+        'latency_seconds_count{op="read"} 4',
+    ]
+
+
+def test_label_count_is_checked():
+    registry = Registry()
+    counter = registry.counter("c_total", "C", ("a", "b"))
+
+    with pytest.raises(ValueError):
+        counter.inc("only-one")
+    with pytest.raises(ValueError):
+        registry.counter("c_total", "Duplicate")
+
+
+def test_collectors_run_before_render():
+    registry = Registry()
+    gauge = registry.gauge("depth", "Depth")
+    registry.add_collector(lambda: gauge.set(value=7))
+
+    assert "depth 7" in registry.render()
+
+
+@pytest.mark.asyncio
+async def test_loop_lag_monitor_records_blocking():
+    metrics = Metrics()
+    monitor = LoopLagMonitor(metrics, interval=0.01)
+    monitor.start()
+    await asyncio.sleep(0.02)
+    time.sleep(0.05)
+    await asyncio.sleep(0.02)
+    await monitor.stop()
+
+    assert metrics.loop_lag.count() >= 1
+    metrics.render()
+    assert metrics.loop_lag_max.value() >= 0.03
+    metrics.render()
+    assert metrics.loop_lag_max.value() == 0
@@ -0,0 +1,100 @@
+import asyncio
+from unittest import mock
+
+import pytest
+
+from app.services.admission import AdmissionController, AdmissionRejectedError, FairLane, TokenBucket
+
+
+@pytest.mark.asyncio
+async def test_lane_wakes_tenants_round_robin():
+    lane = FairLane("large", limit=1, max_queued=10)
+    await lane.acquire("holder", timeout=1, retry_after=1)
+    order = []
+
+    async def request(tenant: str) -> None:
+        await lane.acquire(tenant, timeout=1, retry_after=1)
+        order.append(tenant)
+        lane.release()
+
+    tasks = [asyncio.create_task(request(tenant)) for tenant in ("a", "a", "a", "b", "c")]
+    await asyncio.sleep(0)
+    lane.release()
+    await asyncio.gather(*tasks)
+
+    assert order == ["a", "b", "c", "a", "a"]
+    assert lane.active == lane.queued == 0
+
+
+@pytest.mark.asyncio
+async def test_lane_rejects_when_queue_is_full_or_wait_too_long():
+    lane = FairLane("small", limit=1, max_queued=1)
+    await lane.acquire("a", timeout=1, retry_after=1)
+    waiter = asyncio.create_task(lane.acquire("b", timeout=0.05, retry_after=2))
+    await asyncio.sleep(0)
+
+    with pytest.raises(AdmissionRejectedError) as full:
+        await lane.acquire("c", timeout=1, retry_after=2)
+    with pytest.raises(AdmissionRejectedError) as timed_out:
+        await waiter
+
+    assert (full.value.reason, full.value.retry_after_header) == ("queue_full", "2")
+    assert timed_out.value.reason == "timeout"
+    assert lane.queued == 0
+    lane.release()
+    assert lane.active == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_does_not_leak_a_slot():
+    lane = FairLane("large", limit=1, max_queued=10)
+    await lane.acquire("a", timeout=1, retry_after=1)
+    waiter = asyncio.create_task(lane.acquire("b", timeout=1, retry_after=1))
+    await asyncio.sleep(0)
+    lane.release()
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+
+    assert lane.active == lane.queued == 0
+
+
+def test_token_bucket_allows_debt_and_delays_the_next_request():
+    with mock.patch("app.services.admission.time.monotonic", return_value=100.0):
+        bucket = TokenBucket(rate=100, burst=100)
+        assert bucket.reserve(250, max_delay=1) == 0
+        assert bucket.reserve(50, max_delay=1) is None
+        assert bucket.retry_after(50) == 2.0
+        assert bucket.reserve(50, max_delay=5) == 2.0
+
+
+@pytest.mark.asyncio
+async def test_controller_routes_by_size_and_limits_hash_jobs():
+    controller = AdmissionController(small_streams=4, large_streams=1, small_object_size=1024, hash_jobs=1, max_wait=0.01)
+
+    small = await controller.admit("t", 100)
+    large = await controller.admit("t", None, hashing=True)
+    assert controller.stats()["small"]["active"] == 1
+    assert controller.stats()["large"]["active"] == 1
+
+    with pytest.raises(AdmissionRejectedError) as e:
+        await controller.admit("t", 100, hashing=True)
+    assert e.value.lane == "hash"
+    assert controller.stats()["small"]["active"] == 1
+
+    controller.release(small)
+    controller.release(large)
+    assert all(lane["active"] == 0 for lane in controller.stats().values())
+
+
+@pytest.mark.asyncio
+async def test_controller_rate_limits_per_tenant():
+    controller = AdmissionController(tenant_bytes_per_second=1000, tenant_burst_bytes=1000, max_wait=0)
+
+    controller.release(await controller.admit("a", 1000))
+    with pytest.raises(AdmissionRejectedError) as e:
+        await controller.admit("a", 1000)
+    controller.release(await controller.admit("b", 1000))
+
+    assert e.value.reason == "rate"
+    assert e.value.retry_after == pytest.approx(1.0, abs=0.05)
@@ -0,0 +1,189 @@
+import asyncio
+import gzip
+import hashlib
+import io
+import tarfile
+
+import pytest
+
+from app.services.archives import export_archive, import_archive
+from app.storage.codecs import GzipCodec
+from app.storage.local import LocalFileDriver
+from app.utils.helpers import _to_stream
+
+
+async def _collect(stream) -> bytes:
+    return b"".join([chunk async for chunk in stream])
+
+
+async def _chunked(data: bytes, size: int = 100):
+    for start in range(0, len(data), size):
+        yield data[start : start + size]
+
+
+async def _read(driver, path) -> bytes:
+    return b"".join([chunk async for chunk in driver.read(path)])
+
+
+@pytest.fixture
+def target(tmp_path) -> LocalFileDriver:
+    (tmp_path / "target").mkdir()
+    return LocalFileDriver(str(tmp_path / "target"))
+
+
+@pytest.mark.asyncio
+async def test_export_is_a_standard_tar(local_file_driver):
+    contents = {"a.txt": b"alpha", "b.bin": bytes(range(256)) * 5, "empty": b""}
+    for name, data in contents.items():
+        await local_file_driver.save(name, _to_stream(data))
+
+    archive = await _collect(export_archive(local_file_driver, algorithms=["sha256"]))
+
+    with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+        members = tar.getmembers()
+        assert [member.name for member in members] == sorted(contents)
+        for member in members:
+            assert tar.extractfile(member).read() == contents[member.name]
+            assert member.pax_headers["KEEPER.hash.sha256"] == hashlib.sha256(contents[member.name]).hexdigest()
+
+
+@pytest.mark.asyncio
+async def test_export_skips_missing_ids_and_keeps_order(local_file_driver):
+    for name in ("b", "a"):
+        await local_file_driver.save(name, _to_stream(name.encode()))
+
+    archive = await _collect(export_archive(local_file_driver, file_ids=["b", "missing", "a"], page_size=2))
+
+    with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+        assert tar.getnames() == ["b", "a"]
+
+
+@pytest.mark.asyncio
+async def test_round_trip_with_compression_and_verification(local_file_driver, target):
+    contents = {f"file-{i}": bytes([i]) * (i * 300) for i in range(1, 12)}
+    for name, data in contents.items():
+        await local_file_driver.save(name, _to_stream(data))
+
+    archive = await _collect(export_archive(local_file_driver, prefix="file-", algorithms=["sha256"], codec=GzipCodec()))
+    assert gzip.decompress(archive).endswith(bytes(1024))
+    # A small buffer limit sends the larger entries down the streaming path
+    result = await import_archive(target, _chunked(archive), codec=GzipCodec(), verify=True, buffer_limit=1000)
+
+    assert result.imported == len(contents)
+    assert result.bytes == sum(map(len, contents.values()))
+    assert not result.errors
+    for name, data in contents.items():
+        assert await _read(target, name) == data
+
+
+def _tar(entries) -> bytes:
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w", format=tarfile.GNU_FORMAT) as tar:
+        for info, data in entries:
+            tar.addfile(info, io.BytesIO(data) if data is not None else None)
+    return buffer.getvalue()
+
+
+def _info(name: str, data: bytes = b"", **attributes) -> tarfile.TarInfo:
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    for key, value in attributes.items():
+        setattr(info, key, value)
+    return info
+
+
+@pytest.mark.asyncio
+async def test_import_handles_foreign_archives(target):
+    long_name = "x" * 150
+    archive = _tar(
+        [
+            (_info("./dir", type=tarfile.DIRTYPE), None),
+            (_info("./plain.txt", b"plain"), b"plain"),
+            (_info(long_name, b"long"), b"long"),
+            (_info("link", type=tarfile.SYMTYPE, linkname="plain.txt"), None),
+        ]
+    )
+
+    result = await import_archive(target, _chunked(archive, 7))
+
+    assert result.imported == 2
+    assert result.skipped == 1
+    assert await _read(target, "plain.txt") == b"plain"
+    assert await _read(target, long_name) == b"long"
+
+
+@pytest.mark.asyncio
+async def test_import_reports_bad_entries_and_carries_on(target):
+    good, bad, large = _info("good", b"good"), _info("bad", b"bad"), _info("large", b"L" * 5000)
+    bad.pax_headers = {"KEEPER.hash.sha256": "0" * 64}
+    large.pax_headers = {"KEEPER.hash.sha256": "1" * 64}
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w", format=tarfile.PAX_FORMAT) as tar:
+        for info, data in ((bad, b"bad"), (large, b"L" * 5000), (good, b"good")):
+            tar.addfile(info, io.BytesIO(data))
+
+    result = await import_archive(target, _chunked(buffer.getvalue()), verify=True, buffer_limit=1000)
+
+    assert result.imported == 1
+    assert sorted(error["file_id"] for error in result.errors) == ["bad", "large"]
+    assert await _read(target, "good") == b"good"
+    assert not await target.exists("bad")
+
+
+@pytest.mark.asyncio
+async def test_import_rejects_truncated_archives(target):
+    archive = _tar([(_info("a", b"a" * 2000), b"a" * 2000)])
+
+    with pytest.raises(ValueError, match="truncated"):
+        await import_archive(target, _chunked(archive[:1500]))
+    with pytest.raises(ValueError, match="Malformed"):
+        await import_archive(target, _chunked(b"\1" * 512))
+
+
+@pytest.mark.asyncio
+async def test_import_bounds_memory_and_error_reports(target):
+    # A gzip bomb: the header claims a 64MiB entry that the body never finishes
+    info = _info("bomb", bytes(64 * 1024 * 1024))
+    bomb = gzip.compress(info.tobuf(tarfile.GNU_FORMAT) + bytes(64 * 1024 * 1024))
+    with pytest.raises(ValueError, match="truncated"):
+        await import_archive(target, _chunked(bomb[: len(bomb) // 2], 4096), codec=GzipCodec())
+
+    entries = []
+    for i in range(5):
+        bad = _info(f"bad-{i}", b"x")
+        bad.pax_headers = {"KEEPER.hash.sha256": "0" * 64}
+        entries.append((bad, b"x"))
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w", format=tarfile.PAX_FORMAT) as tar:
+        for info, data in entries:
+            tar.addfile(info, io.BytesIO(data))
+
+    result = await import_archive(target, _chunked(buffer.getvalue()), verify=True, max_errors=2)
+
+    assert result.failed == 5
+    assert len(result.errors) == 2
+
+
+def _pax_header(payload: bytes) -> bytes:
+    header = _info("././@PaxHeader", payload, type=tarfile.XHDTYPE)
+    return header.tobuf(tarfile.USTAR_FORMAT) + payload + bytes(-len(payload) % tarfile.BLOCKSIZE)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("record", [b"0 a=b\n", b"-5 a=b\n", b"3 a=b\n", b"99 a=b\n", b"x a=b\n"])
+async def test_import_rejects_bad_pax_record_lengths(target, record):
+    archive = _pax_header(record) + _tar([(_info("a", b"a"), b"a")])
+
+    with pytest.raises(ValueError, match="Malformed"):
+        await asyncio.wait_for(import_archive(target, _chunked(archive)), timeout=5)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("size", [b"-1", b"abc"])
+async def test_import_rejects_bad_size_records(target, size):
+    record = b" size=" + size + b"\n"
+    record = str(len(record) + 2).encode() + record
+    archive = _pax_header(record) + _tar([(_info("a", b"a"), b"a")])
+
+    with pytest.raises(ValueError, match="Malformed"):
+        await import_archive(target, _chunked(archive))
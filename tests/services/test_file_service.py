@@ -3,6 +3,7 @@ from hashlib import sha256
 
 import pytest
 
+from app.schemas.batch import BatchOperation
 from app.utils.helpers import _to_stream
 
 
@@ -90,3 +91,16 @@ async def test_save_file_with_hash_check_failure(file_service, sample_data):
     wrong_hash = "0000"
     with pytest.raises(ValueError, match="Hash mismatch"):
         await file_service.save_file_with_hash_check(file_id, _to_stream(sample_data), wrong_hash, "sha256")
+
+
+@pytest.mark.asyncio
+async def test_run_batch(file_service, sample_data):
+    await file_service.save_file("a", _to_stream(sample_data))
+
+    sizes = [item async for item in file_service.run_batch(BatchOperation.SIZE, ["a", "missing"], concurrency=2)]
+    deletes = [item async for item in file_service.run_batch(BatchOperation.DELETE, ["a", "missing"])]
+    hashes = [item async for item in file_service.run_batch(BatchOperation.HASH, ["../escape"])]
+
+    assert sorted(sizes, key=lambda item: item["file_id"]) == [{"file_id": "a", "result": len(sample_data)}, {"file_id": "missing", "error": "not_found"}]
+    assert sorted(deletes, key=lambda item: item["file_id"]) == [{"file_id": "a", "result": True}, {"file_id": "missing", "result": False}]
+    assert hashes == [{"file_id": "../escape", "error": "Path escapes base directory"}]
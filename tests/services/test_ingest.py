@@ -0,0 +1,90 @@
+import asyncio
+import os
+import time
+
+import pytest
+
+from app.services.ingest import IngestQueue, IngestQueueFullError, JobStatus
+from app.utils.helpers import _to_stream
+
+
+@pytest.fixture
+def spool_dir(tmp_path):
+    return str(tmp_path / "spool")
+
+
+async def _wait(job):
+    for _ in range(100):
+        if job.status in (JobStatus.DONE, JobStatus.FAILED):
+            return
+        await asyncio.sleep(0.01)
+
+
+@pytest.mark.asyncio
+async def test_submit_saves_from_spool(local_file_driver, spool_dir, sample_data):
+    queue = IngestQueue(local_file_driver, spool_dir, workers=1)
+    await queue.start()
+    try:
+        job = await queue.submit("spooled", _to_stream(sample_data))
+        await _wait(job)
+    finally:
+        await queue.stop()
+
+    assert queue.get_job(job.job_id).status == JobStatus.DONE
+    assert b"".join([chunk async for chunk in local_file_driver.read("spooled")]) == sample_data
+    assert os.listdir(spool_dir) == []
+    assert queue.pending == 0
+
+
+@pytest.mark.asyncio
+async def test_failed_job_reports_error(local_file_driver, spool_dir, sample_data):
+    queue = IngestQueue(local_file_driver, spool_dir, workers=1)
+    await queue.start()
+    try:
+        job = await queue.submit("bad", _to_stream(sample_data), expected_hashes={"sha256": "0000"})
+        await _wait(job)
+    finally:
+        await queue.stop()
+
+    assert job.status == JobStatus.FAILED
+    assert "Hash mismatch" in job.error
+    assert not await local_file_driver.exists("bad")
+
+
+@pytest.mark.asyncio
+async def test_submit_rejects_when_full(local_file_driver, spool_dir):
+    queue = IngestQueue(local_file_driver, spool_dir, workers=0, max_pending=1)
+    await queue.submit("first", _to_stream(b"1"))
+
+    with pytest.raises(IngestQueueFullError):
+        await queue.submit("second", _to_stream(b"2"))
+    assert len(os.listdir(spool_dir)) == 1
+
+
+@pytest.mark.asyncio
+async def test_stop_drains_queue(local_file_driver, spool_dir):
+    queue = IngestQueue(local_file_driver, spool_dir, workers=2)
+    await queue.start()
+    jobs = [await queue.submit(f"drain-{i}", _to_stream(b"x" * i)) for i in range(5)]
+    await queue.stop()
+
+    assert all(job.status == JobStatus.DONE for job in jobs)
+
+
+@pytest.mark.asyncio
+async def test_start_clears_spool_left_by_a_previous_run(local_file_driver, spool_dir):
+    os.makedirs(spool_dir)
+    leftover = os.path.join(spool_dir, "job-crashed")
+    with open(leftover, "wb") as f:
+        f.write(b"orphan")
+    os.utime(leftover, (time.time() - 120, time.time() - 120))
+    # Another worker sharing the spool has just queued this one
+    queued = os.path.join(spool_dir, "job-queued")
+    with open(queued, "wb") as f:
+        f.write(b"pending")
+
+    queue = IngestQueue(local_file_driver, spool_dir, workers=1, spool_max_age=60)
+    await queue.start()
+    await queue.stop()
+
+    assert os.listdir(spool_dir) == ["job-queued"]
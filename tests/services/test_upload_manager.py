@@ -0,0 +1,94 @@
+import asyncio
+import hashlib
+import os
+
+import pytest
+
+from app.services.uploads import UploadManager, UploadNotFoundError, composite_digest
+from app.storage.hashing import HashMismatchError
+from app.utils.helpers import _to_stream
+
+
+@pytest.fixture
+def upload_manager(local_file_driver, tmp_path):
+    return UploadManager(local_file_driver, str(tmp_path / ".keeper" / "uploads"))
+
+
+@pytest.mark.asyncio
+async def test_parts_are_assembled_in_order(upload_manager, local_file_driver):
+    session = await upload_manager.create("big.bin")
+    await upload_manager.put_part(session.upload_id, 2, _to_stream(b"world"))
+    await upload_manager.put_part(session.upload_id, 1, _to_stream(b"hello "))
+
+    upload = await upload_manager.complete(session.upload_id, expected_hashes={"sha256": hashlib.sha256(b"hello world").hexdigest()})
+
+    assert upload.size == 11
+    assert upload.parts == 2
+    assert upload.digests == {"sha256": hashlib.sha256(b"hello world").hexdigest()}
+    assert b"".join([chunk async for chunk in local_file_driver.read("big.bin")]) == b"hello world"
+    assert not os.path.exists(os.path.join(upload_manager.uploads_dir, session.upload_id))
+
+
+@pytest.mark.asyncio
+async def test_session_survives_restart_and_replaces_parts(upload_manager, local_file_driver):
+    session = await upload_manager.create("resumed.bin")
+    await upload_manager.put_part(session.upload_id, 1, _to_stream(b"stale"))
+    await upload_manager.put_part(session.upload_id, 1, _to_stream(b"fresh"))
+
+    restarted = UploadManager(local_file_driver, upload_manager.uploads_dir)
+    resumed = await restarted.get(session.upload_id)
+
+    assert resumed.file_id == "resumed.bin"
+    assert [(part.number, part.digest) for part in resumed.parts] == [(1, hashlib.sha256(b"fresh").hexdigest())]
+    assert composite_digest(resumed.parts).endswith("-1")
+
+
+@pytest.mark.asyncio
+async def test_complete_requires_contiguous_parts(upload_manager):
+    session = await upload_manager.create("gap.bin")
+    await upload_manager.put_part(session.upload_id, 1, _to_stream(b"a"))
+    await upload_manager.put_part(session.upload_id, 3, _to_stream(b"c"))
+
+    with pytest.raises(ValueError, match="Missing part 2"):
+        await upload_manager.complete(session.upload_id)
+
+
+@pytest.mark.asyncio
+async def test_part_hash_mismatch_is_rejected(upload_manager):
+    session = await upload_manager.create("bad.bin")
+
+    with pytest.raises(HashMismatchError):
+        await upload_manager.put_part(session.upload_id, 1, _to_stream(b"data"), expected_hash="0" * 64)
+    assert (await upload_manager.get(session.upload_id)).parts == []
+
+
+@pytest.mark.asyncio
+async def test_unknown_upload(upload_manager):
+    with pytest.raises(UploadNotFoundError):
+        await upload_manager.get("../../etc")
+    with pytest.raises(UploadNotFoundError):
+        await upload_manager.abort("0" * 32)
+
+
+@pytest.mark.asyncio
+async def test_part_finishing_during_complete_is_rejected(upload_manager, local_file_driver):
+    session = await upload_manager.create("raced.bin")
+    await upload_manager.put_part(session.upload_id, 1, _to_stream(b"first"))
+    streaming = asyncio.Event()
+    release = asyncio.Event()
+
+    async def late_part():
+        yield b"late"
+        streaming.set()
+        await release.wait()
+
+    late = asyncio.create_task(upload_manager.put_part(session.upload_id, 2, late_part()))
+    await streaming.wait()
+    completing = asyncio.create_task(upload_manager.complete(session.upload_id))
+    await asyncio.sleep(0)
+    release.set()
+
+    assert (await completing).parts == 1
+    with pytest.raises(UploadNotFoundError):
+        await late
+    assert b"".join([chunk async for chunk in local_file_driver.read("raced.bin")]) == b"first"
@@ -0,0 +1,108 @@
+import asyncio
+from unittest import mock
+
+import pytest
+
+from app.storage.caching import CachingDriver, ObjectCache
+from app.utils.helpers import _to_stream
+
+
+@pytest.fixture
+def object_cache() -> ObjectCache:
+    return ObjectCache(max_bytes=1024, max_object_size=256, ttl=60)
+
+
+@pytest.fixture
+def caching_driver(local_file_driver, object_cache) -> CachingDriver:
+    return CachingDriver(local_file_driver, object_cache)
+
+
+async def _read(driver, path, **kwargs) -> bytes:
+    return b"".join([chunk async for chunk in driver.read(path, **kwargs)])
+
+
+@pytest.mark.asyncio
+async def test_objects_are_admitted_on_second_read(caching_driver, object_cache, local_file_driver):
+    await caching_driver.save("small.txt", _to_stream(b"hello world"))
+
+    assert await caching_driver.read_cached("small.txt") is None
+    assert object_cache.stats()["entries"] == 0
+    assert await caching_driver.read_cached("small.txt") == b"hello world"
+    assert object_cache.stats()["entries"] == 1
+
+    with mock.patch.object(local_file_driver, "read", side_effect=AssertionError("not cached")):
+        assert await caching_driver.read_cached("small.txt") == b"hello world"
+        assert await _read(caching_driver, "small.txt", offset=6, length=3) == b"wor"
+    assert object_cache.stats() == {"hits": 1, "misses": 2, "hit_ratio": 1 / 3, "entries": 1, "bytes": 11, "max_bytes": 1024}
+
+
+@pytest.mark.asyncio
+async def test_large_objects_are_not_cached(caching_driver, object_cache):
+    await caching_driver.save("large.bin", _to_stream(b"x" * 512))
+
+    for _ in range(3):
+        assert await caching_driver.read_cached("large.bin") is None
+    assert await caching_driver.read_cached("large.bin", size=512) is None
+    assert object_cache.stats()["entries"] == 0
+
+
+@pytest.mark.asyncio
+async def test_writes_and_deletes_invalidate(caching_driver, object_cache):
+    await caching_driver.save("file.txt", _to_stream(b"old"))
+    await caching_driver.read_cached("file.txt")
+    await caching_driver.read_cached("file.txt")
+
+    await caching_driver.save("file.txt", _to_stream(b"new"))
+    assert await caching_driver.read_cached("file.txt") == b"new"
+    assert (await caching_driver.stat("file.txt")).size == 3
+
+    assert await caching_driver.delete("file.txt")
+    assert object_cache.get("file.txt") is None
+    assert not await caching_driver.exists("file.txt")
+
+
+@pytest.mark.asyncio
+async def test_fill_racing_a_write_is_dropped(caching_driver, object_cache, local_file_driver):
+    await caching_driver.save("file.txt", _to_stream(b"old"))
+    await caching_driver.read_cached("file.txt")
+    inner_read = local_file_driver.read
+    read_started = asyncio.Event()
+    write_done = asyncio.Event()
+
+    async def slow_read(path, **kwargs):
+        read_started.set()
+        await write_done.wait()
+        async for chunk in inner_read(path, **kwargs):
+            yield chunk
+
+    with mock.patch.object(local_file_driver, "read", side_effect=slow_read):
+        fill = asyncio.create_task(caching_driver.read_cached("file.txt"))
+        await read_started.wait()
+        await caching_driver.save("file.txt", _to_stream(b"new"))
+        write_done.set()
+        await fill
+
+    assert object_cache.get("file.txt") is None
+
+
+@pytest.mark.asyncio
+async def test_eviction_is_lru_by_bytes(caching_driver, object_cache):
+    for name in ("a", "b", "c", "d", "e"):
+        await caching_driver.save(name, _to_stream(name.encode() * 250))
+        await caching_driver.read_cached(name)
+        await caching_driver.read_cached(name)
+        await caching_driver.read_cached("a")
+
+    assert object_cache.stats()["bytes"] <= 1024
+    assert object_cache.get("a") is not None
+    assert object_cache.get("b") is None
+
+
+@pytest.mark.asyncio
+async def test_entries_expire(caching_driver, object_cache):
+    await caching_driver.save("file.txt", _to_stream(b"data"))
+    await caching_driver.read_cached("file.txt")
+    await caching_driver.read_cached("file.txt")
+
+    with mock.patch("app.storage.caching.time.monotonic", return_value=10**9):
+        assert object_cache.get("file.txt") is None
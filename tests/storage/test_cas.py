@@ -0,0 +1,97 @@
+import hashlib
+import os
+
+import pytest
+
+from app.storage.cas import ContentAddressedDriver
+from app.utils.helpers import _to_stream
+
+
+@pytest.fixture
+def cas_driver(tmp_path) -> ContentAddressedDriver:
+    return ContentAddressedDriver(base_dir=str(tmp_path), default_chunk_size=4)
+
+
+def _blob_files(driver):
+    return [os.path.join(root, name) for root, _, files in os.walk(driver.blobs_dir) for name in files]
+
+
+@pytest.mark.asyncio
+async def test_identical_uploads_share_one_blob(cas_driver, sample_data):
+    digest = hashlib.sha256(sample_data).hexdigest()
+    await cas_driver.save("first", _to_stream(sample_data))
+    await cas_driver.save("second", _to_stream(sample_data))
+
+    blobs = _blob_files(cas_driver)
+    assert blobs == [os.path.join(cas_driver.blobs_dir, digest[:2], digest[2:4], digest)]
+    assert await cas_driver.refcount(digest) == 2
+    assert os.path.samefile(await cas_driver.local_path("first"), await cas_driver.local_path("second"))
+    assert b"".join([chunk async for chunk in cas_driver.read("second")]) == sample_data
+
+
+@pytest.mark.asyncio
+async def test_known_digest_skips_the_write(cas_driver, sample_data):
+    digest = hashlib.sha256(sample_data).hexdigest()
+    await cas_driver.save("original", _to_stream(sample_data))
+
+    async def untouched_stream():
+        raise AssertionError("body should not be read")
+        yield b""
+
+    digests = await cas_driver.save("copy", untouched_stream(), expected_hashes={"sha256": digest})
+
+    assert digests == {"sha256": digest}
+    assert await cas_driver.size("copy") == len(sample_data)
+    assert await cas_driver.refcount(digest) == 2
+
+
+@pytest.mark.asyncio
+async def test_unknown_or_malformed_digest_falls_back_to_verification(cas_driver, sample_data):
+    with pytest.raises(ValueError, match="Hash mismatch"):
+        await cas_driver.save("bad", _to_stream(sample_data), expected_hashes={"sha256": "../../etc/passwd"})
+    assert not await cas_driver.exists("bad")
+    assert _blob_files(cas_driver) == []
+
+
+@pytest.mark.asyncio
+async def test_overwrite_and_delete_release_references(cas_driver):
+    await cas_driver.save("doc", _to_stream(b"v1"))
+    await cas_driver.save("doc", _to_stream(b"v2"))
+    v1 = hashlib.sha256(b"v1").hexdigest()
+    v2 = hashlib.sha256(b"v2").hexdigest()
+
+    assert await cas_driver.refcount(v1) == 0
+    assert await cas_driver.refcount(v2) == 1
+
+    assert await cas_driver.delete("doc") is True
+    assert await cas_driver.collect_garbage() == 2
+    assert _blob_files(cas_driver) == []
+
+
+@pytest.mark.asyncio
+async def test_startup_collects_unreferenced_blobs(cas_driver):
+    await cas_driver.save("kept", _to_stream(b"kept"))
+    await cas_driver.save("dropped", _to_stream(b"dropped"))
+    await cas_driver.delete("dropped")
+
+    await cas_driver.startup()
+
+    assert len(_blob_files(cas_driver)) == 1
+    assert await cas_driver.refcount(hashlib.sha256(b"kept").hexdigest()) == 1
+
+
+@pytest.mark.asyncio
+async def test_cas_unsupported_algorithm(tmp_path):
+    with pytest.raises(ValueError, match="Unsupported hash algorithm"):
+        ContentAddressedDriver(base_dir=str(tmp_path), algorithm="unsupported")
+
+
+@pytest.mark.asyncio
+async def test_save_parts_deduplicates(cas_driver, tmp_path, sample_data):
+    part = tmp_path / "part"
+    part.write_bytes(sample_data)
+    await cas_driver.save("first", _to_stream(sample_data))
+
+    digests = await cas_driver.save_parts("second", [str(part)])
+
+    assert await cas_driver.refcount(digests["sha256"]) == 2
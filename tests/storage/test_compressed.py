@@ -0,0 +1,97 @@
+import gzip
+import hashlib
+import os
+
+import pytest
+
+from app.storage.codecs import GzipCodec, get_codec
+from app.storage.compressed import MAGIC, CompressedDriver
+from app.storage.enums import Compression
+from app.storage.hashing import HashMismatchError
+from app.utils.helpers import _to_stream
+
+TEXT = b'{"key": "value", "items": [1, 2, 3]}\n' * 2000
+
+
+@pytest.fixture
+def compressed_driver(local_file_driver) -> CompressedDriver:
+    return CompressedDriver(local_file_driver, GzipCodec(), sample_size=1024)
+
+
+async def _read(driver, path, **kwargs) -> bytes:
+    return b"".join([chunk async for chunk in driver.read(path, **kwargs)])
+
+
+@pytest.mark.asyncio
+async def test_compressible_data_round_trip(compressed_driver, local_file_driver):
+    digests = await compressed_driver.save("data.json", _to_stream(TEXT), algorithms=["md5"])
+    file_stat = await compressed_driver.stat("data.json")
+
+    assert os.path.getsize(local_file_driver._full_path("data.json")) < len(TEXT) // 5
+    assert await _read(compressed_driver, "data.json") == TEXT
+    assert await _read(compressed_driver, "data.json", offset=1000, length=5000) == TEXT[1000:6000]
+    assert file_stat.size == len(TEXT)
+    assert file_stat.digests == {"sha256": hashlib.sha256(TEXT).hexdigest()}
+    assert digests["md5"] == await compressed_driver.hash("data.json", "md5") == hashlib.md5(TEXT).hexdigest()
+
+
+@pytest.mark.asyncio
+async def test_incompressible_data_is_stored_raw(compressed_driver, local_file_driver):
+    noise = os.urandom(8192)
+    await compressed_driver.save("noise.bin", _to_stream(noise))
+
+    with open(local_file_driver._full_path("noise.bin"), "rb") as f:
+        assert f.read() == noise
+    assert await compressed_driver.size("noise.bin") == len(noise)
+    assert await compressed_driver.open_encoded("noise.bin", {"gzip"}) is None
+
+
+@pytest.mark.asyncio
+async def test_raw_data_that_looks_framed_is_escaped(compressed_driver):
+    tricky = MAGIC + os.urandom(4096)
+    await compressed_driver.save("tricky.bin", _to_stream(tricky))
+
+    assert await _read(compressed_driver, "tricky.bin") == tricky
+    assert await compressed_driver.size("tricky.bin") == len(tricky)
+
+
+@pytest.mark.asyncio
+async def test_open_encoded_serves_stored_gzip(compressed_driver):
+    await compressed_driver.save("data.json", _to_stream(TEXT))
+
+    encoded = await compressed_driver.open_encoded("data.json", {"gzip", "br"})
+    payload = b"".join([chunk async for chunk in encoded.content])
+
+    assert encoded.coding == "gzip"
+    assert encoded.size == len(payload)
+    assert gzip.decompress(payload) == TEXT
+    assert await compressed_driver.open_encoded("data.json", {"br"}) is None
+
+
+@pytest.mark.asyncio
+async def test_hash_mismatch_stores_nothing(compressed_driver):
+    with pytest.raises(HashMismatchError):
+        await compressed_driver.save("bad.json", _to_stream(TEXT), expected_hashes={"sha256": "0" * 64})
+    assert not await compressed_driver.exists("bad.json")
+
+
+def test_optional_codecs_report_missing_packages():
+    for compression, package in ((Compression.ZSTD, "zstandard"), (Compression.LZ4, "lz4")):
+        try:
+            get_codec(compression)
+        except ValueError as e:
+            assert package in str(e)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("compression", [Compression.GZIP, Compression.ZSTD, Compression.LZ4])
+async def test_highly_compressible_objects_decompress_in_bounded_pieces(local_file_driver, compression):
+    pytest.importorskip({Compression.GZIP: "zlib", Compression.ZSTD: "zstandard", Compression.LZ4: "lz4"}[compression])
+    driver = CompressedDriver(local_file_driver, get_codec(compression), sample_size=1024)
+    zeros = bytes(16 * 1024 * 1024)
+    await driver.save("zeros.bin", _to_stream(zeros))
+
+    sizes = [len(chunk) async for chunk in driver.read("zeros.bin", chunk_size=64 * 1024)]
+
+    assert sum(sizes) == len(zeros)
+    assert max(sizes) <= 64 * 1024
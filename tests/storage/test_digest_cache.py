@@ -0,0 +1,99 @@
+import hashlib
+import os
+
+import pytest
+
+from app.storage import local
+from app.storage.digest_cache import DigestCache
+from app.storage.local import LocalFileDriver
+from app.utils.helpers import _to_stream
+
+
+@pytest.fixture
+def cached_driver(tmp_path) -> LocalFileDriver:
+    return LocalFileDriver(base_dir=str(tmp_path), default_chunk_size=4, digest_cache=DigestCache(max_entries=2))
+
+
+def test_lru_eviction():
+    cache = DigestCache(max_entries=2)
+    fp = (1, 1, 1, 1, 1)
+    cache.put("a", fp, {"sha256": "a"})
+    cache.put("b", fp, {"sha256": "b"})
+    cache.get("a", fp, ["sha256"])
+    cache.put("c", fp, {"sha256": "c"})
+
+    assert cache.get("b", fp, ["sha256"]) == {}
+    assert cache.get("a", fp, ["sha256"]) == {"sha256": "a"}
+    assert cache.stats() == {"hits": 2, "misses": 1, "entries": 2, "max_entries": 2}
+
+
+def test_fingerprint_change_invalidates():
+    cache = DigestCache()
+    cache.put("a", (1, 1, 1, 1, 1), {"sha256": "old"})
+    assert cache.get("a", (1, 1, 1, 2, 1), ["sha256"]) == {}
+
+
+@pytest.mark.asyncio
+async def test_saved_digests_are_served_from_cache(cached_driver, sample_data):
+    await cached_driver.save("cached.bin", _to_stream(sample_data), algorithms=["sha256"])
+
+    assert await cached_driver.hash("cached.bin", "sha256") == hashlib.sha256(sample_data).hexdigest()
+    assert cached_driver.digest_cache.stats()["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_multi_algorithm_single_pass(cached_driver, sample_data, monkeypatch):
+    await cached_driver.save("multi.bin", _to_stream(sample_data))
+    reads = 0
+    original_read = cached_driver.read
+
+    def counting_read(*args, **kwargs):
+        nonlocal reads
+        reads += 1
+        return original_read(*args, **kwargs)
+
+    monkeypatch.setattr(cached_driver, "read", counting_read)
+    digests = await cached_driver.hashes("multi.bin", ["sha256", "md5"])
+
+    assert digests == {"sha256": hashlib.sha256(sample_data).hexdigest(), "md5": hashlib.md5(sample_data).hexdigest()}
+    assert reads == 0
+    assert cached_driver.digest_cache.stats()["misses"] == 2
+    assert await cached_driver.hashes("multi.bin", ["md5", "sha256"]) == digests
+    assert cached_driver.digest_cache.stats()["hits"] == 2
+
+
+@pytest.mark.asyncio
+async def test_out_of_band_modification_is_detected(cached_driver, tmp_path):
+    await cached_driver.save("changing.bin", _to_stream(b"before"), algorithms=["sha256"])
+    path = tmp_path / "changing.bin"
+    stat_result = os.stat(path)
+    path.write_bytes(b"after!")
+    os.utime(path, ns=(stat_result.st_atime_ns, stat_result.st_mtime_ns))
+
+    assert await cached_driver.hash("changing.bin", "sha256") == hashlib.sha256(b"after!").hexdigest()
+
+
+@pytest.mark.asyncio
+async def test_replace_after_commit_is_not_cached_under_old_digests(cached_driver, tmp_path, monkeypatch):
+    replace_tracked = local._replace_tracked
+
+    def replaced_again(source_path, target_path):
+        # Another save lands between this commit's rename and its fingerprint
+        inode = replace_tracked(source_path, target_path)
+        other = tmp_path / "other"
+        other.write_bytes(b"BBBBBB")
+        os.replace(other, target_path)
+        return inode
+
+    monkeypatch.setattr(local, "_replace_tracked", replaced_again)
+    await cached_driver.save("raced.bin", _to_stream(b"AAAA"), algorithms=["sha256"])
+
+    assert cached_driver.digest_cache.stats()["entries"] == 0
+    assert await cached_driver.hash("raced.bin", "sha256") == hashlib.sha256(b"BBBBBB").hexdigest()
+
+
+@pytest.mark.asyncio
+async def test_delete_invalidates(cached_driver):
+    await cached_driver.save("gone.bin", _to_stream(b"data"), algorithms=["sha256"])
+    await cached_driver.delete("gone.bin")
+    assert cached_driver.digest_cache.stats()["entries"] == 0
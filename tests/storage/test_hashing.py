@@ -0,0 +1,28 @@
+import hashlib
+
+import pytest
+
+from app.storage.hashing import HashMismatchError, hash_tee, hexdigests, new_hashers, verify_digests
+from app.utils.helpers import _to_stream
+
+
+@pytest.mark.asyncio
+async def test_hash_tee_passes_chunks_through(sample_data):
+    hashers = new_hashers(["sha256", "sha1"])
+    chunks = [chunk async for chunk in hash_tee(_to_stream(sample_data), hashers)]
+
+    assert b"".join(chunks) == sample_data
+    assert hexdigests(hashers) == {
+        "sha256": hashlib.sha256(sample_data).hexdigest(),
+        "sha1": hashlib.sha1(sample_data).hexdigest(),
+    }
+
+
+def test_new_hashers_unsupported_algorithm():
+    with pytest.raises(ValueError, match="Unsupported hash algorithm"):
+        new_hashers(["unsupported"])
+
+
+def test_verify_digests_mismatch():
+    with pytest.raises(HashMismatchError, match="Hash mismatch: expected aa, got bb"):
+        verify_digests({"sha256": "bb"}, {"sha256": "aa"})
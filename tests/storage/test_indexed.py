@@ -0,0 +1,181 @@
+import asyncio
+import hashlib
+import os
+import subprocess
+import sys
+from unittest import mock
+
+import pytest
+
+from app.storage.base import FileStat
+from app.storage.codecs import GzipCodec
+from app.storage.compressed import CompressedDriver
+from app.storage.index import MetadataIndex
+from app.storage.indexed import IndexedDriver
+from app.utils.helpers import _to_stream
+
+
+@pytest.fixture
+def index(local_file_driver):
+    index = MetadataIndex(os.path.join(local_file_driver.internal_dir, "index.sqlite3"))
+    yield index
+    index.close()
+
+
+@pytest.fixture
+def indexed_driver(local_file_driver, index) -> IndexedDriver:
+    return IndexedDriver(local_file_driver, index)
+
+
+@pytest.mark.asyncio
+async def test_save_records_metadata(indexed_driver, sample_data):
+    await indexed_driver.save("indexed.txt", _to_stream(sample_data))
+    file_stat = indexed_driver.index.get("indexed.txt")
+
+    assert file_stat.size == len(sample_data)
+    assert file_stat.digests == {"sha256": hashlib.sha256(sample_data).hexdigest()}
+    assert file_stat.mtime_ns == (await indexed_driver.inner.stat("indexed.txt")).mtime_ns
+
+
+@pytest.mark.asyncio
+async def test_metadata_queries_skip_the_filesystem(indexed_driver, sample_data):
+    await indexed_driver.save("cached.txt", _to_stream(sample_data))
+
+    with (
+        mock.patch.object(indexed_driver.inner, "stat", side_effect=AssertionError("stat hit the disk")),
+        mock.patch.object(indexed_driver.inner, "hash", side_effect=AssertionError("hash re-read the file")),
+    ):
+        assert await indexed_driver.exists("cached.txt")
+        assert not await indexed_driver.exists("missing.txt")
+        assert await indexed_driver.size("cached.txt") == len(sample_data)
+        assert await indexed_driver.hash("cached.txt", "sha256") == hashlib.sha256(sample_data).hexdigest()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_saves_record_matching_metadata(indexed_driver):
+    inner_stat = indexed_driver.inner.stat
+    first = True
+
+    async def slow_stat(path):
+        # The first save pauses between its write and its index entry, long enough for a second save to finish
+        nonlocal first
+        if first:
+            first = False
+            await asyncio.sleep(0.05)
+        return await inner_stat(path)
+
+    with mock.patch.object(indexed_driver.inner, "stat", side_effect=slow_stat):
+        first_save = asyncio.ensure_future(indexed_driver.save("raced.txt", _to_stream(b"AAAA")))
+        await asyncio.sleep(0.01)
+        await indexed_driver.save("raced.txt", _to_stream(b"BBBBBB"))
+        await first_save
+
+    body = b"".join([chunk async for chunk in indexed_driver.read("raced.txt")])
+    file_stat = indexed_driver.index.get("raced.txt")
+    assert file_stat.size == len(body)
+    assert file_stat.digests["sha256"] == hashlib.sha256(body).hexdigest()
+
+
+@pytest.mark.asyncio
+async def test_hash_for_new_algorithm_is_remembered(indexed_driver, sample_data):
+    await indexed_driver.save("md5.txt", _to_stream(sample_data))
+    assert await indexed_driver.hash("md5.txt", "md5") == hashlib.md5(sample_data).hexdigest()
+    assert indexed_driver.index.get("md5.txt").digests["md5"] == hashlib.md5(sample_data).hexdigest()
+
+
+@pytest.mark.asyncio
+async def test_delete_updates_index(indexed_driver, sample_data):
+    await indexed_driver.save("gone.txt", _to_stream(sample_data))
+    assert await indexed_driver.delete("gone.txt") is True
+    assert not await indexed_driver.exists("gone.txt")
+    with pytest.raises(FileNotFoundError):
+        await indexed_driver.stat("gone.txt")
+
+
+@pytest.mark.asyncio
+async def test_rebuild_from_base_dir(local_file_driver, index, tmp_path):
+    await local_file_driver.save("one.txt", _to_stream(b"1"))
+    (tmp_path / "nested").mkdir()
+    await local_file_driver.save("nested/two.txt", _to_stream(b"22"))
+    index.put("stale.txt", (await local_file_driver.stat("one.txt")))
+
+    count = await IndexedDriver(local_file_driver, index).rebuild()
+
+    assert count == 2
+    assert index.get("stale.txt") is None
+    assert index.get("nested/two.txt").size == 2
+
+
+def test_index_persists_across_connections(index):
+    assert index.created
+    index.put("kept.txt", FileStat(size=1, mtime_ns=2))
+    reopened = MetadataIndex(index.db_path)
+    try:
+        assert not reopened.created
+        assert reopened.get("kept.txt").size == 1
+    finally:
+        reopened.close()
+
+
+@pytest.mark.asyncio
+async def test_index_is_rebuilt_after_an_unclean_shutdown(local_file_driver, tmp_path):
+    db_path = str(tmp_path / "crashed.sqlite3")
+    # A process that opens the index and dies without closing it
+    crash = "import os, sys; from app.storage.index import MetadataIndex; MetadataIndex(sys.argv[1]); os._exit(0)"
+    subprocess.run([sys.executable, "-c", crash, db_path], check=True, env={**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)})
+    await local_file_driver.save("unindexed.txt", _to_stream(b"data"))
+
+    reopened = MetadataIndex(db_path)
+    assert not reopened.clean
+    await IndexedDriver(local_file_driver, reopened).startup()
+    assert reopened.get("unindexed.txt").size == 4
+    reopened.close()
+
+    after_clean_close = MetadataIndex(db_path)
+    assert after_clean_close.clean
+    after_clean_close.close()
+
+
+def test_workers_sharing_an_index_only_check_it_once(tmp_path):
+    db_path = str(tmp_path / "shared.sqlite3")
+    first = MetadataIndex(db_path)
+    second = MetadataIndex(db_path)
+    assert first.created and not second.created
+    assert second.clean
+
+    # One worker shutting down doesn't vouch for the others, and a restarted worker trusts the ones still running
+    first.close()
+    restarted = MetadataIndex(db_path)
+    assert restarted.clean and not restarted.created
+    second.close()
+    restarted.close()
+
+    cold_start = MetadataIndex(db_path)
+    assert cold_start.clean
+    cold_start.close()
+
+
+@pytest.mark.asyncio
+async def test_list_from_index(indexed_driver):
+    os.makedirs(os.path.join(indexed_driver.inner.base_dir, "a"))
+    for name in ["b", "a/1", "a/2"]:
+        await indexed_driver.save(name, _to_stream(b"data"))
+
+    names = [name async for name, _ in indexed_driver.list(prefix="a/", limit=1)]
+    rest = [name async for name, _ in indexed_driver.list(cursor="a/1")]
+
+    assert names == ["a/1"]
+    assert rest == ["a/2", "b"]
+
+
+@pytest.mark.asyncio
+async def test_rebuild_pages_through_wrapped_driver(local_file_driver, index):
+    compressed = CompressedDriver(local_file_driver, GzipCodec())
+    content = b"text " * 1000
+    for name in ["a", "b", "c"]:
+        await compressed.save(name, _to_stream(content))
+
+    count = await IndexedDriver(compressed, index).rebuild(page_size=2)
+
+    assert count == 3
+    assert index.get("b").size == len(content)
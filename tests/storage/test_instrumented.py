@@ -0,0 +1,42 @@
+import pytest
+
+from app.core.metrics import Metrics
+from app.storage.instrumented import InstrumentedDriver
+from app.utils.helpers import _to_stream
+
+
+@pytest.fixture
+def metrics() -> Metrics:
+    return Metrics()
+
+
+@pytest.fixture
+def instrumented_driver(local_file_driver, metrics) -> InstrumentedDriver:
+    return InstrumentedDriver(local_file_driver, metrics)
+
+
+@pytest.mark.asyncio
+async def test_operations_are_timed_and_bytes_counted(instrumented_driver, metrics):
+    await instrumented_driver.save("file.bin", _to_stream(b"x" * 1000))
+    assert b"".join([chunk async for chunk in instrumented_driver.read("file.bin")]) == b"x" * 1000
+    await instrumented_driver.hash("file.bin", "sha256")
+    assert await instrumented_driver.delete("file.bin")
+
+    for operation in ("save", "read", "hash", "delete"):
+        assert metrics.storage_duration.count(operation) == 1
+    assert metrics.storage_bytes.value("write") == 1000
+    assert metrics.storage_bytes.value("read") == 1000
+    assert metrics.storage_streams.value("read") == metrics.storage_streams.value("write") == 0
+
+
+@pytest.mark.asyncio
+async def test_errors_are_counted(instrumented_driver, metrics):
+    with pytest.raises(FileNotFoundError):
+        await instrumented_driver.stat("missing")
+    with pytest.raises(FileNotFoundError):
+        async for _ in instrumented_driver.read("missing"):
+            pass
+
+    assert metrics.storage_errors.value("stat", "FileNotFoundError") == 1
+    assert metrics.storage_errors.value("read", "FileNotFoundError") == 1
+    assert metrics.storage_streams.value("read") == 0
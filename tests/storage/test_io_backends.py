@@ -0,0 +1,58 @@
+import os
+
+import pytest
+
+from app.storage.io_backends import AiofilesBackend, PreadBackend
+from app.storage.local import LocalFileDriver
+from app.utils.helpers import _to_stream
+
+
+@pytest.fixture(params=[AiofilesBackend, PreadBackend], ids=["aiofiles", "pread"])
+def io_backend(request):
+    return request.param()
+
+
+@pytest.mark.asyncio
+async def test_write_and_read_back(tmp_path, io_backend):
+    path = str(tmp_path / "data.bin")
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT)
+    await io_backend.write_fd(fd, _to_stream(b"0123456789"), fsync=True)
+
+    async with io_backend.open_reader(path) as reader:
+        whole = [chunk async for chunk in reader.chunks(0, None, 4)]
+        part = [chunk async for chunk in reader.chunks(3, 5, 2)]
+
+    assert reader.size == 10
+    assert b"".join(whole) == b"0123456789"
+    assert b"".join(part) == b"34567"
+
+
+@pytest.mark.asyncio
+async def test_pread_batches_chunks_per_trip(tmp_path, monkeypatch):
+    path = tmp_path / "data.bin"
+    path.write_bytes(b"x" * 100)
+    backend = PreadBackend(batch_chunks=4)
+    trips = 0
+    run = backend._run
+
+    async def counting_run(func, *args):
+        nonlocal trips
+        trips += 1
+        return await run(func, *args)
+
+    monkeypatch.setattr(backend, "_run", counting_run)
+    async with backend.open_reader(str(path)) as reader:
+        chunks = [chunk async for chunk in reader.chunks(0, None, 10)]
+
+    assert len(chunks) == 10
+    # open, three batches (4 + 4 + 2 chunks) and close
+    assert trips == 5
+
+
+@pytest.mark.asyncio
+async def test_local_driver_with_pread_backend(tmp_path, sample_data):
+    driver = LocalFileDriver(base_dir=str(tmp_path), default_chunk_size=4, io_backend=PreadBackend())
+    await driver.save("file.txt", _to_stream(sample_data))
+
+    assert b"".join([chunk async for chunk in driver.read("file.txt")]) == sample_data
+    assert b"".join([chunk async for chunk in driver.read("file.txt", offset=7, length=5)]) == sample_data[7:12]
@@ -1,9 +1,14 @@
 import hashlib
+import heapq
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from unittest import mock
 
 import pytest
 
-from app.utils.helpers import _to_stream
+from app.storage.enums import FsyncPolicy
+from app.storage.local import LocalFileDriver
+from app.utils.helpers import UMASK, _to_stream
 
 
 @pytest.mark.asyncio
@@ -87,3 +92,263 @@ async def test_validate_base_dir_no_write_permission():
     ):
         with pytest.raises(PermissionError):
             LocalFileDriver("/any/path")
+
+
+@pytest.mark.asyncio
+async def test_save_returns_inline_digests(local_file_driver, sample_data):
+    digests = await local_file_driver.save("digests.txt", _to_stream(sample_data), algorithms=["sha256", "md5"])
+    assert digests == {
+        "sha256": hashlib.sha256(sample_data).hexdigest(),
+        "md5": hashlib.md5(sample_data).hexdigest(),
+    }
+
+
+@pytest.mark.asyncio
+async def test_save_hash_mismatch_removes_file(local_file_driver, sample_data):
+    with pytest.raises(ValueError, match="Hash mismatch"):
+        await local_file_driver.save("mismatch.txt", _to_stream(sample_data), expected_hashes={"sha256": "0000"})
+    assert not await local_file_driver.exists("mismatch.txt")
+
+
+@pytest.mark.asyncio
+async def test_save_hash_check_does_not_reread(local_file_driver, sample_data):
+    expected = {"sha256": hashlib.sha256(sample_data).hexdigest()}
+    with mock.patch.object(local_file_driver, "read", side_effect=AssertionError("file was re-read")):
+        await local_file_driver.save("noreread.txt", _to_stream(sample_data), expected_hashes=expected)
+    assert await local_file_driver.size("noreread.txt") == len(sample_data)
+
+
+@pytest.mark.asyncio
+async def test_save_is_invisible_until_committed(local_file_driver):
+    async def stream():
+        yield b"first"
+        assert not await local_file_driver.exists("staged.txt")
+        yield b"second"
+
+    await local_file_driver.save("staged.txt", stream())
+    assert await local_file_driver.exists("staged.txt")
+    assert os.listdir(local_file_driver.staging_dir) == []
+
+
+@pytest.mark.asyncio
+async def test_failed_save_keeps_previous_version(local_file_driver):
+    await local_file_driver.save("keep.txt", _to_stream(b"original"))
+    with pytest.raises(ValueError, match="Hash mismatch"):
+        await local_file_driver.save("keep.txt", _to_stream(b"replacement"), expected_hashes={"sha256": "0000"})
+
+    chunks = [chunk async for chunk in local_file_driver.read("keep.txt")]
+    assert b"".join(chunks) == b"original"
+    assert os.listdir(local_file_driver.staging_dir) == []
+
+
+@pytest.mark.asyncio
+async def test_saved_files_follow_the_umask(local_file_driver):
+    await local_file_driver.save("shared.txt", _to_stream(b"data"))
+    assert os.stat(local_file_driver._full_path("shared.txt")).st_mode & 0o777 == 0o666 & ~UMASK
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("fsync_policy", list(FsyncPolicy))
+async def test_save_with_fsync_policy(tmp_path, sample_data, fsync_policy):
+    driver = LocalFileDriver(str(tmp_path), fsync_policy=fsync_policy)
+    await driver.save("synced.txt", _to_stream(sample_data))
+    assert (tmp_path / "synced.txt").read_bytes() == sample_data
+
+
+@pytest.mark.asyncio
+async def test_delete_reports_whether_file_existed(local_file_driver):
+    await local_file_driver.save("once.txt", _to_stream(b"data"))
+    assert await local_file_driver.delete("once.txt") is True
+    assert await local_file_driver.delete("once.txt") is False
+
+
+@pytest.mark.asyncio
+async def test_internal_dir_is_reserved(local_file_driver):
+    with pytest.raises(ValueError, match="reserved"):
+        await local_file_driver.save(".keeper/staging/evil", _to_stream(b"data"))
+
+
+@pytest.mark.asyncio
+async def test_read_with_offset_and_length(local_file_driver):
+    await local_file_driver.save("slice.txt", _to_stream(b"0123456789"))
+    chunks = [chunk async for chunk in local_file_driver.read("slice.txt", offset=3, length=6)]
+    assert b"".join(chunks) == b"345678"
+
+
+@pytest.mark.asyncio
+async def test_stat(local_file_driver, sample_data):
+    await local_file_driver.save("stat.txt", _to_stream(sample_data))
+    file_stat = await local_file_driver.stat("stat.txt")
+    assert file_stat.size == len(sample_data)
+    assert file_stat.mtime_ns == os.stat(await local_file_driver.local_path("stat.txt")).st_mtime_ns
+    with pytest.raises(FileNotFoundError):
+        await local_file_driver.stat("missing.txt")
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("executor_cls", [ThreadPoolExecutor, ProcessPoolExecutor])
+async def test_large_file_hash_runs_in_executor(tmp_path, executor_cls):
+    data = os.urandom(64 * 1024 + 3)
+    with executor_cls(max_workers=1) as executor:
+        driver = LocalFileDriver(str(tmp_path), hash_executor=executor, hash_inline_threshold=1024, hash_buffer_size=4096)
+        await driver.save("large.bin", _to_stream(data))
+
+        with mock.patch.object(driver, "_hash_inline", side_effect=AssertionError("hashed on the event loop")):
+            digests = await driver.hashes("large.bin", ["sha256", "md5"])
+
+    assert digests == {"sha256": hashlib.sha256(data).hexdigest(), "md5": hashlib.md5(data).hexdigest()}
+
+
+@pytest.mark.asyncio
+async def test_small_file_hash_stays_inline(tmp_path, sample_data):
+    driver = LocalFileDriver(str(tmp_path), hash_executor=mock.Mock(), hash_inline_threshold=1024)
+    await driver.save("small.bin", _to_stream(sample_data))
+    assert await driver.hash("small.bin", "sha256") == hashlib.sha256(sample_data).hexdigest()
+    driver.hash_executor.submit.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_metadata_calls_use_fs_executor(tmp_path, sample_data):
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        driver = LocalFileDriver(str(tmp_path), fs_executor=executor)
+        await driver.save("pooled.txt", _to_stream(sample_data))
+
+        with mock.patch.object(executor, "submit", wraps=executor.submit) as submit:
+            assert await driver.exists("pooled.txt")
+            assert await driver.size("pooled.txt") == len(sample_data)
+            assert (await driver.stat("pooled.txt")).size == len(sample_data)
+            assert await driver.delete("pooled.txt")
+
+    # One pool call per lookup: finding the file, the symlink check and the stat happen together
+    assert [call.args[0] for call in submit.call_args_list] == [driver._locate] * 3 + [os.remove]
+
+
+@pytest.mark.asyncio
+async def test_ids_are_checked_without_touching_the_disk(local_file_driver, tmp_path):
+    for file_id in ("../outside.txt", "nested/../../outside.txt", "/etc/passwd", ".keeper/staging/x", "a\0b"):
+        with pytest.raises(ValueError):
+            await local_file_driver.stat(file_id)
+
+    outside = tmp_path.parent / "outside-target.txt"
+    outside.write_text("secret")
+    (tmp_path / "escape.txt").symlink_to(outside)
+    (tmp_path / "inside.txt").symlink_to(tmp_path / "target.txt")
+    await local_file_driver.save("target.txt", _to_stream(b"inside"))
+
+    with pytest.raises(ValueError, match="escapes"):
+        await local_file_driver.stat("escape.txt")
+    assert (await local_file_driver.stat("inside.txt")).size == 6
+
+
+@pytest.mark.asyncio
+async def test_startup_removes_stale_staging_files(tmp_path):
+    driver = LocalFileDriver(base_dir=str(tmp_path), staging_max_age=60)
+    stale = os.path.join(driver.staging_dir, "stale")
+    fresh = os.path.join(driver.staging_dir, "fresh")
+    for path in (stale, fresh):
+        with open(path, "wb") as f:
+            f.write(b"partial")
+    os.utime(stale, (0, 0))
+
+    await driver.startup()
+
+    assert os.listdir(driver.staging_dir) == ["fresh"]
+
+
+@pytest.mark.asyncio
+async def test_read_chunk_size_adapts_to_file_size(tmp_path):
+    driver = LocalFileDriver(base_dir=str(tmp_path), default_chunk_size=4, max_chunk_size=64)
+    await driver.save("large.bin", _to_stream(b"x" * 4096))
+    await driver.save("small.bin", _to_stream(b"x" * 32))
+
+    large = [chunk async for chunk in driver.read("large.bin")]
+    small = [chunk async for chunk in driver.read("small.bin")]
+
+    assert {len(chunk) for chunk in large} == {64}
+    assert {len(chunk) for chunk in small} == {4}
+
+
+@pytest.mark.asyncio
+async def test_save_coalesces_small_chunks(tmp_path):
+    driver = LocalFileDriver(base_dir=str(tmp_path), write_buffer_size=8)
+
+    async def stream():
+        for _ in range(10):
+            yield b"abc"
+
+    digests = await driver.save("coalesced.bin", stream(), algorithms=["sha256"])
+
+    assert (tmp_path / "coalesced.bin").read_bytes() == b"abc" * 10
+    assert digests["sha256"] == hashlib.sha256(b"abc" * 10).hexdigest()
+
+
+@pytest.mark.asyncio
+async def test_save_parts_concatenates_files(tmp_path, local_file_driver):
+    parts = []
+    for i, data in enumerate([b"abc", b"", b"defg"]):
+        part = tmp_path / f"part{i}"
+        part.write_bytes(data)
+        parts.append(str(part))
+
+    digests = await local_file_driver.save_parts("joined.bin", parts, algorithms=["md5"])
+
+    assert (tmp_path / "joined.bin").read_bytes() == b"abcdefg"
+    assert digests == {"md5": hashlib.md5(b"abcdefg").hexdigest()}
+    assert os.listdir(local_file_driver.staging_dir) == []
+
+
+@pytest.mark.asyncio
+async def test_list_pages_in_name_order(local_file_driver):
+    names = ["b", "a", "dir/x", "dir/a", "dir-2", "other/y", "c"]
+    os.makedirs(os.path.join(local_file_driver.base_dir, "dir"))
+    os.makedirs(os.path.join(local_file_driver.base_dir, "other"))
+    for name in names:
+        await local_file_driver.save(name, _to_stream(name.encode()))
+
+    async def page(prefix="", cursor=None, limit=1000):
+        return [name async for name, _ in local_file_driver.list(prefix=prefix, cursor=cursor, limit=limit)]
+
+    first = await page(limit=3)
+    rest = await page(cursor=first[-1])
+
+    assert first + rest == sorted(names)
+    assert await page(prefix="dir") == ["dir-2", "dir/a", "dir/x"]
+    assert await page(prefix="dir/", cursor="dir/a") == ["dir/x"]
+    assert await page(prefix="missing/") == []
+    assert [stat.size async for _, stat in local_file_driver.list(prefix="c")] == [1]
+
+
+@pytest.mark.asyncio
+async def test_full_page_stops_before_later_directories(local_file_driver):
+    for directory in ("a", "b", "c"):
+        os.makedirs(os.path.join(local_file_driver.base_dir, directory))
+        await local_file_driver.save(f"{directory}/file", _to_stream(b"x"))
+
+    with mock.patch("app.storage.local.os.scandir", wraps=os.scandir) as scandir:
+        assert [name async for name, _ in local_file_driver.list(limit=1)] == ["a/file"]
+
+    # The spare slot for deduplication looks one id ahead, so "b" is read but "c" never is
+    scanned = [os.path.relpath(call.args[0], local_file_driver.base_dir) for call in scandir.call_args_list]
+    assert scanned == [".", "a", "b"]
+
+
+@pytest.mark.asyncio
+async def test_listing_a_flat_directory_holds_one_batch_per_page(local_file_driver):
+    names = [f"file-{i:03}" for i in range(50)]
+    for name in names:
+        await local_file_driver.save(name, _to_stream(b"x"))
+    # Empty directories take batch slots without yielding ids, so the walk has to rescan past them
+    for i in range(6):
+        os.makedirs(os.path.join(local_file_driver.base_dir, f"empty-{i}"))
+
+    listed, cursor = [], None
+    with mock.patch("app.storage.local.heapq.nsmallest", wraps=heapq.nsmallest) as nsmallest:
+        while True:
+            page = [name async for name, _ in local_file_driver.list(cursor=cursor, limit=3)]
+            listed += page
+            if len(page) < 3:
+                break
+            cursor = page[-1]
+
+    assert listed == names
+    assert {call.args[0] for call in nsmallest.call_args_list} == {4}
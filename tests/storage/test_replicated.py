@@ -0,0 +1,204 @@
+import asyncio
+import errno
+import itertools
+import os
+from unittest import mock
+
+import pytest
+
+from app.storage.local import LocalFileDriver
+from app.storage.replicated import OfflineDriver, ReplicatedDriver
+from app.utils.helpers import _to_stream
+
+
+@pytest.fixture
+def members(tmp_path) -> list[LocalFileDriver]:
+    drivers = []
+    for name in ("disk0", "disk1", "disk2"):
+        (tmp_path / name).mkdir()
+        drivers.append(LocalFileDriver(str(tmp_path / name), default_chunk_size=4))
+    return drivers
+
+
+async def _read(driver, path, **kwargs) -> bytes:
+    return b"".join([chunk async for chunk in driver.read(path, **kwargs)])
+
+
+def _holders(members, path) -> list[int]:
+    return [index for index, member in enumerate(members) if os.path.exists(member._full_path(path))]
+
+
+@pytest.mark.asyncio
+async def test_objects_are_spread_with_the_configured_copies(members):
+    driver = ReplicatedDriver(members, copies=2)
+    for i in range(30):
+        await driver.save(f"file-{i}", _to_stream(b"payload %d" % i))
+
+    placements = [_holders(members, f"file-{i}") for i in range(30)]
+    assert all(len(holders) == 2 for holders in placements)
+    # Every disk takes a share of the objects
+    assert {index for holders in placements for index in holders} == {0, 1, 2}
+    assert await _read(driver, "file-7") == b"payload 7"
+    stats = [await members[index].stat("file-7") for index in placements[7]]
+    assert stats[0].mtime_ns == stats[1].mtime_ns
+
+
+@pytest.mark.asyncio
+async def test_survives_losing_a_directory(members):
+    driver = ReplicatedDriver(members, copies=2)
+    await driver.save("a.txt", _to_stream(b"still here"))
+    lost = _holders(members, "a.txt")[0]
+    os.remove(members[lost]._full_path("a.txt"))
+
+    for _ in range(4):
+        assert await _read(driver, "a.txt") == b"still here"
+    assert (await driver.stat("a.txt")).size == 10
+    assert await driver.exists("a.txt")
+    assert await driver.local_path("a.txt") in [members[index]._full_path("a.txt") for index in _holders(members, "a.txt")]
+
+
+@pytest.mark.asyncio
+async def test_read_fails_over_mid_stream(members):
+    driver = ReplicatedDriver(members, copies=3)
+    await driver.save("a.txt", _to_stream(b"0123456789abcdef"))
+    # Pin the rotation so the copy read first is known
+    driver._turns = itertools.repeat(0)
+    first = driver._read_order("a.txt")[0]
+    original_read = members[first].read
+
+    async def failing_read(path, chunk_size=None, offset=0, length=None):
+        async for chunk in original_read(path, chunk_size=chunk_size, offset=offset, length=length):
+            yield chunk
+            raise OSError(errno.EIO, "I/O error")
+
+    with mock.patch.object(members[first], "read", side_effect=failing_read):
+        assert await _read(driver, "a.txt", offset=2, length=10) == b"23456789ab"
+    assert driver.stats()["failovers"] == 1
+
+
+@pytest.mark.asyncio
+async def test_slow_copy_is_hedged(members):
+    driver = ReplicatedDriver(members, copies=2, hedge_delay=0.01)
+    await driver.save("a.txt", _to_stream(b"fast"))
+    release = asyncio.Event()
+    original_reads = {index: members[index].read for index in range(3)}
+
+    def slow(index):
+        async def read(path, **kwargs):
+            await release.wait()
+            async for chunk in original_reads[index](path, **kwargs):
+                yield chunk
+
+        return read
+
+    driver._turns = itertools.repeat(0)
+    slow_index = driver._read_order("a.txt")[0]
+    with mock.patch.object(members[slow_index], "read", side_effect=slow(slow_index)):
+        assert await asyncio.wait_for(_read(driver, "a.txt"), 1) == b"fast"
+    assert driver.stats()["hedges"] == 1
+
+
+@pytest.mark.asyncio
+async def test_write_tolerates_a_failed_disk_down_to_min_copies(members):
+    driver = ReplicatedDriver(members, copies=2)
+    await driver.save("a.txt", _to_stream(b"old"))
+    broken = _holders(members, "a.txt")[0]
+
+    with mock.patch.object(members[broken], "save", side_effect=OSError(errno.EIO, "I/O error")):
+        await driver.save("a.txt", _to_stream(b"new"))
+    # The failed disk's old copy is dropped rather than served again
+    assert broken not in _holders(members, "a.txt")
+    assert await _read(driver, "a.txt") == b"new"
+    assert driver.stats()["degraded_writes"] == 1
+
+    strict = ReplicatedDriver(members, copies=2, min_copies=2)
+    with mock.patch.object(members[broken], "save", side_effect=OSError(errno.EIO, "I/O error")), pytest.raises(OSError):
+        await strict.save("a.txt", _to_stream(b"newer"))
+
+
+@pytest.mark.asyncio
+async def test_digest_mismatch_fails_every_copy(members):
+    driver = ReplicatedDriver(members, copies=2)
+
+    with pytest.raises(ValueError):
+        await driver.save("a.txt", _to_stream(b"data"), expected_hashes={"sha256": "0" * 64})
+
+    assert _holders(members, "a.txt") == []
+
+
+@pytest.mark.asyncio
+async def test_list_merges_members_and_delete_clears_them(members):
+    driver = ReplicatedDriver(members, copies=2)
+    for name in ("a", "b", "c", "d"):
+        await driver.save(name, _to_stream(name.encode()))
+    # A stray copy from an earlier placement
+    (stray,) = {0, 1, 2} - set(_holders(members, "a"))
+    await members[stray].save("a", _to_stream(b"a"))
+
+    assert [name async for name, _ in driver.list(limit=3)] == ["a", "b", "c"]
+    assert [name async for name, _ in driver.list(cursor="b")] == ["c", "d"]
+    assert await driver.delete("a")
+    assert _holders(members, "a") == []
+    assert not await driver.exists("a")
+    with pytest.raises(FileNotFoundError):
+        await _read(driver, "a")
+
+
+@pytest.mark.asyncio
+async def test_read_repairs_a_missing_copy(members):
+    driver = ReplicatedDriver(members, copies=2)
+    await driver.save("a.txt", _to_stream(b"repair me"))
+    lost = _holders(members, "a.txt")[0]
+    os.remove(members[lost]._full_path("a.txt"))
+
+    driver._turns = itertools.repeat(0)
+    while driver._read_order("a.txt")[0] != lost:
+        driver._reading[driver._read_order("a.txt")[0]] += 1
+    assert await _read(driver, "a.txt") == b"repair me"
+    await asyncio.gather(*driver._tasks)
+
+    holders = _holders(members, "a.txt")
+    assert lost in holders and len(holders) == 2
+    assert len({(await members[index].stat("a.txt")).mtime_ns for index in holders}) == 1
+    assert driver.stats()["repaired"] == 1
+
+
+@pytest.mark.asyncio
+async def test_stale_copies_are_repaired_after_failed_writes_and_deletes(members):
+    driver = ReplicatedDriver(members, copies=2)
+    await driver.save("a.txt", _to_stream(b"old"))
+    broken = _holders(members, "a.txt")[0]
+
+    # The failed disk can neither take the new version nor drop the old one
+    with (
+        mock.patch.object(members[broken], "save", side_effect=OSError(errno.EIO, "I/O error")),
+        mock.patch.object(members[broken], "delete", side_effect=OSError(errno.EIO, "I/O error")),
+    ):
+        await driver.save("a.txt", _to_stream(b"new"))
+        await asyncio.gather(*driver._tasks)
+        assert driver.stats()["pending_repairs"] == 1
+    assert await driver.repair() == 0
+    for index in _holders(members, "a.txt"):
+        assert await _read(members[index], "a.txt") == b"new"
+
+    with mock.patch.object(members[broken], "delete", side_effect=OSError(errno.EIO, "I/O error")):
+        await driver.delete("a.txt")
+        await asyncio.gather(*driver._tasks)
+    assert _holders(members, "a.txt") == [broken]
+    assert await driver.repair() == 0
+    assert _holders(members, "a.txt") == []
+
+
+@pytest.mark.asyncio
+async def test_offline_member_keeps_placement_and_is_skipped(members, tmp_path):
+    offline = OfflineDriver(str(tmp_path / "missing"), FileNotFoundError("missing"))
+    driver = ReplicatedDriver([*members, offline], copies=2)
+    for i in range(20):
+        await driver.save(f"file-{i}", _to_stream(b"payload %d" % i))
+
+    assert driver.stats()["down"] == 1
+    assert driver.stats()["degraded_writes"] == 0
+    assert all(len(_holders(members, f"file-{i}")) == 2 for i in range(20))
+    assert await _read(driver, "file-3") == b"payload 3"
+    assert not await driver.exists("missing")
+    assert len([name async for name, _ in driver.list()]) == 20
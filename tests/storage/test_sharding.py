@@ -0,0 +1,62 @@
+import os
+
+import pytest
+
+from app.storage.cas import ContentAddressedDriver
+from app.storage.local import LocalFileDriver
+from app.utils.helpers import _to_stream
+
+
+@pytest.fixture
+def sharded_driver(tmp_path) -> LocalFileDriver:
+    return LocalFileDriver(base_dir=str(tmp_path), default_chunk_size=4, shard_levels=2)
+
+
+@pytest.mark.asyncio
+async def test_sharded_save_and_read(sharded_driver, tmp_path, sample_data):
+    await sharded_driver.save("file.txt", _to_stream(sample_data))
+
+    stored = sharded_driver._full_path("file.txt")
+    assert os.path.relpath(stored, tmp_path).split(os.sep)[0] == ".shards"
+    assert len(os.path.relpath(stored, sharded_driver.shards_dir).split(os.sep)) == 3
+    assert not (tmp_path / "file.txt").exists()
+    assert b"".join([chunk async for chunk in sharded_driver.read("file.txt")]) == sample_data
+    assert await sharded_driver.delete("file.txt")
+    assert not await sharded_driver.exists("file.txt")
+
+
+@pytest.mark.asyncio
+async def test_shards_dir_is_reserved(sharded_driver):
+    with pytest.raises(ValueError, match="reserved"):
+        await sharded_driver.save(".shards/evil", _to_stream(b"data"))
+
+
+@pytest.mark.asyncio
+async def test_flat_files_are_served_and_migrated(tmp_path, sample_data):
+    flat = LocalFileDriver(base_dir=str(tmp_path))
+    os.makedirs(tmp_path / "nested")
+    await flat.save("old.txt", _to_stream(b"old"))
+    await flat.save("nested/deep.txt", _to_stream(b"deep"))
+    await flat.save("rewritten.txt", _to_stream(b"stale"))
+
+    sharded = LocalFileDriver(base_dir=str(tmp_path), shard_levels=2)
+    await sharded.save("rewritten.txt", _to_stream(b"fresh"))
+
+    assert await sharded.size("old.txt") == 3
+    assert [name async for name, _ in sharded.list()] == ["nested/deep.txt", "old.txt", "rewritten.txt"]
+
+    assert await sharded.migrate_to_shards() == 2
+    assert sorted(os.listdir(tmp_path)) == [".keeper", ".shards"]
+    assert b"".join([chunk async for chunk in sharded.read("nested/deep.txt")]) == b"deep"
+    assert b"".join([chunk async for chunk in sharded.read("rewritten.txt")]) == b"fresh"
+    assert sorted(path for path, _ in sharded.scan()) == ["nested/deep.txt", "old.txt", "rewritten.txt"]
+
+
+@pytest.mark.asyncio
+async def test_cas_refs_can_be_sharded(tmp_path, sample_data):
+    driver = ContentAddressedDriver(base_dir=str(tmp_path), shard_levels=1)
+    digests = await driver.save("a", _to_stream(sample_data))
+    await driver.save("b", _to_stream(sample_data))
+
+    assert await driver.refcount(digests["sha256"]) == 2
+    assert driver._full_path("a").startswith(os.path.join(str(tmp_path), "refs", ".shards"))
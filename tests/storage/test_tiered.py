@@ -0,0 +1,149 @@
+import asyncio
+import os
+from unittest import mock
+
+import pytest
+
+from app.storage.enums import TierMode
+from app.storage.local import LocalFileDriver
+from app.storage.tiered import TieredDriver
+from app.utils.helpers import _to_stream
+
+
+@pytest.fixture
+def tiers(tmp_path) -> tuple[LocalFileDriver, LocalFileDriver]:
+    (tmp_path / "fast").mkdir()
+    (tmp_path / "capacity").mkdir()
+    return LocalFileDriver(str(tmp_path / "fast")), LocalFileDriver(str(tmp_path / "capacity"))
+
+
+async def _tiered(tiers, **kwargs) -> TieredDriver:
+    driver = TieredDriver(*tiers, **{"max_bytes": 1000, **kwargs})
+    await driver.startup()
+    return driver
+
+
+async def _read(driver, path) -> bytes:
+    return b"".join([chunk async for chunk in driver.read(path)])
+
+
+async def _settle(driver: TieredDriver) -> None:
+    while driver._tasks - {task for task in driver._tasks if task.get_coro().__name__ == "_flush_worker"}:
+        await asyncio.sleep(0.01)
+    await driver.flush()
+
+
+@pytest.mark.asyncio
+async def test_write_through_lands_on_both_tiers(tiers):
+    fast, capacity = tiers
+    driver = await _tiered(tiers)
+    await driver.save("a.txt", _to_stream(b"hello"))
+
+    assert await _read(fast, "a.txt") == await _read(capacity, "a.txt") == b"hello"
+    assert (await fast.stat("a.txt")).mtime_ns == (await capacity.stat("a.txt")).mtime_ns
+    assert await driver.delete("a.txt")
+    assert not await fast.exists("a.txt") and not await capacity.exists("a.txt")
+    await driver.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_failed_write_through_keeps_capacity_authoritative(tiers):
+    fast, capacity = tiers
+    driver = await _tiered(tiers)
+    await driver.save("a.txt", _to_stream(b"old"))
+
+    with mock.patch.object(capacity, "save", side_effect=OSError("disk gone")), pytest.raises(OSError):
+        await driver.save("a.txt", _to_stream(b"new"))
+
+    assert not await fast.exists("a.txt")
+    assert await _read(driver, "a.txt") == b"old"
+    await driver.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_miss_promotes_and_lru_evicts_by_size(tiers):
+    fast, capacity = tiers
+    for name in ("a", "b", "c"):
+        await capacity.save(name, _to_stream(name.encode() * 400))
+    driver = await _tiered(tiers, promote_max_size=500)
+
+    assert await _read(driver, "a") == b"a" * 400
+    await _settle(driver)
+    assert await fast.exists("a")
+    await _read(driver, "b")
+    await _settle(driver)
+    await _read(driver, "a")
+    await _read(driver, "c")
+    await _settle(driver)
+
+    assert await fast.exists("a") and await fast.exists("c")
+    assert not await fast.exists("b")
+    assert driver.stats()["resident_bytes"] <= 1000
+    assert driver.stats()["evictions"] == 1
+    assert driver.stats()["promotions"] == 3
+    await driver.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_large_objects_are_not_promoted(tiers):
+    fast, capacity = tiers
+    await capacity.save("big", _to_stream(b"x" * 600))
+    driver = await _tiered(tiers)
+
+    await _read(driver, "big")
+    await _settle(driver)
+
+    assert not await fast.exists("big")
+    await driver.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_write_back_flushes_in_the_background(tiers):
+    fast, capacity = tiers
+    driver = await _tiered(tiers, mode=TierMode.WRITE_BACK)
+    release = asyncio.Event()
+    original_save = capacity.save
+
+    async def slow_save(*args, **kwargs):
+        await release.wait()
+        return await original_save(*args, **kwargs)
+
+    with mock.patch.object(capacity, "save", side_effect=slow_save):
+        await driver.save("a.txt", _to_stream(b"x" * 800))
+        await driver.save("b.txt", _to_stream(b"y" * 800))
+        assert not await capacity.exists("a.txt")
+        # Dirty objects are never evicted, even over budget
+        assert await fast.exists("a.txt") and await fast.exists("b.txt")
+        release.set()
+        await driver.flush()
+
+    assert await _read(capacity, "a.txt") == b"x" * 800
+    assert await _read(capacity, "b.txt") == b"y" * 800
+    assert driver.stats()["dirty"] == 0
+    assert driver.stats()["resident_bytes"] <= 1000
+    await driver.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_startup_flushes_unflushed_writes_in_write_back(tiers):
+    fast, capacity = tiers
+    await fast.save("pending.txt", _to_stream(b"pending"))
+
+    driver = await _tiered(tiers, mode=TierMode.WRITE_BACK)
+    await driver.flush()
+
+    assert await _read(capacity, "pending.txt") == b"pending"
+    await driver.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_startup_drops_stale_copies_in_write_through(tiers):
+    fast, capacity = tiers
+    await capacity.save("stale.txt", _to_stream(b"current"))
+    await fast.save("stale.txt", _to_stream(b"torn"))
+    os.utime(await fast.local_path("stale.txt"), ns=(1, 1))
+
+    write_through = await _tiered(tiers)
+    assert not await fast.exists("stale.txt")
+    assert await _read(write_through, "stale.txt") == b"current"
+    await write_through.shutdown()
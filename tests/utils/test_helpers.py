@@ -1,6 +1,8 @@
+import asyncio
+
 import pytest
 
-from app.utils.helpers import safe_join
+from app.utils.helpers import adaptive_chunk_size, bounded_map, coalesce_chunks, fast_safe_join, safe_join
 
 
 def test_safe_join(tmp_path):
@@ -33,3 +35,64 @@ def test_safe_join(tmp_path):
 
     with pytest.raises(ValueError, match="Path escapes base directory"):
         safe_join(str(base_dir), "symlink/../outside.txt")
+
+
+def test_safe_join_rejects_sibling_with_common_prefix(tmp_path):
+    base_dir = tmp_path / "base"
+    base_dir.mkdir()
+    (tmp_path / "base-sibling").mkdir()
+
+    with pytest.raises(ValueError, match="Path escapes base directory"):
+        safe_join(str(base_dir), "../base-sibling/file.txt")
+
+
+def test_fast_safe_join(tmp_path):
+    base_dir = str(tmp_path)
+
+    assert fast_safe_join(base_dir, "file.txt") == str(tmp_path / "file.txt")
+    assert fast_safe_join(base_dir, "nested/file.txt") == str(tmp_path / "nested" / "file.txt")
+    assert fast_safe_join(base_dir, ".") == base_dir
+
+    assert fast_safe_join(base_dir, "nested//./file.txt") == str(tmp_path / "nested" / "file.txt")
+
+    for relative_path in ("..", "nested/../../outside.txt", "/absolute/path.txt", "nul\0byte"):
+        with pytest.raises(ValueError, match="Path escapes base directory"):
+            fast_safe_join(base_dir, relative_path)
+
+
+@pytest.mark.asyncio
+async def test_coalesce_chunks_merges_small_writes():
+    async def stream():
+        for chunk in (b"ab", b"cd", b"ef", b"0123456789", b"g"):
+            yield chunk
+
+    chunks = [bytes(chunk) async for chunk in coalesce_chunks(stream(), 5)]
+
+    assert chunks == [b"abcd", b"ef", b"0123456789", b"g"]
+
+
+def test_adaptive_chunk_size_is_clamped():
+    assert adaptive_chunk_size(100, 64, 1024) == 64
+    assert adaptive_chunk_size(16 * 512, 64, 1024) == 512
+    assert adaptive_chunk_size(1 << 30, 64, 1024) == 1024
+
+
+@pytest.mark.asyncio
+async def test_bounded_map_limits_concurrency_and_captures_errors():
+    in_flight = peak = 0
+
+    async def work(item: int) -> int:
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0)
+        in_flight -= 1
+        if item == 3:
+            raise ValueError("boom")
+        return item * 2
+
+    results = dict([entry async for entry in bounded_map(work, range(10), 4)])
+
+    assert peak == 4
+    assert isinstance(results.pop(3), ValueError)
+    assert results == {i: i * 2 for i in range(10) if i != 3}
@@ -0,0 +1,80 @@
+import pytest
+
+from app.storage.base import FileStat
+from app.utils.http import (
+    RangeNotSatisfiableError,
+    if_range_matches,
+    is_not_modified,
+    make_etag,
+    make_last_modified,
+    multipart_byteranges,
+    parse_accept_encoding,
+    parse_range_header,
+)
+
+FILE_STAT = FileStat(size=100, mtime_ns=1_700_000_000_000_000_000)
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        ("bytes=0-9", [(0, 10)]),
+        ("bytes=90-", [(90, 100)]),
+        ("bytes=-10", [(90, 100)]),
+        ("bytes=95-200", [(95, 100)]),
+        ("bytes=0-0, 50-59", [(0, 1), (50, 60)]),
+        ("bytes=-500", [(0, 100)]),
+        ("items=0-9", None),
+        ("bytes=abc", None),
+        ("bytes=9-0", None),
+    ],
+)
+def test_parse_range_header(header, expected):
+    assert parse_range_header(header, FILE_STAT.size) == expected
+
+
+def test_parse_range_header_not_satisfiable():
+    with pytest.raises(RangeNotSatisfiableError, match=r"bytes \*/100"):
+        parse_range_header("bytes=100-", FILE_STAT.size)
+
+
+def test_etag_prefers_digest():
+    assert make_etag(FILE_STAT) == f'"{FILE_STAT.mtime_ns:x}-{FILE_STAT.size:x}"'
+    assert make_etag(FileStat(size=1, mtime_ns=1, digests={"sha256": "abc"})) == '"abc"'
+
+
+def test_conditional_headers():
+    etag = make_etag(FILE_STAT)
+    last_modified = make_last_modified(FILE_STAT)
+
+    assert is_not_modified(etag, None, etag, FILE_STAT)
+    assert is_not_modified(f'"other", W/{etag}', None, etag, FILE_STAT)
+    assert is_not_modified("*", None, etag, FILE_STAT)
+    assert not is_not_modified('"other"', last_modified, etag, FILE_STAT)
+    assert is_not_modified(None, last_modified, etag, FILE_STAT)
+    assert not is_not_modified(None, "Thu, 01 Jan 1970 00:00:00 GMT", etag, FILE_STAT)
+
+    assert if_range_matches(None, etag, FILE_STAT)
+    assert if_range_matches(etag, etag, FILE_STAT)
+    assert not if_range_matches(f"W/{etag}", etag, FILE_STAT)
+    assert if_range_matches(last_modified, etag, FILE_STAT)
+
+
+@pytest.mark.asyncio
+async def test_multipart_byteranges_content_length():
+    data = bytes(range(100))
+
+    async def read(offset, length):
+        yield data[offset : offset + length]
+
+    content_length, body = multipart_byteranges([(0, 5), (10, 20)], len(data), "application/octet-stream", "sep", read)
+    payload = b"".join([chunk async for chunk in body])
+
+    assert len(payload) == content_length
+    assert b"Content-Range: bytes 10-19/100\r\n\r\n" + data[10:20] in payload
+    assert payload.endswith(b"--sep--\r\n")
+
+
+def test_parse_accept_encoding():
+    assert parse_accept_encoding("gzip, br;q=0.5, zstd;q=0, *") == {"gzip", "br"}
+    assert parse_accept_encoding(None) == set()